@@ -0,0 +1,119 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Set
+
+from database import Database
+from metrics import caller_name, current_handler
+from replicas import read_session
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCancelledError(Exception):
+    """Raised inside a database call whose awaiting task was cancelled or timed out"""
+
+
+class CancelToken:
+    """Tracks the connections used by one async call so its running queries can be killed"""
+
+    def __init__(self):
+        self.cancelled = False
+        # (connection id, backend) pairs, ids are only unique per server with read replicas
+        self.connections: Set[tuple] = set()
+        self._lock = threading.Lock()
+
+    def check(self):
+        if self.cancelled:
+            raise QueryCancelledError('Database call was cancelled')
+
+    def attach(self, conn: Any, backend: Any = None):
+        with self._lock:
+            self.connections.add((conn.connection_id, backend))
+
+    def detach(self, conn: Any, backend: Any = None):
+        with self._lock:
+            self.connections.discard((conn.connection_id, backend))
+
+    def cancel(self) -> Set[tuple]:
+        """Mark the call as cancelled, returns the connections still running a query"""
+        with self._lock:
+            self.cancelled = True
+            return set(self.connections)
+
+
+class AsyncDatabase:
+    """
+    Awaitable facade over Database with the same method names.
+    Calls run on a bounded thread pool so the event loop keeps serving other clients.
+    A call that is cancelled or exceeds its timeout has its running query killed on the server.
+    """
+
+    def __init__(self, db: Database, max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                 session: Optional[Callable[[], str]] = None):
+        self.db = db
+        # One worker per pooled connection of the primary and the replicas, more threads would only wait for a connection
+        connections = db.pool.size + sum(replica.pool.size for replica in db.replicas)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or connections, thread_name_prefix='db')
+        self.timeout = timeout if timeout is not None else float(os.getenv('DB_QUERY_TIMEOUT', '30'))
+        # Returns the session of the caller, whose writes its following reads must see (see replicas.py)
+        self.session = session
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.db, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        return call
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a blocking Database call in the thread pool, with cancellation and a timeout"""
+        token = CancelToken()
+        # Copy the caller's context so context variables are visible inside the worker,
+        # and tag the call's statements with the UI handler that made it
+        context = contextvars.copy_context()
+        context.run(current_handler.set, current_handler.get() or caller_name())
+        if self.session is not None:
+            context.run(read_session.set, self.session())
+        method = getattr(func, '__name__', repr(func))
+
+        def work():
+            self.db._local.cancel_token = token
+            start = time.perf_counter()
+            try:
+                token.check()
+                return context.run(func, *args, **kwargs)
+            finally:
+                self.db._local.cancel_token = None
+                if self.db.metrics.enabled:
+                    self.db.metrics.record_call(method, time.perf_counter() - start)
+
+        future = asyncio.get_running_loop().run_in_executor(self.executor, work)
+        try:
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            self._kill(token)
+            raise
+
+    def _kill(self, token: CancelToken):
+        # Stop the server-side work of a call nobody is waiting for anymore
+        # Uses its own thread, the executor may be saturated by the very queries being killed
+        connections = token.cancel()
+        if connections:
+            threading.Thread(target=self._kill_queries, args=(connections,), daemon=True).start()
+
+    def _kill_queries(self, connections: Set[tuple]):
+        for connection_id, backend in connections:
+            try:
+                self.db.kill_query(connection_id, backend)
+            except Exception as e:
+                logger.warning('Could not cancel query on connection %s: %s', connection_id, e)
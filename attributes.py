@@ -0,0 +1,49 @@
+"""
+Queryable key_performance attributes of device models.
+
+key_performance is a JSON document with the attributes declared in device_types.specification.
+Each attribute is mirrored into a row of the device_model_attributes side table, which
+Database keeps in sync on every write to device_models. Its indexes on (attribute, value)
+let get_table_page filter and sort device models by an attribute without decoding JSON.
+Filter and sort columns address an attribute as 'kp.<attribute>', e.g. 'kp.Battery Life'.
+"""
+import re
+from typing import Any, List, Optional
+
+from formatting import parse_key_performance
+
+ATTRIBUTE_PREFIX = 'kp.'
+ATTRIBUTE_TABLE = 'device_model_attributes'
+
+# Length of the VARCHAR columns of the side table
+MAX_LENGTH = 255
+
+# Leading number of a value such as '48 Wh', '16GB' or '15,6" FHD' (decimal comma or point)
+_NUMBER = re.compile(r'\s*([-+]?\d+(?:[.,]\d+)?)')
+
+
+def attribute_name(column: str) -> Optional[str]:
+    """The attribute a 'kp.<attribute>' column addresses, None for plain columns"""
+    if isinstance(column, str) and column.startswith(ATTRIBUTE_PREFIX) and len(column) > len(ATTRIBUTE_PREFIX):
+        return column[len(ATTRIBUTE_PREFIX):]
+    return None
+
+
+def attribute_number(value: Any) -> Optional[float]:
+    """Numeric value of an attribute for range filters and sorting, None if it does not start with a number"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.match(str(value))
+    return float(match.group(1).replace(',', '.')) if match else None
+
+
+def attribute_rows(model_id: int, key_performance: Any) -> List[tuple]:
+    """Side table rows (model_id, attribute, value_text, value_number) of a key_performance document"""
+    rows = []
+    for attribute, value in parse_key_performance(key_performance).items():
+        if value in (None, '') or not str(attribute).strip():
+            continue
+        rows.append((model_id, str(attribute)[:MAX_LENGTH], str(value)[:MAX_LENGTH], attribute_number(value)))
+    return rows
@@ -0,0 +1,221 @@
+"""
+Change history of the rows written through Database.
+
+Every insert, update and delete is recorded in the audit_log table with the row's image before
+the write and the values it wrote. Updates keep only the columns that changed. Records are queued
+in memory once the write has committed and written by a background thread in batched multi-row
+INSERTs. Imports read the inserted rows back in their transaction, so each imported row is recorded.
+
+The before image of an update or delete is read on the primary in the write's own transaction
+(SQLite deletes return it with DELETE ... RETURNING), never from caches or replicas. AUDIT_LOCK_ROWS
+also locks the row until the write commits, which keeps the image exact under concurrent edits,
+and locks the end of the table while an import runs.
+
+A full queue is written by the writer itself. Records still queued when the process is killed are
+lost, a regular shutdown writes them. Writes made outside the application are not recorded.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, List, Optional
+
+from replicas import read_session
+
+logger = logging.getLogger(__name__)
+
+AUDIT_TABLE = 'audit_log'
+AUDIT_COLUMNS = ('changed_at', 'table_name', 'row_id', 'operation', 'session_id', 'before_image', 'after_image')
+
+# Flushes a batch that failed to write is tried in before it is dropped
+MAX_ATTEMPTS = 5
+
+
+@dataclass
+class AuditRecord:
+    """One recorded write of a row; `after` holds the written columns, all of them for inserts"""
+    changed_at: datetime
+    table_name: str
+    row_id: int
+    operation: str
+    session_id: str
+    before: Optional[Dict[str, Any]]
+    after: Optional[Dict[str, Any]]
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> 'AuditRecord':
+        return cls(row['changed_at'], row['table_name'], row['row_id'], row['operation'], row['session_id'] or '',
+                   decode_image(row['before_image']), decode_image(row['after_image']))
+
+    def image(self) -> Optional[Dict[str, Any]]:
+        """The row as this write left it, None if it was deleted"""
+        if self.operation == 'delete':
+            return None
+        return {**(self.before or {}), **(self.after or {})}
+
+
+def encode_image(image: Optional[Dict[str, Any]]) -> Optional[str]:
+    # Dates, times and decimals are kept as their text
+    return json.dumps(image, default=str, ensure_ascii=False) if image is not None else None
+
+
+def comparable(value: Any) -> Optional[str]:
+    """
+    Canonical text of a column value, so typed database values and the text a form sends compare
+    equal when they mean the same: 5 and '5', Decimal('5.00') and '5', a datetime and '2025-01-31T14:30'
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        value = int(value)
+    text = value.isoformat() if isinstance(value, (date, datetime)) else str(value).strip()
+    try:
+        number = Decimal(text)
+        if number.is_finite():
+            return format(number.normalize(), 'f')
+    except InvalidOperation:
+        pass
+    try:
+        return datetime.fromisoformat(text).isoformat()
+    except ValueError:
+        return text
+
+
+def decode_image(value: Any) -> Optional[Dict[str, Any]]:
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode()
+    return json.loads(value) if isinstance(value, str) else value
+
+
+class AuditLog:
+    """Bounded queue of audit records, written in batches by a background thread through `write`"""
+
+    def __init__(self, write: Callable[[List[tuple]], None], enabled: bool = True, queue_size: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 1.0, retention_days: float = 0,
+                 lock_rows: bool = False):
+        self.enabled = enabled
+        # Lock the rows whose before images are read until the write commits, and the end of a table during imports
+        self.lock_rows = lock_rows
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        # Records older than this are deleted by compact, 0 keeps them forever
+        self.retention_days = retention_days
+        self._write = write
+        self._queue: queue.Queue = queue.Queue(maxsize=max(self.batch_size, queue_size))
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer = None
+        self._written = 0
+        self._dropped = 0
+        self._flushes = 0
+        # A batch whose write failed and the number of attempts made, retried before newer records
+        self._retry: Optional[List[tuple]] = None
+        self._attempts = 0
+
+    @classmethod
+    def from_env(cls, write: Callable[[List[tuple]], None]) -> 'AuditLog':
+        return cls(write,
+                   enabled=os.getenv('AUDIT_LOG', '1') != '0',
+                   queue_size=int(os.getenv('AUDIT_QUEUE_SIZE', '10000')),
+                   batch_size=int(os.getenv('AUDIT_BATCH_SIZE', '500')),
+                   flush_interval=float(os.getenv('AUDIT_FLUSH_INTERVAL', '1')),
+                   retention_days=float(os.getenv('AUDIT_RETENTION_DAYS', '0')),
+                   lock_rows=os.getenv('AUDIT_LOCK_ROWS', '0') == '1')
+
+    def record(self, table_name: str, row_id: int, operation: str,
+               before: Optional[Dict[str, Any]] = None, after: Optional[Dict[str, Any]] = None):
+        """Queue a committed write, made by the session of the current call"""
+        if not self.enabled:
+            return
+        if operation != 'insert' and before is None:
+            # A partial image would make as-of queries rebuild rows that never existed
+            self._dropped += 1
+            logger.warning('No previous values for %s %s %s, not recorded', operation, table_name, row_id)
+            return
+        if operation == 'update':
+            after = {key: value for key, value in (after or {}).items() if comparable(before.get(key)) != comparable(value)}
+            if not after:
+                return  # Nothing changed
+        record = (datetime.now(), table_name, row_id, operation, read_session.get(),
+                  encode_image(before), encode_image(after))
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # The background writer is behind, write the queue now rather than lose records
+            self.flush()
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                # Writing keeps failing, drop the record instead of blocking the write
+                self._dropped += 1
+                logger.warning('Audit log queue is full, dropped the record of %s %s %s', operation, table_name, row_id)
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Write every queued record now, returns how many were written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch, self._retry = self._retry or [], None
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return written
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    # Keep the batch for the next flushes, a persistent error (e.g. a missing audit_log
+                    # table) drops it after MAX_ATTEMPTS so the queue does not stall for good
+                    self._attempts += 1
+                    if self._attempts < MAX_ATTEMPTS:
+                        self._retry = batch
+                        logger.warning('Could not write %d audit record(s), retrying: %s', len(batch), e)
+                    else:
+                        self._attempts = 0
+                        self._dropped += len(batch)
+                        logger.error('Dropped %d audit record(s) after %d failed writes: %s', len(batch), MAX_ATTEMPTS, e)
+                    return written
+                self._attempts = 0
+                written += len(batch)
+                self._written += len(batch)
+                self._flushes += 1
+
+    def start(self, compact: Optional[Callable[[], int]] = None, compact_interval: float = 3600.0):
+        """Write queued records every flush_interval seconds in a background thread, and run compact every compact_interval"""
+        if self._writer is not None or not self.enabled:
+            return
+
+        def run():
+            next_compact = time.monotonic()
+            while True:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self.flush()
+                if compact is not None and self.retention_days > 0 and time.monotonic() >= next_compact:
+                    next_compact = time.monotonic() + compact_interval
+                    try:
+                        deleted = compact()
+                        if deleted:
+                            logger.info('Deleted %d audit record(s) older than %g days', deleted, self.retention_days)
+                    except Exception as e:
+                        logger.error('Could not compact the audit log: %s', e)
+
+        self._writer = threading.Thread(target=run, name='audit-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def stats(self) -> Dict[str, int]:
+        queued = self._queue.qsize() + len(self._retry or ())
+        return {'queued': queued, 'written': self._written, 'dropped': self._dropped, 'flushes': self._flushes}
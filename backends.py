@@ -0,0 +1,498 @@
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import weakref
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sql import quote_identifier
+
+# Column metadata returned by Backend.get_columns is normalized to one dict per column, in table order:
+# name, type (lowercase MySQL spelling, e.g. 'int', 'varchar(255)', 'timestamp'), nullable,
+# key ('PRI', 'UNI', 'MUL' or ''), default and extra ('auto_increment' or '')
+
+# Schema for the embedded SQLite backend, the counterpart of docker/init.sql.
+# Declared types keep the MySQL spelling so column metadata and form fields are the same on both engines;
+# text columns compare case-insensitively like MySQL's default collation, which also lets
+# prefix LIKE searches use their indexes.
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS manufacturer (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL COLLATE NOCASE
+);
+
+CREATE TABLE IF NOT EXISTS device_types (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    device_type VARCHAR(255) NOT NULL COLLATE NOCASE,
+    specification TEXT,
+    description TEXT
+);
+
+CREATE TABLE IF NOT EXISTS departments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL COLLATE NOCASE
+);
+
+CREATE TABLE IF NOT EXISTS employees (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    first_name VARCHAR(255) NOT NULL COLLATE NOCASE,
+    last_name VARCHAR(255) NOT NULL COLLATE NOCASE,
+    department_id INT REFERENCES departments(id)
+);
+
+CREATE TABLE IF NOT EXISTS device_models (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model VARCHAR(255) NOT NULL COLLATE NOCASE,
+    manufacturer_id INT REFERENCES manufacturer(id),
+    device_type_id INT REFERENCES device_types(id),
+    db VARCHAR(255) COLLATE NOCASE,
+    key_performance JSON
+);
+
+CREATE TABLE IF NOT EXISTS devices (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_id INT NOT NULL REFERENCES device_models(id),
+    serial_number VARCHAR(255) COLLATE NOCASE,
+    last_maintenance TIMESTAMP NULL
+);
+
+CREATE TABLE IF NOT EXISTS devices_issued (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    device_id INT NOT NULL UNIQUE REFERENCES devices(id),
+    employee_id INT REFERENCES employees(id),
+    department_id INT NOT NULL REFERENCES departments(id),
+    date_of_issue TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS device_model_attributes (
+    model_id INT NOT NULL REFERENCES device_models(id) ON DELETE CASCADE,
+    attribute VARCHAR(255) NOT NULL COLLATE NOCASE,
+    value_text VARCHAR(255) COLLATE NOCASE,
+    value_number DOUBLE,
+    PRIMARY KEY (model_id, attribute)
+);
+
+CREATE TABLE IF NOT EXISTS audit_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    changed_at TIMESTAMP NOT NULL,
+    table_name VARCHAR(64) NOT NULL,
+    row_id INT NOT NULL,
+    operation VARCHAR(6) NOT NULL,
+    session_id VARCHAR(64),
+    before_image TEXT,
+    after_image TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_devices_serial_number ON devices (serial_number);
+CREATE INDEX IF NOT EXISTS idx_devices_last_maintenance ON devices (last_maintenance);
+CREATE INDEX IF NOT EXISTS idx_devices_issued_date_of_issue ON devices_issued (date_of_issue);
+CREATE INDEX IF NOT EXISTS idx_device_models_model ON device_models (model);
+CREATE INDEX IF NOT EXISTS idx_employees_name ON employees (last_name, first_name);
+CREATE INDEX IF NOT EXISTS idx_departments_name ON departments (name);
+CREATE INDEX IF NOT EXISTS idx_manufacturer_name ON manufacturer (name);
+CREATE INDEX IF NOT EXISTS idx_device_types_device_type ON device_types (device_type);
+CREATE INDEX IF NOT EXISTS idx_device_model_attributes_number
+    ON device_model_attributes (attribute, value_number, value_text, model_id);
+CREATE INDEX IF NOT EXISTS idx_device_model_attributes_text ON device_model_attributes (attribute, value_text, model_id);
+CREATE INDEX IF NOT EXISTS idx_audit_log_row ON audit_log (table_name, row_id, changed_at);
+CREATE INDEX IF NOT EXISTS idx_audit_log_changed_at ON audit_log (changed_at);
+"""
+
+_PLACEHOLDER = re.compile(r'%([s%])')
+
+
+def _parse_timestamp(value: bytes) -> Any:
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+# TIMESTAMP columns round-trip as datetime like they do with mysql-connector
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter('TIMESTAMP', _parse_timestamp)
+
+
+class Backend:
+    """
+    The database engine behind Database: opens connections and provides the SQL that differs
+    between engines. Connections follow the mysql-connector API (cursor(dictionary=...),
+    %s placeholders, start_transaction/commit/rollback, connection_id).
+    """
+
+    name = ''
+    # Errors after which a connection must not be handed out again
+    disconnect_errors: tuple = ()
+    # Base class of the errors a statement raises for rejected data, e.g. constraint violations
+    database_error: type = Exception
+    # Appended to a SELECT in a transaction to lock the rows it reads until the transaction ends
+    row_lock = ''
+    # Whether DELETE ... RETURNING * reports the deleted rows, saving the read of the audit log's before image
+    delete_returning = False
+    # Statements creating the device_model_attributes side table if it is missing (see attributes.py)
+    attribute_table_ddl: tuple = ()
+
+    def connect(self) -> Any:
+        raise NotImplementedError
+
+    def is_healthy(self, conn: Any) -> bool:
+        raise NotImplementedError
+
+    def kill_query(self, connection_id: int):
+        """Abort the statement running on another connection, leaving that connection usable"""
+        raise NotImplementedError
+
+    def prepare(self, conn: Any, dictionary: bool) -> Any:
+        """A cursor that keeps the statement it executes prepared, for a PreparedStatementCache"""
+        return conn.cursor(dictionary=dictionary)
+
+    def get_columns(self, cursor: Any, table_name: str) -> List[Dict[str, Any]]:
+        """Normalized column metadata of a table, read through a dictionary cursor"""
+        raise NotImplementedError
+
+    def get_index_names(self, cursor: Any) -> Set[tuple[str, str]]:
+        """(table, index name) of every index in the database"""
+        raise NotImplementedError
+
+    def get_fulltext_columns(self, cursor: Any, table_name: str) -> List[str]:
+        """Columns of the first full-text index on a table, empty if the engine or table has none"""
+        return []
+
+    def estimate_rows(self, cursor: Any, table_name: str) -> Optional[int]:
+        """Row count estimate from table statistics, None if the engine keeps none"""
+        return None
+
+    def replica_lag(self, cursor: Any) -> Optional[float]:
+        """Seconds a read replica is behind its primary, None if unknown or the server does not replicate"""
+        return None
+
+    def version(self, cursor: Any) -> str:
+        raise NotImplementedError
+
+
+class MySQLBackend(Backend):
+    """MySQL through mysql-connector, configured by the DB_* environment variables plus `config` overrides"""
+
+    name = 'mysql'
+    row_lock = ' FOR UPDATE'
+    # The definition from docker/init.sql, for databases created before the table existed
+    attribute_table_ddl = ("""
+        CREATE TABLE IF NOT EXISTS device_model_attributes (
+            model_id INT NOT NULL,
+            attribute VARCHAR(255) NOT NULL,
+            value_text VARCHAR(255),
+            value_number DOUBLE,
+            PRIMARY KEY (model_id, attribute),
+            FOREIGN KEY (model_id) REFERENCES device_models(id) ON DELETE CASCADE,
+            INDEX idx_device_model_attributes_number (attribute, value_number, value_text, model_id),
+            INDEX idx_device_model_attributes_text (attribute, value_text, model_id)
+        )
+    """,)
+
+    def __init__(self, **config: Any):
+        # Imported here so the SQLite backend works without the MySQL driver installed
+        import mysql.connector
+        self._connector = mysql.connector
+        self.disconnect_errors = (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError)
+        self.database_error = mysql.connector.errors.DatabaseError
+        self.config = {
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'port': int(os.getenv('DB_PORT', '3306')),
+            'user': os.getenv('DB_USER', 'root'),
+            'password': os.getenv('DB_PASSWORD', 'secret'),
+            'database': os.getenv('DB_NAME', 'scooteq_database'),
+            # Every statement commits on its own unless a transaction is started explicitly,
+            # so a pooled connection never carries a stale read snapshot into its next use
+            'autocommit': True
+        }
+        # A local server can be reached through its socket file instead of TCP
+        if os.getenv('DB_UNIX_SOCKET'):
+            self.config['unix_socket'] = os.getenv('DB_UNIX_SOCKET')
+        self.config.update(config)
+
+    def connect(self) -> Any:
+        return self._connector.connect(**self.config)
+
+    def is_healthy(self, conn: Any) -> bool:
+        return conn.is_connected()
+
+    def prepare(self, conn: Any, dictionary: bool) -> Any:
+        # Server-side prepared statement: parsed once, then executed over the binary protocol
+        return conn.cursor(prepared=True, dictionary=dictionary)
+
+    def kill_query(self, connection_id: int):
+        # Use a dedicated connection, the pool may be exhausted by the query being killed
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"KILL QUERY {int(connection_id)}")
+            cursor.close()
+        finally:
+            conn.close()
+
+    def get_columns(self, cursor: Any, table_name: str) -> List[Dict[str, Any]]:
+        def text(value: Any) -> str:
+            if isinstance(value, (bytes, bytearray)):
+                return value.decode()
+            return value or ''
+
+        cursor.execute(f"DESCRIBE {quote_identifier(table_name)}")
+        return [{
+            'name': text(row['Field']),
+            'type': text(row['Type']).lower(),
+            'nullable': text(row['Null']) == 'YES',
+            'key': text(row.get('Key')),
+            'default': row.get('Default'),
+            'extra': text(row.get('Extra')),
+        } for row in cursor.fetchall()]
+
+    def get_index_names(self, cursor: Any) -> Set[tuple[str, str]]:
+        cursor.execute(
+            "SELECT DISTINCT TABLE_NAME as table_name, INDEX_NAME as index_name "
+            "FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE()"
+        )
+        return {(row['table_name'], row['index_name']) for row in cursor.fetchall()}
+
+    def get_fulltext_columns(self, cursor: Any, table_name: str) -> List[str]:
+        cursor.execute(
+            "SELECT INDEX_NAME as index_name, COLUMN_NAME as column_name "
+            "FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_TYPE = 'FULLTEXT' "
+            "ORDER BY INDEX_NAME, SEQ_IN_INDEX",
+            (table_name,)
+        )
+        rows = cursor.fetchall()
+        return [row['column_name'] for row in rows if row['index_name'] == rows[0]['index_name']]
+
+    def estimate_rows(self, cursor: Any, table_name: str) -> Optional[int]:
+        cursor.execute(
+            "SELECT TABLE_ROWS as count FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table_name,)
+        )
+        row = cursor.fetchone()
+        return int(row['count']) if row and row['count'] is not None else None
+
+    def replica_lag(self, cursor: Any) -> Optional[float]:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except self.database_error:
+            # Servers before MySQL 8.0.22
+            cursor.execute("SHOW SLAVE STATUS")
+        row = cursor.fetchone()
+        if not row:
+            return None
+        lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+        return float(lag) if lag is not None else None
+
+    def version(self, cursor: Any) -> str:
+        cursor.execute("SELECT VERSION() as version")
+        return f"MySQL {cursor.fetchone()['version']}"
+
+
+class SQLiteBackend(Backend):
+    """
+    Embedded SQLite database file in WAL mode, so readers do not block the writer.
+    The app schema is created on the first connection if the file does not have it yet.
+    """
+
+    name = 'sqlite'
+    # No row locks: a transaction whose rows another connection changed after it read them fails on its write
+    row_lock = ''
+    delete_returning = sqlite3.sqlite_version_info >= (3, 35, 0)
+    disconnect_errors = (sqlite3.InterfaceError, sqlite3.ProgrammingError)
+    database_error = sqlite3.DatabaseError
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._ids = itertools.count(1)
+        # Open connections by id, for kill_query
+        self._connections: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def connect(self) -> 'SQLiteConnection':
+        # prepare() needs no override: sqlite3 keeps the compiled statements of a connection itself
+        raw = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                              check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES,
+                              cached_statements=256)
+        raw.execute("PRAGMA journal_mode=WAL")
+        raw.execute("PRAGMA synchronous=NORMAL")
+        raw.execute("PRAGMA foreign_keys=ON")
+        with self._lock:
+            if not self._schema_ready:
+                raw.executescript(SQLITE_SCHEMA)
+                self._schema_ready = True
+            conn = SQLiteConnection(raw, next(self._ids))
+            self._connections[conn.connection_id] = conn
+        return conn
+
+    def is_healthy(self, conn: 'SQLiteConnection') -> bool:
+        try:
+            conn.cursor().execute("SELECT 1").close()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def kill_query(self, connection_id: int):
+        conn = self._connections.get(connection_id)
+        if conn is not None:
+            conn.interrupt()
+
+    def get_columns(self, cursor: Any, table_name: str) -> List[Dict[str, Any]]:
+        cursor.execute(f"PRAGMA table_info({quote_identifier(table_name)})")
+        columns = cursor.fetchall()
+        if not columns:
+            raise sqlite3.OperationalError(f'no such table: {table_name}')
+        # Like DESCRIBE, report an index on the column it starts with: UNI for a unique single-column index
+        keys = {}
+        cursor.execute(f"PRAGMA index_list({quote_identifier(table_name)})")
+        for index in cursor.fetchall():
+            cursor.execute(f"PRAGMA index_info({quote_identifier(index['name'])})")
+            indexed = [row['name'] for row in cursor.fetchall()]
+            if indexed:
+                unique = index['unique'] and len(indexed) == 1
+                keys[indexed[0]] = 'UNI' if unique or keys.get(indexed[0]) == 'UNI' else 'MUL'
+
+        def normalize(row: Dict[str, Any]) -> Dict[str, Any]:
+            column_type = (row['type'] or '').lower()
+            primary = bool(row['pk'])
+            return {
+                'name': row['name'],
+                'type': 'int' if column_type == 'integer' else column_type,
+                'nullable': not row['notnull'] and not primary,
+                'key': 'PRI' if primary else keys.get(row['name'], ''),
+                'default': _literal(row['dflt_value']),
+                'extra': 'auto_increment' if primary and column_type == 'integer' else '',
+            }
+
+        return [normalize(row) for row in columns]
+
+    def get_index_names(self, cursor: Any) -> Set[tuple[str, str]]:
+        cursor.execute("SELECT tbl_name as table_name, name as index_name FROM sqlite_master WHERE type = 'index'")
+        return {(row['table_name'], row['index_name']) for row in cursor.fetchall()}
+
+    def version(self, cursor: Any) -> str:
+        return f'SQLite {sqlite3.sqlite_version}'
+
+
+class SQLiteConnection:
+    """sqlite3 connection with the parts of the mysql-connector connection API that Database uses"""
+
+    def __init__(self, conn: sqlite3.Connection, connection_id: int):
+        self._conn = conn
+        self.connection_id = connection_id
+
+    def cursor(self, dictionary: bool = False, buffered: bool = True) -> 'SQLiteCursor':
+        # SQLite cursors step through results lazily, so buffered makes no difference
+        return SQLiteCursor(self._conn.cursor(), dictionary)
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._conn.in_transaction
+
+    def start_transaction(self):
+        self._conn.execute("BEGIN")
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def interrupt(self):
+        self._conn.interrupt()
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLiteCursor:
+    """sqlite3 cursor accepting mysql-connector style %s placeholders, optionally returning rows as dicts"""
+
+    def __init__(self, cursor: sqlite3.Cursor, dictionary: bool = False):
+        self._cursor = cursor
+        if dictionary:
+            cursor.row_factory = _dict_row
+
+    def execute(self, operation: str, params: Any = None):
+        self._cursor.execute(_placeholders(operation), params or ())
+        return self
+
+    def executemany(self, operation: str, seq_params: Iterable):
+        self._cursor.executemany(_placeholders(operation), seq_params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size: int = 1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+    def __getattr__(self, name: str) -> Any:
+        # rowcount, lastrowid, description
+        return getattr(self._cursor, name)
+
+
+def create_backend() -> Backend:
+    """The backend selected by DB_BACKEND: 'mysql' (default) or 'sqlite' with the database file DB_PATH"""
+    kind = os.getenv('DB_BACKEND', 'mysql')
+    if kind == 'mysql':
+        return MySQLBackend()
+    if kind == 'sqlite':
+        return SQLiteBackend(os.getenv('DB_PATH', 'scooteq.sqlite3'))
+    raise ValueError(f'Unknown DB_BACKEND: {kind!r}')
+
+
+def create_replicas(primary: Backend) -> List[tuple[str, Backend, float]]:
+    """
+    Read replicas listed in DB_REPLICAS as (name, backend, weight), of the same engine as the primary.
+    Entries are comma-separated, each optionally followed by '*<weight>' (default 1):
+    'host[:port]' or a socket file path for MySQL (same user, password and database as the primary),
+    a database file path for SQLite.
+    """
+    replicas = []
+    for entry in os.getenv('DB_REPLICAS', '').split(','):
+        address, _, weight = (part.strip() for part in entry.partition('*'))
+        if not address:
+            continue
+        if primary.name == 'sqlite':
+            backend = SQLiteBackend(address)
+        elif address.startswith('/'):
+            backend = MySQLBackend(unix_socket=address)
+        else:
+            host, _, port = address.partition(':')
+            backend = MySQLBackend(host=host, port=int(port or 3306))
+            # The primary's DB_UNIX_SOCKET would take precedence over the replica's host
+            backend.config.pop('unix_socket', None)
+        replicas.append((address, backend, float(weight or 1)))
+    return replicas
+
+
+@lru_cache(maxsize=1024)
+def _placeholders(statement: str) -> str:
+    """Rewrite %s placeholders (and %% escapes) of a mysql-connector statement to sqlite3's qmark style"""
+    return _PLACEHOLDER.sub(lambda m: '?' if m.group(1) == 's' else '%', statement)
+
+
+def _dict_row(cursor: sqlite3.Cursor, row: tuple) -> Dict[str, Any]:
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+def _literal(value: Optional[str]) -> Any:
+    # PRAGMA table_info reports defaults as SQL text, DESCRIBE as the plain value
+    if value is not None and len(value) >= 2 and value[0] == value[-1] == "'":
+        return value[1:-1].replace("''", "'")
+    return value
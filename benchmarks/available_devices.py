@@ -0,0 +1,68 @@
+"""
+Benchmark of the available devices query behind the Devices Issued "New Entry" dialog:
+the former NOT IN subquery against the LEFT JOIN anti-join used by Database.get_available_devices,
+for fleets of 1k to 1M devices with half of them issued. Writes the timings as JSON.
+
+    python benchmarks/available_devices.py --sizes 1000 10000 100000 1000000 --output available_devices.json
+"""
+import argparse
+
+import synthetic
+from harness import environment, measure, write_report
+
+QUERIES = {
+    'not_in_all': """
+        SELECT d.id, dm.model, d.serial_number
+        FROM devices d
+        JOIN device_models dm ON d.model_id = dm.id
+        WHERE d.id NOT IN (SELECT device_id FROM devices_issued)
+        ORDER BY dm.model
+    """,
+    'anti_join_all': """
+        SELECT d.id, dm.model, d.serial_number
+        FROM devices d
+        JOIN device_models dm ON d.model_id = dm.id
+        LEFT JOIN devices_issued di ON di.device_id = d.id
+        WHERE di.id IS NULL
+        ORDER BY dm.model, d.id
+    """,
+}
+
+
+def run(sizes, repeat: int) -> dict:
+    results = []
+    for size in sizes:
+        conn = synthetic.create_database()
+        synthetic.populate(conn, size)
+        report_env = environment(conn)
+        cursor = conn.cursor()
+
+        def query(sql):
+            return lambda: (cursor.execute(sql), cursor.fetchall())
+
+        # The app's own method for the paged dropdown, pointed at the scratch database
+        db = synthetic.database()
+        timings = {name: measure(query(sql), repeat) for name, sql in QUERIES.items()}
+        timings['anti_join_page'] = measure(lambda: db.get_available_devices(limit=50), repeat)
+        timings['anti_join_page_deep'] = measure(lambda: db.get_available_devices(limit=50, offset=size // 4), repeat)
+        timings['anti_join_search_page'] = measure(lambda: db.get_available_devices(search='SN-0000', limit=50), repeat)
+
+        cursor.execute("SELECT COUNT(*) FROM devices d LEFT JOIN devices_issued di ON di.device_id = d.id WHERE di.id IS NULL")
+        available = cursor.fetchone()[0]
+        results.append({'devices': size, 'available': available, 'timings': timings})
+        print(f'{size:>9} devices: ' + ', '.join(f"{name} {stats['median_ms']} ms" for name, stats in timings.items()))
+        cursor.close()
+        conn.close()
+        db.pool.close()
+
+    synthetic.drop_database()
+    return {'benchmark': 'available_devices', 'environment': report_env, 'repeat': repeat, 'results': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='available_devices.json')
+    args = parser.parse_args()
+    write_report(args.output, run(args.sizes, args.repeat))
@@ -0,0 +1,60 @@
+"""
+Compare two benchmark reports of the same script, e.g. from two commits, by median time per
+measurement and fleet size. Exits with status 1 if any measurement got slower than the threshold.
+
+    python benchmarks/compare.py baseline.json hot_paths.json --threshold 1.2
+"""
+import argparse
+import json
+import sys
+
+
+def flatten(timings: dict, prefix: str = '') -> dict:
+    """Measurement name -> median ms, for timings nested in groups"""
+    flat = {}
+    for name, value in timings.items():
+        if 'median_ms' in value:
+            flat[prefix + name] = value['median_ms']
+        else:
+            flat.update(flatten(value, f'{prefix}{name}.'))
+    return flat
+
+
+def medians(report: dict) -> dict:
+    return {(result['devices'], name): ms
+            for result in report['results'] for name, ms in flatten(result['timings']).items()}
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_ms: float) -> list:
+    """(devices, name, baseline ms, current ms, ratio, regressed) for every measurement in both reports"""
+    if baseline['benchmark'] != current['benchmark']:
+        raise ValueError(f"Reports of different benchmarks: {baseline['benchmark']} and {current['benchmark']}")
+    before, after = medians(baseline), medians(current)
+    rows = []
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        # Sub-millisecond timings are noise-dominated, compare them against min_ms instead
+        ratio = max(new, min_ms) / max(old, min_ms)
+        rows.append((*key, old, new, ratio, ratio > threshold))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=1.2, help='slowdown ratio reported as a regression')
+    parser.add_argument('--min-ms', type=float, default=0.5, help='timings below this count as this')
+    args = parser.parse_args()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    print(f"{baseline['environment'].get('commit', '')[:10]} -> {current['environment'].get('commit', '')[:10]}")
+    regressions = 0
+    for devices, name, old, new, ratio, regressed in compare(baseline, current, args.threshold, args.min_ms):
+        regressions += regressed
+        print(f"{'REGRESSION' if regressed else '':>10} {devices:>9} {name:<55} {old:>10.3f} {new:>10.3f} ms  x{ratio:.2f}")
+    print(f'{regressions} regression(s) above x{args.threshold}')
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,60 @@
+"""
+Timing helpers shared by the benchmark scripts, and the environment recorded with every report
+so results of different commits can be compared (see compare.py).
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from synthetic import ROOT, backend
+
+
+def measure(func, repeat: int = 5, warmup: int = 1) -> dict:
+    """Run func `warmup` times untimed, then `repeat` times; wall clock timings in milliseconds"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'min_ms': round(timings[0], 3),
+        'runs': repeat,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def environment(conn) -> dict:
+    """Commit, interpreter and database engine the benchmark ran on"""
+    cursor = conn.cursor(dictionary=True)
+    version = backend().version(cursor)
+    cursor.close()
+    return {
+        'commit': git_commit(),
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'database': version,
+    }
+
+
+def write_report(path: str, report: dict):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Wrote {path}')
@@ -0,0 +1,173 @@
+"""
+Benchmark of the app's hot paths on synthetic data, per fleet size: table pages at several depths
+(get_table_data and get_table_page) and by key_performance attribute, the row formatting of
+render_table_page, foreign key label resolution, the queries behind the new/edit dialogs and
+their dropdowns, and single and batched writes.
+Writes the timings with the commit they ran on as JSON; compare.py diffs two such reports.
+
+    python benchmarks/hot_paths.py --sizes 1000 100000 1000000 --output hot_paths.json
+"""
+import argparse
+import time
+
+import synthetic
+from database import ColumnFilter, encode_cursor
+from formatting import FOREIGN_KEY_LABELS, build_foreign_key_labels, format_table_rows
+from harness import environment, measure, write_report
+
+# Tables paged through in the depth benchmarks, and the rows of one page (the UI default)
+PAGED_TABLES = ('devices', 'devices_issued', 'employees')
+PAGE_SIZE = 25
+
+# Page sizes offered by the UI, used for the row formatting benchmark
+FORMAT_PAGE_SIZES = (25, 100, 500)
+FORMAT_TABLES = ('devices', 'devices_issued', 'device_models')
+
+
+def resolve_labels(db, table_name: str, rows: list) -> dict:
+    # Same work as main.resolve_foreign_keys, without the event loop in between
+    labels = {}
+    for col in db.schema.get(table_name).column_names:
+        if col in FOREIGN_KEY_LABELS:
+            labels[col] = build_foreign_key_labels(col, db.get_foreign_key_rows(col, [row.get(col) for row in rows]))
+    return labels
+
+
+def page_reads(db, rows: dict, repeat: int) -> dict:
+    timings = {}
+    for table in PAGED_TABLES:
+        count = rows[table]
+        depths = {'first': 0, '10pct': count // 10, 'middle': count // 2, 'last': max(0, count - PAGE_SIZE)}
+        for depth, offset in depths.items():
+            timings[f'get_table_data.{table}.{depth}'] = measure(
+                lambda: db.get_table_data(table, PAGE_SIZE, offset), repeat)
+            timings[f'get_table_page.{table}.offset_{depth}'] = measure(
+                lambda: db.get_table_page(table, PAGE_SIZE, offset=offset), repeat)
+        # Generated ids are contiguous, so the middle page starts after id count / 2
+        cursor = encode_cursor('next', count // 2)
+        timings[f'get_table_page.{table}.keyset_middle'] = measure(
+            lambda: db.get_table_page(table, PAGE_SIZE, cursor=cursor), repeat)
+    timings['get_table_page.devices.sorted_serial_number_middle'] = measure(
+        lambda: db.get_table_page('devices', PAGE_SIZE, offset=rows['devices'] // 2, sort_by='serial_number'), repeat)
+    # Device models by key_performance attribute, through the attribute side table
+    in_range = (ColumnFilter('kp.range_km', 'range', 50, 80),)
+    timings['get_table_page.device_models.kp_range_filter'] = measure(
+        lambda: db.get_table_page('device_models', PAGE_SIZE, filters=in_range), repeat)
+    timings['get_table_page.device_models.kp_sorted_middle'] = measure(
+        lambda: db.get_table_page('device_models', PAGE_SIZE, offset=rows['device_models'] // 4,
+                                  sort_by='kp.battery_wh', descending=True), repeat)
+    return timings
+
+
+def formatting(db, repeat: int) -> dict:
+    timings = {}
+    for table in FORMAT_TABLES:
+        column_names = db.schema.get(table).column_names
+        for size in FORMAT_PAGE_SIZES:
+            data = db.get_table_page(table, size).rows
+            labels = resolve_labels(db, table, data)
+            timings[f'format_table_rows.{table}.{size}'] = measure(
+                lambda: format_table_rows(column_names, data, labels), repeat)
+    return timings
+
+
+def foreign_keys(db, repeat: int) -> dict:
+    timings = {}
+    for table in ('devices', 'devices_issued', 'device_models', 'employees'):
+        data = db.get_table_page(table, PAGE_SIZE).rows
+        # Cold: reference tables loaded (or queried, when too large to cache) for the page
+        timings[f'resolve_labels.{table}.cold'] = measure(
+            lambda: (db.lookups.clear(), resolve_labels(db, table, data)), repeat)
+        timings[f'resolve_labels.{table}.warm'] = measure(lambda: resolve_labels(db, table, data), repeat)
+    return timings
+
+
+def dialogs(db, rows: dict, repeat: int) -> dict:
+    # Opening a dialog only resolves the labels of the current values (load=False);
+    # dropdown options are queried when a dropdown is opened, typed into or scrolled
+    issued = db.get_row_by_id('devices_issued', rows['devices_issued'] // 2)
+    model = db.get_row_by_id('device_models', rows['device_models'] // 2)
+
+    def open_edit(table_name: str, row_id: int):
+        row = db.get_row_by_id(table_name, row_id)
+        for col in db.schema.get(table_name).column_names:
+            if col in FOREIGN_KEY_LABELS and row.get(col) is not None:
+                db.get_foreign_key_rows(col, [row[col]], load=False)
+        return row
+
+    return {
+        'edit_devices_issued.open': measure(lambda: open_edit('devices_issued', issued['id']), repeat),
+        'edit_device_models.open': measure(
+            lambda: (open_edit('device_models', model['id']), db.get_device_type_by_id(model['device_type_id'])),
+            repeat),
+        'new_devices_issued.device_dropdown': measure(lambda: db.get_available_devices(limit=50), repeat),
+        'new_devices_issued.device_dropdown_deep': measure(
+            lambda: db.get_available_devices(limit=50, offset=rows['devices'] // 4), repeat),
+        'new_devices_issued.device_search': measure(lambda: db.get_available_devices(search='SN-0001', limit=50), repeat),
+        'new_devices_issued.employee_dropdown': measure(lambda: db.search_foreign_key('employee_id', '', 50, 0), repeat),
+        'new_devices_issued.employee_search': measure(lambda: db.search_foreign_key('employee_id', 'Schm', 50, 0), repeat),
+        'new_devices_issued.employee_picked': measure(lambda: db.get_employee_by_id(issued['employee_id'] or 1), repeat),
+        'new_device_models.model_dropdown': measure(lambda: db.search_foreign_key('model_id', '', 50, 0), repeat),
+        'new_device_models.device_type_picked': measure(lambda: db.get_device_type_by_id(model['device_type_id']), repeat),
+    }
+
+
+def writes(db, rows: dict, repeat: int) -> dict:
+    inserted = []
+    serials = iter(range(10 ** 9))
+    row_id = rows['devices'] // 2
+
+    def insert():
+        inserted.append(db.insert_row('devices', {'model_id': 1, 'serial_number': f'BENCH-{next(serials)}'}))
+
+    def insert_batch():
+        result = db.insert_rows('devices', [{'model_id': 1, 'serial_number': f'BENCH-{next(serials)}'} for _ in range(1000)])
+        assert not result.errors, result.errors[:3]
+
+    return {
+        'insert_row.devices': measure(insert, repeat),
+        'update_row.devices': measure(
+            lambda: db.update_row('devices', row_id, {'last_maintenance': time.strftime('%Y-%m-%d %H:%M:%S')}), repeat),
+        # Deletes the rows inserted above, one per run
+        'delete_row.devices': measure(lambda: db.delete_row('devices', inserted.pop()), repeat),
+        'insert_rows.devices.1000': measure(insert_batch, repeat),
+    }
+
+
+def run(sizes, repeat: int, seed: int) -> dict:
+    results = []
+    for size in sizes:
+        start = time.perf_counter()
+        conn = synthetic.create_database()
+        rows = synthetic.populate(conn, size, seed=seed)
+        load_seconds = round(time.perf_counter() - start, 1)
+        report_env = environment(conn)
+        conn.close()
+
+        db = synthetic.database()
+        db.schema.load(synthetic.TABLES)
+        timings = {}
+        for group, timed in (('pages', lambda: page_reads(db, rows, repeat)),
+                             ('formatting', lambda: formatting(db, repeat)),
+                             ('foreign_keys', lambda: foreign_keys(db, repeat)),
+                             ('dialogs', lambda: dialogs(db, rows, repeat)),
+                             ('writes', lambda: writes(db, rows, repeat))):
+            timings[group] = timed()
+            print(f'{size:>9} devices, {group}: ' + ', '.join(
+                f"{name} {stats['median_ms']} ms" for name, stats in timings[group].items()))
+        results.append({'devices': size, 'rows': rows, 'load_seconds': load_seconds, 'timings': timings})
+        db.pool.close()
+
+    synthetic.drop_database()
+    return {'benchmark': 'hot_paths', 'environment': report_env, 'seed': seed, 'repeat': repeat,
+            'page_size': PAGE_SIZE, 'results': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='hot_paths.json')
+    args = parser.parse_args()
+    write_report(args.output, run(args.sizes, args.repeat, args.seed))
@@ -0,0 +1,245 @@
+"""
+Synthetic data for benchmarks: a scratch database with the app's schema (docker/init.sql)
+filled with generated rows. Connection settings come from the same DB_* environment
+variables as the app (DB_UNIX_SOCKET for a local server without networking);
+the scratch database is BENCH_DB_NAME (default: scooteq_bench). With BENCH_BACKEND=sqlite
+it is an embedded SQLite file in the temp directory instead, no server needed.
+
+    python benchmarks/synthetic.py --devices 1000000 --rows employees=50000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_FILE = os.path.join(ROOT, 'docker', 'init.sql')
+BENCH_DB_NAME = os.getenv('BENCH_DB_NAME', 'scooteq_bench')
+BENCH_BACKEND = os.getenv('BENCH_BACKEND', 'mysql')
+
+# Make the app modules importable from benchmark scripts
+sys.path.insert(0, ROOT)
+
+from attributes import ATTRIBUTE_TABLE, attribute_rows  # noqa: E402
+from backends import Backend, MySQLBackend, SQLiteBackend  # noqa: E402
+
+# Tables in load order, referenced tables first
+TABLES = ('manufacturer', 'device_types', 'departments', 'employees', 'device_models', 'devices', 'devices_issued')
+
+# key_performance attributes a device type specification can list, with a value generator each
+ATTRIBUTES = {
+    'range_km': lambda rng: rng.randint(15, 120),
+    'max_speed_kmh': lambda rng: rng.choice((20, 25, 45)),
+    'weight_kg': lambda rng: round(rng.uniform(9, 35), 1),
+    'battery_wh': lambda rng: rng.choice((280, 360, 460, 540, 720)),
+    'charging_time_h': lambda rng: round(rng.uniform(3, 9), 1),
+    'max_load_kg': lambda rng: rng.choice((100, 120, 150, 200)),
+    'motor_power_w': lambda rng: rng.choice((250, 350, 500, 800)),
+    'wheel_size_in': lambda rng: rng.choice((8.5, 10, 12, 20, 28)),
+    'ip_rating': lambda rng: rng.choice(('IP54', 'IP55', 'IP65', 'IP67')),
+}
+
+DEVICE_TYPE_NAMES = ('E-Scooter', 'E-Bike', 'Cargo Bike', 'E-Moped', 'Hoverboard', 'Electric Skateboard')
+FIRST_NAMES = ('Anna', 'Ben', 'Clara', 'David', 'Elif', 'Finn', 'Greta', 'Hannah', 'Ivan', 'Jonas',
+               'Katrin', 'Lukas', 'Mia', 'Noah', 'Olga', 'Paul', 'Rosa', 'Sven', 'Tina', 'Yusuf')
+LAST_NAMES = ('Müller', 'Schmidt', 'Schneider', 'Fischer', 'Weber', 'Meyer', 'Wagner', 'Becker', 'Schulz',
+              'Hoffmann', 'Koch', 'Richter', 'Klein', 'Wolf', 'Neumann', 'Schwarz', 'Braun', 'Zimmermann')
+
+
+def backend(name: str = BENCH_DB_NAME) -> Backend:
+    """Backend of the scratch database"""
+    if BENCH_BACKEND == 'sqlite':
+        return SQLiteBackend(os.path.join(tempfile.gettempdir(), f'{name}.sqlite3'))
+    return MySQLBackend(database=name)
+
+
+def connect(database: str = None):
+    """Connection to the MySQL server, using the given database if any"""
+    server = MySQLBackend()
+    server.config.pop('database')
+    if database:
+        server.config['database'] = database
+    return server.connect()
+
+
+def create_database(name: str = BENCH_DB_NAME):
+    """(Re)create the scratch database with the app schema, returns a connection to it"""
+    if BENCH_BACKEND == 'sqlite':
+        drop_database(name)
+        # The SQLite backend creates the schema on its first connection
+        return backend(name).connect()
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {name}")
+    cursor.execute(f"CREATE DATABASE {name}")
+    cursor.execute(f"USE {name}")
+    with open(SCHEMA_FILE) as f:
+        script = '\n'.join(line for line in f if not line.lstrip().startswith('--'))
+    for statement in script.split(';'):
+        if statement.strip():
+            cursor.execute(statement)
+    cursor.close()
+    return conn
+
+
+def drop_database(name: str = BENCH_DB_NAME):
+    if BENCH_BACKEND == 'sqlite':
+        path = backend(name).path
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {name}")
+    cursor.close()
+    conn.close()
+
+
+def database(name: str = BENCH_DB_NAME):
+    """The app's Database class pointed at the scratch database"""
+    from database import Database
+    return Database(backend(name))
+
+
+def row_counts(devices: int, **overrides: int) -> dict:
+    """
+    Rows per table for a fleet of `devices` devices, with the fan-out of a typical
+    rental fleet: about 10 devices per employee and 1000 per model. Any table can be overridden.
+    """
+    counts = {
+        'manufacturer': max(20, devices // 50000),
+        'device_types': len(DEVICE_TYPE_NAMES) * 2,
+        'departments': max(20, devices // 20000),
+        'employees': max(100, devices // 10),
+        'device_models': max(200, devices // 1000),
+        'devices': devices,
+    }
+    counts.update(overrides)
+    return counts
+
+
+def skewed_weights(count: int, rng: random.Random) -> list:
+    """Cumulative weights so a few referenced rows get most references (Pareto-like), as popular models do"""
+    weights, total = [], 0.0
+    for _ in range(count):
+        total += rng.paretovariate(1.2)
+        weights.append(total)
+    return weights
+
+
+def populate(conn, devices: int, issued_ratio: float = 0.5, seed: int = 42, batch_size: int = 10000,
+             counts: dict = None) -> dict:
+    """
+    Fill the scratch database with `devices` devices, a share `issued_ratio` of them issued,
+    and reference tables scaled by row_counts (overridden by `counts`). Models carry
+    key_performance values for exactly the attributes their device type specifies, mirrored
+    into the attribute side table as the app does. Deterministic for a given seed. Returns the number of rows loaded per table.
+    """
+    rng = random.Random(seed)
+    counts = row_counts(devices, **(counts or {}))
+    counts['devices_issued'] = int(counts['devices'] * issued_ratio)
+    cursor = conn.cursor()
+    # Bulk load: skip per-row constraint checks, the generator only emits valid references
+    if BENCH_BACKEND == 'sqlite':
+        cursor.execute("PRAGMA foreign_keys = OFF")
+    else:
+        cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+
+    def write(query: str, batch: list):
+        # One transaction per batch, SQLite would otherwise commit every row on its own
+        conn.start_transaction()
+        cursor.executemany(query, batch)
+        conn.commit()
+
+    def insert(table: str, columns: tuple, rows):
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                write(query, batch)
+                batch = []
+        if batch:
+            write(query, batch)
+
+    def references(count: int, weights: list, total: int):
+        # `total` ids between 1 and count drawn by the cumulative weights, generated per batch
+        for start in range(0, total, batch_size):
+            yield from (i + 1 for i in rng.choices(range(count), cum_weights=weights, k=min(batch_size, total - start)))
+
+    now = datetime(2025, 1, 1)
+    insert('manufacturer', ('name',), ((f'Manufacturer {i}',) for i in range(counts['manufacturer'])))
+
+    # Each device type specifies 3 to 7 attributes, so some key_performance cells collapse in the table
+    specifications = [rng.sample(sorted(ATTRIBUTES), rng.randint(3, 7)) for _ in range(counts['device_types'])]
+    insert('device_types', ('device_type', 'specification', 'description'),
+           ((f'{DEVICE_TYPE_NAMES[i % len(DEVICE_TYPE_NAMES)]} {i // len(DEVICE_TYPE_NAMES) + 1}',
+             ', '.join(spec), f'Synthetic device type {i}') for i, spec in enumerate(specifications)))
+    insert('departments', ('name',), ((f'Department {i}',) for i in range(counts['departments'])))
+
+    employee_departments = [rng.randint(1, counts['departments']) for _ in range(counts['employees'])]
+    insert('employees', ('first_name', 'last_name', 'department_id'),
+           ((rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), department) for department in employee_departments))
+
+    documents = []
+
+    def model(i: int) -> tuple:
+        device_type_id = rng.randint(1, counts['device_types'])
+        key_performance = {attr: str(ATTRIBUTES[attr](rng)) for attr in specifications[device_type_id - 1]}
+        documents.append(key_performance)
+        return (f'Model {i:05d}', rng.randint(1, counts['manufacturer']), device_type_id, json.dumps(key_performance))
+    insert('device_models', ('model', 'manufacturer_id', 'device_type_id', 'key_performance'),
+           (model(i) for i in range(counts['device_models'])))
+    attributes = [row for model_id, document in enumerate(documents, 1) for row in attribute_rows(model_id, document)]
+    insert(ATTRIBUTE_TABLE, ('model_id', 'attribute', 'value_text', 'value_number'), attributes)
+    counts[ATTRIBUTE_TABLE] = len(attributes)
+
+    model_weights = skewed_weights(counts['device_models'], rng)
+    maintenance = (None if rng.random() < 0.2 else now - timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60))
+                   for _ in range(counts['devices']))
+    insert('devices', ('model_id', 'serial_number', 'last_maintenance'),
+           ((model_id, f'SN-{i:08d}', last) for i, (model_id, last)
+            in enumerate(zip(references(counts['device_models'], model_weights, counts['devices']), maintenance))))
+
+    # Devices go to employees of a department; a few are issued to a department without an employee
+    issued = rng.sample(range(1, counts['devices'] + 1), counts['devices_issued'])
+
+    def issue(device_id: int) -> tuple:
+        issued_at = now - timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+        if rng.random() < 0.05:
+            return device_id, None, rng.randint(1, counts['departments']), issued_at
+        employee_id = rng.randint(1, counts['employees'])
+        return device_id, employee_id, employee_departments[employee_id - 1], issued_at
+    insert('devices_issued', ('device_id', 'employee_id', 'department_id', 'date_of_issue'), (issue(d) for d in issued))
+
+    if BENCH_BACKEND == 'sqlite':
+        cursor.execute("PRAGMA foreign_keys = ON")
+        cursor.execute("ANALYZE")
+    else:
+        cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+        cursor.execute(f"ANALYZE TABLE {', '.join(TABLES + (ATTRIBUTE_TABLE,))}")
+        cursor.fetchall()
+    cursor.close()
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create the scratch database and fill it with synthetic data')
+    parser.add_argument('--devices', type=int, default=10000)
+    parser.add_argument('--issued-ratio', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--rows', nargs='*', default=[], metavar='TABLE=COUNT',
+                        help='override the rows generated for a reference table')
+    args = parser.parse_args()
+    overrides = {table: int(count) for table, count in (item.split('=', 1) for item in args.rows)}
+    start = time.perf_counter()
+    conn = create_database()
+    loaded = populate(conn, args.devices, args.issued_ratio, args.seed, counts=overrides)
+    conn.close()
+    print(f'Loaded {sum(loaded.values())} rows into {BENCH_DB_NAME} in {time.perf_counter() - start:.1f} s: '
+          + ', '.join(f'{table} {count}' for table, count in loaded.items()))
@@ -0,0 +1,284 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class LookupCache:
+    """
+    Process-wide cache for small reference tables (manufacturers, departments, ...).
+    Each entry is an id-indexed dict in query order, tagged with the tables it was
+    built from so a write only invalidates the entries that depend on that table.
+    Entries expire after `ttl` seconds; result sets larger than `max_rows` are not cached.
+    All entries together hold at most `max_total_rows` rows, the least recently used ones are
+    evicted to make room for a new entry.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_rows: int = 10000, max_total_rows: int = 50000):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.max_total_rows = max_total_rows
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[float, Tuple[str, ...], Dict[Any, Dict[str, Any]]]]' = OrderedDict()
+        self._rows = 0
+        self._oversize: Dict[str, float] = {}
+        # Invalidations per table (and of the whole cache), so a load that overlapped one is not stored
+        self._generations: Dict[str, int] = {}
+        self._cleared = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, name: str, loader: Callable[[], List[Dict[str, Any]]],
+            depends_on: Iterable[str]) -> Dict[Any, Dict[str, Any]]:
+        """Get an entry, loading it with `loader` if it is missing or expired"""
+        cached = self.peek(name)
+        if cached is not None:
+            return cached
+
+        depends_on = tuple(depends_on)
+        with self._lock:
+            self.misses += 1
+            generation = self._generation(depends_on)
+        rows = loader()
+        data = {row['id']: row for row in rows}
+        now = time.monotonic()
+        with self._lock:
+            if self._generation(depends_on) != generation:
+                # A write invalidated a table while it was being read, the rows may predate it
+                return data
+            if len(data) <= min(self.max_rows, self.max_total_rows):
+                self._remove(name)
+                self._entries[name] = (now, depends_on, data)
+                self._rows += len(data)
+                self._oversize.pop(name, None)
+                while self._rows > self.max_total_rows:
+                    self._remove(next(iter(self._entries)))
+                    self.evictions += 1
+            else:
+                self._oversize[name] = now
+        return data
+
+    def peek(self, name: str) -> Optional[Dict[Any, Dict[str, Any]]]:
+        """Get an entry only if it is cached and fresh"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            loaded_at, _, data = entry
+            if time.monotonic() - loaded_at > self.ttl:
+                self._remove(name)
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+            return data
+
+    def is_oversize(self, name: str) -> bool:
+        """Whether the last load of an entry was too large to cache"""
+        with self._lock:
+            loaded_at = self._oversize.get(name)
+            return loaded_at is not None and time.monotonic() - loaded_at <= self.ttl
+
+    def _generation(self, tables: Tuple[str, ...]) -> Tuple[int, ...]:
+        return (self._cleared,) + tuple(self._generations.get(t, 0) for t in tables)
+
+    def _remove(self, name: str):
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self._rows -= len(entry[2])
+
+    def invalidate(self, table_name: str):
+        """Drop every entry built from the given table"""
+        with self._lock:
+            self._generations[table_name] = self._generations.get(table_name, 0) + 1
+            for name in [n for n, (_, tables, _) in self._entries.items() if table_name in tables]:
+                self._remove(name)
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._cleared += 1
+            self._entries.clear()
+            self._rows = 0
+            self._oversize.clear()
+
+
+class RowCountCache:
+    """
+    Cached row count per table, used instead of COUNT(*) on every page view.
+    Writes adjust the cached counts in place; a background refresh recomputes
+    them periodically so drift from other writers is corrected.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Tuple[int, bool, float]] = {}
+
+    def get(self, table_name: str) -> Optional[Tuple[int, bool]]:
+        """Get (count, is_approximate) for a table, or None if unknown or expired"""
+        with self._lock:
+            entry = self._counts.get(table_name)
+            if entry is None or time.monotonic() - entry[2] > self.ttl:
+                return None
+            return entry[0], entry[1]
+
+    def set(self, table_name: str, count: int, approximate: bool = False):
+        with self._lock:
+            self._counts[table_name] = (count, approximate, time.monotonic())
+
+    def adjust(self, table_name: str, delta: int):
+        """Apply a known change (e.g. +1 on insert) without recounting"""
+        with self._lock:
+            entry = self._counts.get(table_name)
+            if entry is not None:
+                count, approximate, refreshed_at = entry
+                self._counts[table_name] = (max(0, count + delta), approximate, refreshed_at)
+
+    def invalidate(self, table_name: str):
+        with self._lock:
+            self._counts.pop(table_name, None)
+
+    def tables(self) -> List[str]:
+        """Tables with a cached count"""
+        with self._lock:
+            return list(self._counts)
+
+
+class WindowCache:
+    """
+    Small LRU cache of fetched row windows for one scrolling table view.
+    Keeps at most `max_windows` windows; the least recently used one is evicted first.
+    """
+
+    def __init__(self, max_windows: int = 8):
+        self.max_windows = max_windows
+        self._windows: 'OrderedDict[int, Any]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, index: int) -> Optional[Any]:
+        window = self._windows.get(index)
+        if window is None:
+            self.misses += 1
+            return None
+        self._windows.move_to_end(index)
+        self.hits += 1
+        return window
+
+    def put(self, index: int, window: Any):
+        self._windows[index] = window
+        self._windows.move_to_end(index)
+        while len(self._windows) > self.max_windows:
+            self._windows.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, index: int) -> bool:
+        return index in self._windows
+
+    def clear(self):
+        self._windows.clear()
+
+
+class TableVersions:
+    """
+    Write counter per table. Every write to a table bumps its version, so anything computed
+    from a table can be checked for freshness by comparing the versions it was built at.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+
+    def bump(self, table_name: str):
+        with self._lock:
+            self._versions[table_name] = self._versions.get(table_name, 0) + 1
+
+    def snapshot(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        """Current versions of the given tables, in the given order"""
+        with self._lock:
+            return tuple(self._versions.get(table_name, 0) for table_name in tables)
+
+
+class PageCache:
+    """
+    Process-wide LRU cache of rendered table pages, bounded by the approximate memory
+    of its payloads (`max_bytes`, 0 disables it). An entry is only served while the
+    TableVersions snapshot it was stored with is current and it is younger than `ttl`
+    seconds, the ttl covers writes that bypass the app.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Any, Tuple[Tuple[int, ...], float, int, Any]]' = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Any, versions: Tuple[int, ...]) -> Optional[Any]:
+        """The payload stored under key, if it was built at `versions` and has not expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] != versions or time.monotonic() - entry[1] > self.ttl):
+                self._remove(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[3]
+
+    def put(self, key: Any, versions: Tuple[int, ...], payload: Any):
+        """Store a payload built at `versions`, taken before the data was read"""
+        size = _deep_size(payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (versions, time.monotonic(), size, payload)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Any):
+        _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+def _deep_size(value: Any) -> int:
+    # Approximate memory of a payload of containers, dataclasses and scalars
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(k) + _deep_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(_deep_size(item) for item in value)
+    elif hasattr(value, '__dict__'):
+        size += _deep_size(vars(value))
+    return size
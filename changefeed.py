@@ -0,0 +1,185 @@
+import contextvars
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Set by UI handlers to the id of the client making a write, so that client can skip
+# the echo of a change it has already applied itself
+change_source: contextvars.ContextVar[str] = contextvars.ContextVar('change_source', default='')
+
+# Ops carried by change events. 'reset' means an unknown set of rows changed (e.g. a bulk import)
+# or the table's columns changed (Database.refresh_schema)
+CHANGE_OPS = ('insert', 'update', 'delete', 'reset')
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """A row-level change published by a Database write method"""
+    table: str
+    row_id: Any
+    op: str
+    source: str = ''
+    origin: str = ''
+
+
+def coalesce(previous: Optional[str], op: str) -> Optional[str]:
+    """
+    Combine two successive ops on the same row into one, so a burst of changes is applied once.
+    Returns None if the changes cancel out (a row inserted and deleted again).
+    """
+    if previous is None:
+        return op
+    if 'reset' in (previous, op):
+        return 'reset'
+    if previous == 'insert':
+        return None if op == 'delete' else 'insert'
+    return op
+
+
+class InProcessBackend:
+    """Delivers events to the subscribers of this process only"""
+
+    def __init__(self):
+        self.deliver: Callable[[ChangeEvent], None] = lambda event: None
+
+    def start(self, deliver: Callable[[ChangeEvent], None], origin: str):
+        self.deliver = deliver
+
+    def publish(self, event: ChangeEvent):
+        self.deliver(event)
+
+    def close(self):
+        pass
+
+
+class SQLiteChangeBackend(InProcessBackend):
+    """
+    Shares events between app processes on the same host through a SQLite file in WAL mode.
+    Events are delivered locally right away; a poller thread picks up the events of other
+    processes every `poll_interval` seconds and prunes events older than `retention` seconds.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.2, retention: float = 600.0):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = ''
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stopped = threading.Event()
+
+    def start(self, deliver: Callable[[ChangeEvent], None], origin: str):
+        super().start(deliver, origin)
+        self.origin = origin
+        self._conn = self._connect()
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS change_events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                origin TEXT NOT NULL,
+                source TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                row_id TEXT,
+                op TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        last_seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_events").fetchone()[0]
+        threading.Thread(target=self._poll, args=(last_seq,), name='changefeed-poll', daemon=True).start()
+
+    def publish(self, event: ChangeEvent):
+        self.deliver(event)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO change_events (origin, source, table_name, row_id, op, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (event.origin, event.source, event.table, None if event.row_id is None else str(event.row_id),
+                 event.op, time.time())
+            )
+
+    def close(self):
+        self._stopped.set()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _poll(self, last_seq: int):
+        conn = self._connect()
+        last_prune = time.monotonic()
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                rows = conn.execute(
+                    "SELECT seq, origin, source, table_name, row_id, op FROM change_events WHERE seq > ? ORDER BY seq",
+                    (last_seq,)
+                ).fetchall()
+                for seq, origin, source, table_name, row_id, op in rows:
+                    last_seq = seq
+                    if origin != self.origin:
+                        row_id = int(row_id) if row_id is not None and row_id.isdigit() else row_id
+                        self.deliver(ChangeEvent(table_name, row_id, op, source, origin))
+                if time.monotonic() - last_prune > 60:
+                    conn.execute("DELETE FROM change_events WHERE created_at < ?", (time.time() - self.retention,))
+                    last_prune = time.monotonic()
+            except sqlite3.Error as e:
+                logger.warning('Change feed poll failed: %s', e)
+
+
+class ChangeBus:
+    """
+    Publish/subscribe hub for row changes.
+    Subscribers are called synchronously from the publishing (or polling) thread and must be quick,
+    e.g. hand the event over to their event loop.
+    """
+
+    def __init__(self, backend: Optional[InProcessBackend] = None):
+        self.origin = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self.backend = backend or InProcessBackend()
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[ChangeEvent], None]] = []
+        self.backend.start(self._deliver, self.origin)
+
+    @classmethod
+    def from_env(cls) -> 'ChangeBus':
+        """Create a bus with the backend selected by CHANGEFEED_BACKEND ('memory' or 'sqlite')"""
+        if os.getenv('CHANGEFEED_BACKEND', 'memory') == 'sqlite':
+            return cls(SQLiteChangeBackend(os.getenv('CHANGEFEED_PATH', 'changefeed.sqlite3')))
+        return cls()
+
+    def subscribe(self, callback: Callable[[ChangeEvent], None]) -> Callable[[], None]:
+        """Register a callback for all change events, returns a function that unsubscribes it"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def publish(self, table: str, row_id: Any, op: str):
+        """Publish a change made by this process"""
+        event = ChangeEvent(table, row_id, op, change_source.get(), self.origin)
+        try:
+            self.backend.publish(event)
+        except Exception as e:
+            # A lost notification must never fail the write that caused it
+            logger.error('Could not publish change %s: %s', event, e)
+
+    def _deliver(self, event: ChangeEvent):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception('Change subscriber failed for %s', event)
@@ -0,0 +1,248 @@
+"""
+Multi-worker deployment: runs APP_WORKERS app processes (main.py), each serving a Unix socket,
+behind a local load balancer on APP_PORT. The first response to a browser sets a cookie naming
+its worker, so the page and its websocket always reach the process that holds the page's state.
+Workers share app.storage.user and invalidate each other's caches through SQLite files in
+CLUSTER_STATE_DIR (see user_storage.py and changefeed.py). Crashed workers are restarted.
+
+The balancer is a single asyncio process that relays every byte of every connection, so it caps
+the cluster at what one core can proxy. It is meant for development and small single-host setups;
+with --no-balancer only the workers are run, for a real proxy (haproxy, nginx) on their sockets.
+
+    python cluster.py --workers 4
+"""
+import argparse
+import asyncio
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Cookie carrying the index of the worker a browser is pinned to
+WORKER_COOKIE = 'scooteq_worker'
+_WORKER_COOKIE = re.compile(rb'(?:^|;)\s*' + WORKER_COOKIE.encode() + rb'=(\d+)')
+_COOKIE_HEADER = re.compile(rb'^cookie:(.*)$', re.IGNORECASE | re.MULTILINE)
+
+# Largest request or response head read before a connection is routed
+HEAD_LIMIT = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Seconds a worker must stay up to reset its restart backoff, and the longest backoff
+RESTART_RESET = 30.0
+RESTART_MAX_DELAY = 30.0
+
+UNAVAILABLE = (b'HTTP/1.1 503 Service Unavailable\r\nContent-Type: text/plain\r\nContent-Length: 24\r\n'
+               b'Connection: close\r\n\r\nNo app worker available\n')
+
+
+class Worker:
+    """One app process listening on its own Unix socket"""
+
+    def __init__(self, index: int, socket_path: str, env: dict):
+        self.index = index
+        self.socket_path = socket_path
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        self.connections = 0
+        self.started_at = 0.0
+        self.restarts = 0
+        self.next_start = 0.0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'main.py')], cwd=ROOT,
+                                        env={**self.env, 'APP_UDS': self.socket_path, 'APP_WORKER': str(self.index)})
+        print(f'Worker {self.index} started (pid {self.process.pid})')
+
+    def supervise(self):
+        # Restart a crashed worker, backing off while it keeps crashing right after starting
+        if self.alive or time.monotonic() < self.next_start:
+            return
+        if self.process is not None:
+            uptime = time.monotonic() - self.started_at
+            self.restarts = 0 if uptime > RESTART_RESET else self.restarts + 1
+            delay = min(RESTART_MAX_DELAY, 2 ** self.restarts - 1)
+            print(f'Worker {self.index} exited with {self.process.returncode}, restarting in {delay} s')
+            self.process = None
+            self.next_start = time.monotonic() + delay
+            if delay:
+                return
+        self.start()
+
+    def stop(self):
+        if self.alive:
+            self.process.terminate()
+
+    def wait(self, timeout: float):
+        if self.process is not None:
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class Balancer:
+    """
+    TCP proxy routing each client connection to a worker. Browsers with a valid worker cookie go
+    to their worker, others to the worker with the fewest open connections, and get the cookie
+    with the first response. A connection stays with its worker until it is closed.
+    """
+
+    def __init__(self, workers: List[Worker]):
+        self.workers = workers
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        pinned = self._pinned(head)
+        upstream = None
+        for worker in self._candidates(pinned):
+            try:
+                upstream = worker, *await asyncio.open_unix_connection(worker.socket_path, limit=HEAD_LIMIT)
+                break
+            except OSError:
+                continue
+        if upstream is None:
+            writer.write(UNAVAILABLE)
+            await self._close(writer)
+            return
+
+        worker, upstream_reader, upstream_writer = upstream
+        worker.connections += 1
+        try:
+            upstream_writer.write(head)
+            set_cookie = pinned is None or pinned != worker.index
+            await asyncio.gather(self._pipe(reader, upstream_writer),
+                                 self._respond(upstream_reader, writer, worker.index if set_cookie else None))
+        finally:
+            worker.connections -= 1
+            await self._close(upstream_writer)
+            await self._close(writer)
+
+    def _pinned(self, head: bytes) -> Optional[int]:
+        for header in _COOKIE_HEADER.findall(head):
+            match = _WORKER_COOKIE.search(header)
+            if match:
+                index = int(match.group(1))
+                return index if index < len(self.workers) else None
+        return None
+
+    def _candidates(self, pinned: Optional[int]) -> List[Worker]:
+        # The pinned worker if it is up, then the others by load
+        others = sorted((w for w in self.workers if w.alive and w.index != pinned), key=lambda w: w.connections)
+        if pinned is not None and self.workers[pinned].alive:
+            return [self.workers[pinned]] + others
+        return others
+
+    async def _respond(self, upstream: asyncio.StreamReader, writer: asyncio.StreamWriter, cookie: Optional[int]):
+        if cookie is not None:
+            # Pin the browser to this worker with the first response head
+            try:
+                head = await upstream.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                return
+            status_line, _, headers = head.partition(b'\r\n')
+            writer.write(status_line + b'\r\n' +
+                         f'Set-Cookie: {WORKER_COOKIE}={cookie}; Path=/; HttpOnly; SameSite=Lax\r\n'.encode() + headers)
+        await self._pipe(upstream, writer)
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                data = await reader.read(CHUNK_SIZE)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            # Half-close, so the other side sees the end of this direction
+            try:
+                if writer.can_write_eof():
+                    writer.write_eof()
+            except OSError:
+                pass
+
+    @staticmethod
+    async def _close(writer: asyncio.StreamWriter):
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+
+def worker_env(state_dir: str) -> dict:
+    """Environment of the workers: shared change feed and user storage unless configured otherwise"""
+    env = dict(os.environ)
+    env.setdefault('CHANGEFEED_BACKEND', 'sqlite')
+    env.setdefault('CHANGEFEED_PATH', os.path.join(state_dir, 'changefeed.sqlite3'))
+    env.setdefault('USER_STORAGE_BACKEND', 'sqlite')
+    env.setdefault('USER_STORAGE_PATH', os.path.join(state_dir, 'user_storage.sqlite3'))
+    return env
+
+
+async def serve(workers: List[Worker], host: str, port: int, balance: bool = True):
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+    if balance:
+        balancer = Balancer(workers)
+        server = await asyncio.start_server(balancer.handle, host, port, limit=HEAD_LIMIT, backlog=1024)
+        print(f'Balancing http://{host}:{port} over {len(workers)} workers')
+    else:
+        server = None
+        print(f'Serving {len(workers)} workers on {", ".join(w.socket_path for w in workers)}')
+    try:
+        while not stopped.is_set():
+            for worker in workers:
+                worker.supervise()
+            try:
+                await asyncio.wait_for(stopped.wait(), 1.0)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=int(os.getenv('APP_WORKERS', str(os.cpu_count() or 1))))
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.getenv('APP_PORT', '8081')))
+    parser.add_argument('--state-dir', default=os.getenv('CLUSTER_STATE_DIR', os.path.join(tempfile.gettempdir(), 'scooteq')))
+    parser.add_argument('--no-balancer', action='store_true',
+                        help='only run the workers, for a load balancer of your own in front of their sockets')
+    args = parser.parse_args()
+
+    os.makedirs(args.state_dir, exist_ok=True)
+    env = worker_env(args.state_dir)
+    workers = [Worker(i, os.path.join(args.state_dir, f'worker-{i}.sock'), env) for i in range(max(1, args.workers))]
+    for worker in workers:
+        worker.start()
+    try:
+        asyncio.run(serve(workers, args.host, args.port, balance=not args.no_balancer))
+    finally:
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.wait(10.0)
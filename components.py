@@ -0,0 +1,108 @@
+from typing import Any, Dict, List
+
+from nicegui import app, ui
+
+from async_database import AsyncDatabase
+from formatting import FOREIGN_KEY_LABELS
+
+# Options loaded per request while searching or scrolling a foreign key dropdown
+FOREIGN_KEY_PAGE_SIZE = 50
+
+# Recently chosen values remembered per user and foreign key column
+RECENT_CHOICES = 5
+
+
+async def foreign_key_select(adb: AsyncDatabase, column: str, label: str, value: Any = None,
+                             nullable: bool = False, available_only: bool = False) -> ui.select:
+    """
+    Searchable dropdown for a foreign key column that loads its options from the server.
+    Creating it only resolves the current value's label and offers the user's recent choices;
+    typing searches the referenced table, scrolling to the end of the list loads the next page.
+    available_only limits device_id to devices that are not issued.
+    """
+    to_label = FOREIGN_KEY_LABELS[column]
+
+    async def fetch(search: str, offset: int) -> List[Dict[str, Any]]:
+        if available_only:
+            return await adb.get_available_devices(search=search, limit=FOREIGN_KEY_PAGE_SIZE, offset=offset)
+        return await adb.search_foreign_key(column, search, FOREIGN_KEY_PAGE_SIZE, offset)
+
+    # Options before the first search: the current value and recent choices
+    initial = {None: '(None)'} if nullable else {}
+    if value is not None:
+        current = await adb.get_foreign_key_rows(column, [value], load=False)
+        initial[value] = to_label(current[value]) if value in current else str(value)
+    if not available_only:
+        for choice_id, choice_label in app.storage.user.get('recent_choices', {}).get(column, []):
+            initial.setdefault(choice_id, choice_label)
+    # 'request' numbers the searches, responses of an older one than the latest are dropped
+    state = {'search': '', 'loaded': 0, 'complete': False, 'request': 0}
+
+    def show(found: List[Dict[str, Any]], extend: bool):
+        options = dict(select.options if extend else initial)
+        options.update({row['id']: to_label(row) for row in found})
+        # set_options drops a value it does not offer, so keep the current selection
+        if select.value is not None and select.value not in options:
+            options[select.value] = select.options.get(select.value, str(select.value))
+        select.set_options(options)
+
+    async def search(e):
+        state['search'] = e.args or ''
+        state['request'] += 1
+        request = state['request']
+        found = await fetch(state['search'], 0)
+        if request != state['request']:
+            return  # Superseded by newer input
+        state['loaded'], state['complete'] = len(found), len(found) < FOREIGN_KEY_PAGE_SIZE
+        show(found, extend=False)
+
+    async def first_page():
+        if state['loaded'] == 0 and not state['complete']:
+            request = state['request']
+            found = await fetch('', 0)
+            if request != state['request']:
+                return
+            state['loaded'], state['complete'] = len(found), len(found) < FOREIGN_KEY_PAGE_SIZE
+            show(found, extend=True)
+
+    async def load_more(e):
+        if state['complete'] or e.args['to'] < len(select.options) - 1:
+            return
+        request = state['request']
+        found = await fetch(state['search'], state['loaded'])
+        if request != state['request']:
+            return
+        state['loaded'] += len(found)
+        state['complete'] = len(found) < FOREIGN_KEY_PAGE_SIZE
+        show(found, extend=True)
+
+    def remember(e):
+        # Only choices the user made, not values filled in by set_foreign_key_value
+        if e.value is None or available_only or select.auto_filling:
+            return
+        recent = app.storage.user.get('recent_choices', {})
+        choices = [[e.value, select.options[e.value]]] + [c for c in recent.get(column, []) if c[0] != e.value]
+        app.storage.user['recent_choices'] = {**recent, column: choices[:RECENT_CHOICES]}
+
+    select = ui.select(options=initial, label=label, value=value, with_input=True, on_change=remember) \
+        .props('input-debounce=300').classes('w-full')
+    select.auto_filling = False
+    select.add_slot('no-option', '<q-item><q-item-section class="text-grey">No matches</q-item-section></q-item>')
+    select.on('input-value', search)
+    select.on('popup-show', first_page)
+    select.on('virtual-scroll', load_more, ['to'], throttle=0.2)
+    return select
+
+
+async def set_foreign_key_value(adb: AsyncDatabase, select: ui.select, column: str, value: Any):
+    """Set the value of a foreign_key_select, adding the value's option first if it is not loaded"""
+    if value not in select.options:
+        rows = await adb.get_foreign_key_rows(column, [value], load=False)
+        label = FOREIGN_KEY_LABELS[column](rows[value]) if value in rows else str(value)
+        select.set_options({**select.options, value: label})
+    # on_change runs while the value is set, so the dropdown can tell the value was not chosen by the user
+    select.auto_filling = True
+    try:
+        select.value = value
+    finally:
+        select.auto_filling = False
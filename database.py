@@ -1,197 +1,1086 @@
-import mysql.connector
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import base64
+import json
+import logging
 import os
+import threading
+import time
+
+from attributes import ATTRIBUTE_TABLE, attribute_name, attribute_number, attribute_rows
+from audit import AUDIT_COLUMNS, AUDIT_TABLE, AuditLog, AuditRecord
+from backends import Backend, create_backend, create_replicas
+from cache import LookupCache, RowCountCache, TableVersions
+from changefeed import ChangeBus
+from metrics import InstrumentedConnection, QueryMetrics
+from pool import ConnectionPool
+from replicas import Replica, ReplicaSet, read_session
+from schema import SchemaRegistry
+from sql import PreparedStatementCache, StatementBuilder, padded_ids, placeholders, quote_identifier
+
+logger = logging.getLogger(__name__)
+
+# Lookup queries for foreign key columns, used to resolve many ids at once.
+# '{ids}' is replaced with the placeholder list for the requested ids (see padded_ids).
+FOREIGN_KEY_QUERIES = {
+    'manufacturer_id': "SELECT id, name FROM manufacturer WHERE id IN ({ids})",
+    'device_type_id': "SELECT id, device_type FROM device_types WHERE id IN ({ids})",
+    'department_id': "SELECT id, name FROM departments WHERE id IN ({ids})",
+    'employee_id': "SELECT id, first_name, last_name FROM employees WHERE id IN ({ids})",
+    'device_id': """
+        SELECT d.id, dm.model, d.serial_number
+        FROM devices d
+        JOIN device_models dm ON d.model_id = dm.id
+        WHERE d.id IN ({ids})
+    """,
+    'model_id': """
+        SELECT dm.id, dm.model, m.name as manufacturer_name
+        FROM device_models dm
+        LEFT JOIN manufacturer m ON dm.manufacturer_id = m.id
+        WHERE dm.id IN ({ids})
+    """,
+}
+
+# Cached reference sets: name -> (query, tables the result is built from)
+LOOKUPS = {
+    'manufacturers': ("SELECT id, name FROM manufacturer ORDER BY name", ('manufacturer',)),
+    'device_types': ("SELECT id, device_type FROM device_types ORDER BY device_type", ('device_types',)),
+    'departments': ("SELECT id, name FROM departments ORDER BY name", ('departments',)),
+    'employees': ("SELECT id, first_name, last_name FROM employees ORDER BY last_name, first_name", ('employees',)),
+    'devices': ("""
+        SELECT d.id, dm.model, d.serial_number
+        FROM devices d
+        JOIN device_models dm ON d.model_id = dm.id
+        ORDER BY dm.model
+    """, ('devices', 'device_models')),
+    'device_models': ("""
+        SELECT dm.id, dm.model, m.name as manufacturer_name, dt.device_type
+        FROM device_models dm
+        LEFT JOIN manufacturer m ON dm.manufacturer_id = m.id
+        LEFT JOIN device_types dt ON dm.device_type_id = dt.id
+        ORDER BY dm.model
+    """, ('device_models', 'manufacturer', 'device_types')),
+}
+
+# Cached reference set that can answer lookups for each foreign key column
+FOREIGN_KEY_LOOKUPS = {
+    'manufacturer_id': 'manufacturers',
+    'device_type_id': 'device_types',
+    'department_id': 'departments',
+    'employee_id': 'employees',
+    'device_id': 'devices',
+    'model_id': 'device_models',
+}
+
+# Paged, searchable option queries for foreign key dropdowns:
+# column -> (query, label columns matched by prefix, order)
+FOREIGN_KEY_SEARCH = {
+    'manufacturer_id': ("SELECT id, name FROM manufacturer", ('name',), 'name, id'),
+    'device_type_id': ("SELECT id, device_type FROM device_types", ('device_type',), 'device_type, id'),
+    'department_id': ("SELECT id, name FROM departments", ('name',), 'name, id'),
+    'employee_id': ("SELECT id, first_name, last_name FROM employees",
+                    ('first_name', 'last_name'), 'last_name, first_name, id'),
+    'device_id': ("""
+        SELECT d.id, dm.model, d.serial_number
+        FROM devices d
+        JOIN device_models dm ON d.model_id = dm.id
+    """, ('dm.model', 'd.serial_number'), 'dm.model, d.id'),
+    'model_id': ("""
+        SELECT dm.id, dm.model, m.name as manufacturer_name
+        FROM device_models dm
+        LEFT JOIN manufacturer m ON dm.manufacturer_id = m.id
+    """, ('dm.model', 'm.name'), 'dm.model, dm.id'),
+}
+
+# Secondary indexes recommended for the common sort and filter columns, so that
+# ORDER BY <column> LIMIT ... can walk an index instead of sorting the whole table.
+# InnoDB appends the primary key to every secondary index, which covers the id tie-breaker.
+RECOMMENDED_INDEXES = {
+    'devices': [('idx_devices_serial_number', ('serial_number',)),
+                ('idx_devices_last_maintenance', ('last_maintenance',))],
+    'devices_issued': [('idx_devices_issued_date_of_issue', ('date_of_issue',))],
+    'device_models': [('idx_device_models_model', ('model',))],
+    'employees': [('idx_employees_name', ('last_name', 'first_name'))],
+    'departments': [('idx_departments_name', ('name',))],
+    'manufacturer': [('idx_manufacturer_name', ('name',))],
+    'device_types': [('idx_device_types_device_type', ('device_type',))],
+    ATTRIBUTE_TABLE: [('idx_device_model_attributes_number', ('attribute', 'value_number', 'value_text', 'model_id')),
+                      ('idx_device_model_attributes_text', ('attribute', 'value_text', 'model_id'))],
+}
+
+# Table whose key_performance attributes are mirrored into ATTRIBUTE_TABLE (see attributes.py)
+ATTRIBUTE_SOURCE = 'device_models'
+
+
+@dataclass(frozen=True)
+class ColumnFilter:
+    """
+    A filter on one column for get_table_page.
+    op is 'eq' (value, None matches NULL), 'prefix' (value) or 'range' (value and/or value_to, inclusive).
+    On device_models, column can also be a 'kp.<attribute>' of key_performance; 'eq' with None
+    then matches models without the attribute and 'range' compares the attribute's leading number.
+    """
+    column: str
+    op: str
+    value: Any = None
+    value_to: Any = None
+
+
+@dataclass
+class TablePage:
+    """One page of table rows plus opaque cursors for the neighbouring pages"""
+    rows: List[Dict[str, Any]]
+    total_count: int
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    count_is_approximate: bool = False
+
+
+def encode_cursor(direction: str, row_id: Any) -> str:
+    """Encode a keyset position ('next'/'prev' and an id) or an 'offset' as an opaque, URL-safe cursor"""
+    raw = json.dumps({'d': direction, 'id': row_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[str, Any]:
+    """Decode a cursor from encode_cursor, raises ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        direction, row_id = data['d'], data['id']
+    except Exception as e:
+        raise ValueError(f'Invalid page cursor: {cursor!r}') from e
+    if direction not in ('next', 'prev', 'offset'):
+        raise ValueError(f'Invalid page cursor direction: {direction!r}')
+    return direction, row_id
+
+
+# Escape character of like_prefix patterns; SQLite has no default LIKE escape, so every LIKE names it
+LIKE_ESCAPE = "ESCAPE '!'"
+
+
+def like_prefix(value: Any) -> str:
+    """LIKE pattern matching values that start with `value`, with wildcards in it escaped (see LIKE_ESCAPE)"""
+    return str(value).replace('!', '!!').replace('%', '!%').replace('_', '!_') + '%'
+
+
+@dataclass
+class ImportResult:
+    """Outcome of Database.insert_rows: number of inserted rows and (row index, message) per rejected row"""
+    inserted: int = 0
+    errors: List[tuple[int, str]] = field(default_factory=list)
+
 
 class Database:
     """Database connection and operations handler"""
 
-    def __init__(self):
-        self.config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'port': int(os.getenv('DB_PORT', '3306')),
-            'user': os.getenv('DB_USER', 'root'),
-            'password': os.getenv('DB_PASSWORD', 'secret'),
-            'database': os.getenv('DB_NAME', 'scooteq_database')
-        }
+    def __init__(self, backend: Optional[Backend] = None, replicas: Optional[List[tuple[str, Backend, float]]] = None):
+        # MySQL or the embedded SQLite engine, see DB_BACKEND
+        self.backend = backend or create_backend()
+        self.pool = self._create_pool(self.backend)
+        # Read replicas (name, backend, weight) from DB_REPLICAS unless given, each with its own pool
+        if replicas is None:
+            replicas = create_replicas(self.backend)
+        self.replicas = ReplicaSet(
+            [Replica(name, replica, self._create_pool(replica), weight) for name, replica, weight in replicas],
+            window=float(os.getenv('DB_READ_YOUR_WRITES_WINDOW', '5')),
+            max_lag=float(os.getenv('DB_REPLICA_MAX_LAG', '30'))
+        )
+        self.lookups = LookupCache(
+            ttl=float(os.getenv('DB_LOOKUP_CACHE_TTL', '300')),
+            max_rows=int(os.getenv('DB_LOOKUP_CACHE_MAX_ROWS', '10000')),
+            max_total_rows=int(os.getenv('DB_LOOKUP_CACHE_TOTAL_ROWS', '50000'))
+        )
+        # Write counter per table, bumped by every write so cached results built from a table can tell they are stale
+        self.versions = TableVersions()
+        # Column metadata, loaded once via load()/refresh() instead of querying it per call
+        self.schema = SchemaRegistry(self.get_table_columns)
+        # Statements are built from schema-checked, quoted identifiers; the hot ones are prepared
+        # once per connection and kept in an LRU of DB_STATEMENT_CACHE_SIZE statements (0 disables)
+        self.sql = StatementBuilder(self.schema)
+        self.statement_cache_size = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '64'))
+        # Row counts per table; tables with more (estimated) rows than the threshold
+        # use the InnoDB statistics estimate instead of an exact COUNT(*), 0 disables that
+        self.counts = RowCountCache(ttl=float(os.getenv('DB_COUNT_CACHE_TTL', '300')))
+        self.approx_count_threshold = int(os.getenv('DB_APPROX_COUNT_THRESHOLD', '0'))
+        self._count_refresher = None
+        # Row change events for live views, shared between processes depending on CHANGEFEED_BACKEND
+        self.changes = ChangeBus.from_env()
+        self.changes.subscribe(self._forget_remote_change)
+        # Statement timings, rows and slow-query log for every query run through get_connection
+        self.metrics = QueryMetrics.from_env()
+        # Whether writes of device models mirror their attributes, off if the side table could not be created
+        self.mirror_attributes = True
+        # Before and after images of every write, written to audit_log in the background (see audit.py)
+        self.audit = AuditLog.from_env(self._write_audit)
+        # Per-thread state, e.g. the cancel token of the AsyncDatabase call running on this thread
+        self._local = threading.local()
+
+    @staticmethod
+    def _create_pool(backend: Backend) -> ConnectionPool:
+        return ConnectionPool(
+            backend.connect,
+            size=int(os.getenv('DB_POOL_SIZE', '10')),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+            recycle=float(os.getenv('DB_POOL_RECYCLE', '1800')),
+            ping_interval=float(os.getenv('DB_POOL_PING_INTERVAL', '30')),
+            is_healthy=backend.is_healthy
+        )
 
     @contextmanager
-    def get_connection(self):
-        """Context manager for database connections"""
-        conn = mysql.connector.connect(**self.config)
+    def get_connection(self, read_only: bool = False):
+        """
+        Context manager for pooled database connections.
+        read_only connections come from a read replica, unless the session wrote within the
+        read-your-writes window or no replica is healthy.
+        """
+        token = getattr(self._local, 'cancel_token', None)
+        if token is not None:
+            token.check()
+        replica = self.replicas.choose(read_session.get()) if read_only else None
+        conn = None
+        if replica is not None:
+            try:
+                conn = replica.pool.acquire()
+            except Exception as e:
+                # Unreachable or exhausted replica, read from the primary instead
+                self.replicas.mark_down(replica, e)
+                replica = None
+        backend, pool = (replica.backend, replica.pool) if replica is not None else (self.backend, self.pool)
+        if conn is None:
+            conn = pool.acquire()
+        discard = False
         try:
-            yield conn
+            if token is not None:
+                token.attach(conn, backend)
+            connection = InstrumentedConnection(conn, self.metrics)
+            # The pool the connection belongs to, the primary's or a replica's
+            connection.pool = pool
+            yield connection
+        except backend.disconnect_errors as e:
+            # Lost or broken connection, never hand it out again
+            discard = True
+            if replica is not None:
+                self.replicas.mark_down(replica, e)
+            raise
         finally:
-            conn.close()
+            # Roll back anything left open by a failed operation before the connection is reused
+            if token is not None:
+                token.detach(conn, backend)
+            try:
+                if not discard and conn.in_transaction:
+                    conn.rollback()
+            except Exception:
+                discard = True
+            pool.release(conn, discard=discard)
+
+    def _execute(self, conn, statement: str, params: tuple = (), dictionary: bool = True):
+        """Run a statement through the connection's prepared statement cache, returns the cursor to read and close"""
+        if self.statement_cache_size <= 0:
+            cursor = conn.cursor(dictionary=dictionary)
+        else:
+            state = conn.pool.state(conn.raw)
+            cache = state.get('statements')
+            if cache is None:
+                raw = conn.raw
+                cache = state['statements'] = PreparedStatementCache(
+                    lambda dictionary: self.backend.prepare(raw, dictionary), self.statement_cache_size)
+            cursor = conn.instrument(cache.cursor(statement, dictionary))
+        cursor.execute(statement, params)
+        return cursor
+
+    def kill_query(self, connection_id: int, backend: Optional[Backend] = None):
+        """Abort the statement running on another connection of the primary or of the replica `backend`"""
+        (backend or self.backend).kill_query(connection_id)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Get connection pool usage (in use, waiting, acquire latency)"""
+        return self.pool.stats()
+
+    def replica_stats(self) -> List[Dict[str, Any]]:
+        """Get health, reads and pool usage of each read replica"""
+        return self.replicas.stats()
 
     def get_table_data(self, table_name: str, limit: int = 25, offset: int = 0) -> tuple[List[Dict[str, Any]], int]:
         """
         Get paginated data from a table
         Returns: (data, total_count)
         """
-        with self.get_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-
+        count_query, page_query = self.sql.count(table_name), self.sql.select_page(table_name)
+        with self.get_connection(read_only=True) as conn:
             # Get total count
-            cursor.execute(f"SELECT COUNT(*) as count FROM {table_name}")
-            total_count = cursor.fetchone()['count']
+            cursor = self._execute(conn, count_query)
+            total_count = cursor.fetchall()[0]['count']
+            cursor.close()
 
             # Get paginated data
-            cursor.execute(f"SELECT * FROM {table_name} LIMIT {limit} OFFSET {offset}")
+            cursor = self._execute(conn, page_query, (limit, offset))
             data = cursor.fetchall()
-
             cursor.close()
             return data, total_count
 
-    def get_row_by_id(self, table_name: str, row_id: int) -> Optional[Dict[str, Any]]:
-        """Get a single row by ID"""
+    def get_table_page(self, table_name: str, limit: int = 25, cursor: Optional[str] = None,
+                       offset: int = 0, sort_by: Optional[str] = None, descending: bool = False,
+                       filters: tuple = ()) -> TablePage:
+        """
+        Get a page of a table, optionally sorted by a column and narrowed by ColumnFilters.
+        When sorted by the id primary key (the default) pages are fetched with keyset
+        pagination, so the cost is independent of page depth; other sort columns page
+        by offset. Without a cursor the page starts at `offset` (0 for the first page).
+        Sorting by a 'kp.<attribute>' of device_models walks the attribute index and only
+        includes the models that have the attribute, ordered by its number, then its text.
+        Raises ValueError for unknown columns, operators or malformed cursors.
+        """
+        sort_by = sort_by or 'id'
+        sort_attribute = self._attribute(table_name, sort_by)
+        if sort_attribute is None and self.schema.get(table_name).column(sort_by) is None:
+            raise ValueError(f'Unknown sort column for {table_name}: {sort_by!r}')
+        conditions, params = self._filter_conditions(table_name, filters)
+        count_conditions, count_params = list(conditions), list(params)
+        if sort_attribute is not None:
+            count_conditions.append(f"`id` IN (SELECT `model_id` FROM `{ATTRIBUTE_TABLE}` WHERE `attribute` = %s)")
+            count_params.append(sort_attribute)
+
+        direction, position = decode_cursor(cursor) if cursor else (None, None)
+        if direction == 'offset':
+            direction, offset = None, int(position)
+        elif direction is not None and sort_by != 'id':
+            raise ValueError('Keyset cursors can only be used when sorting by id')
+
+        order = 'DESC' if descending else 'ASC'
+        if direction is not None:
+            # Seek past the cursor row; previous pages are read in reverse and flipped back
+            scan_descending = descending if direction == 'next' else not descending
+            conditions.append(f"`id` {'<' if scan_descending else '>'} %s")
+            params.append(position)
+            order_by = f"`id` {'DESC' if scan_descending else 'ASC'}"
+            offset = 0
+        elif sort_by == 'id':
+            order_by = f"`id` {order}"
+        elif sort_attribute is None:
+            order_by = f"{self.sql.column(table_name, sort_by)} {order}, `id` {order}"
+
+        if sort_attribute is None:
+            query = self.sql.select_page(table_name, ' AND '.join(conditions), order_by)
+        else:
+            # Driven by the attribute index, which already holds the rows in sort order
+            query = (f"SELECT t.* FROM `{ATTRIBUTE_TABLE}` s JOIN {self.sql.table(table_name)} t ON t.`id` = s.`model_id` "
+                     f"WHERE {' AND '.join(['s.`attribute` = %s'] + conditions)} "
+                     f"ORDER BY s.`value_number` {order}, s.`value_text` {order}, s.`model_id` {order} LIMIT %s OFFSET %s")
+            params = [sort_attribute] + params
+
+        if count_conditions:
+            total_count, approximate = self._count_filtered(table_name, count_conditions, count_params), False
+        else:
+            total_count, approximate = self.count_rows(table_name)
+        with self.get_connection(read_only=True) as conn:
+            # Fetch one extra row to find out whether there is a page beyond this one
+            cur = self._execute(conn, query, tuple(params + [limit + 1, offset]))
+            rows = cur.fetchall()
+            cur.close()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if direction == 'prev':
+            rows.reverse()
+            has_next, has_prev = True, has_more
+        else:
+            has_next, has_prev = has_more, direction == 'next' or offset > 0
+
+        page = TablePage(rows, total_count, count_is_approximate=approximate)
+        if sort_by != 'id':
+            if has_next:
+                page.next_cursor = encode_cursor('offset', offset + limit)
+            if has_prev:
+                page.prev_cursor = encode_cursor('offset', max(0, offset - limit))
+        elif rows:
+            if has_next:
+                page.next_cursor = encode_cursor('next', rows[-1]['id'])
+            if has_prev:
+                page.prev_cursor = encode_cursor('prev', rows[0]['id'])
+        return page
+
+    def _filter_conditions(self, table_name: str, filters: tuple) -> tuple[List[str], List[Any]]:
+        """Build WHERE conditions for ColumnFilters, validating columns against the schema"""
+        schema = self.schema.get(table_name)
+        conditions, params = [], []
+        for f in filters:
+            attribute = self._attribute(table_name, f.column)
+            if attribute is not None:
+                condition, values = self._attribute_condition(attribute, f)
+                conditions.append(condition)
+                params.extend(values)
+                continue
+            if schema.column(f.column) is None:
+                raise ValueError(f'Unknown filter column for {table_name}: {f.column!r}')
+            column = self.sql.column(table_name, f.column)
+            match f.op:
+                case 'eq':
+                    if f.value is None:
+                        conditions.append(f"{column} IS NULL")
+                    else:
+                        conditions.append(f"{column} = %s")
+                        params.append(f.value)
+                case 'prefix':
+                    conditions.append(f"{column} LIKE %s {LIKE_ESCAPE}")
+                    params.append(like_prefix(f.value))
+                case 'range':
+                    if f.value not in (None, ''):
+                        conditions.append(f"{column} >= %s")
+                        params.append(f.value)
+                    if f.value_to not in (None, ''):
+                        conditions.append(f"{column} <= %s")
+                        params.append(f.value_to)
+                case _:
+                    raise ValueError(f'Unknown filter operator: {f.op!r}')
+        return conditions, params
+
+    @staticmethod
+    def _attribute(table_name: str, column: str) -> Optional[str]:
+        # The key_performance attribute a 'kp.<attribute>' filter or sort column addresses
+        attribute = attribute_name(column)
+        if attribute is not None and table_name != ATTRIBUTE_SOURCE:
+            raise ValueError(f'{table_name} has no key performance attributes: {column!r}')
+        return attribute
+
+    @staticmethod
+    def _attribute_condition(attribute: str, f: ColumnFilter) -> tuple[str, List[Any]]:
+        # Models matching a filter on a key_performance attribute, found through the attribute indexes
+        inner, params, negate = ["`attribute` = %s"], [attribute], False
+        match f.op:
+            case 'eq':
+                if f.value is None:
+                    negate = True
+                else:
+                    inner.append("`value_text` = %s")
+                    params.append(str(f.value))
+            case 'prefix':
+                inner.append(f"`value_text` LIKE %s {LIKE_ESCAPE}")
+                params.append(like_prefix(f.value))
+            case 'range':
+                for value, comparison in ((f.value, '>='), (f.value_to, '<=')):
+                    if value in (None, ''):
+                        continue
+                    number = attribute_number(value)
+                    if number is None:
+                        raise ValueError(f'Not a number for {attribute}: {value!r}')
+                    inner.append(f"`value_number` {comparison} %s")
+                    params.append(number)
+            case _:
+                raise ValueError(f'Unknown filter operator: {f.op!r}')
+        subquery = f"SELECT `model_id` FROM `{ATTRIBUTE_TABLE}` WHERE {' AND '.join(inner)}"
+        return f"`id` {'NOT IN' if negate else 'IN'} ({subquery})", params
+
+    def _count_filtered(self, table_name: str, conditions: List[str], params: List[Any]) -> int:
+        query = self.sql.count(table_name, ' AND '.join(conditions))
+        with self.get_connection(read_only=True) as conn:
+            cursor = self._execute(conn, query, tuple(params))
+            count = cursor.fetchall()[0]['count']
+            cursor.close()
+            return count
+
+    def get_missing_indexes(self) -> List[tuple[str, str, tuple]]:
+        """Get the RECOMMENDED_INDEXES that do not exist yet as (table, index name, columns)"""
         with self.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            cursor.execute(f"SELECT * FROM {table_name} WHERE id = %s", (row_id,))
-            data = cursor.fetchone()
+            existing = self.backend.get_index_names(cursor)
             cursor.close()
-            return data
+        return [(table_name, index_name, columns)
+                for table_name, indexes in RECOMMENDED_INDEXES.items()
+                for index_name, columns in indexes
+                if (table_name, index_name) not in existing
+                # The side table is missing altogether if it could not be created (see create_attribute_table)
+                and (table_name != ATTRIBUTE_TABLE or self.mirror_attributes)]
+
+    def create_recommended_indexes(self) -> List[str]:
+        """Create the missing RECOMMENDED_INDEXES, returns the names of the created indexes"""
+        created = []
+        for table_name, index_name, columns in self.get_missing_indexes():
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"CREATE INDEX {quote_identifier(index_name)} ON {self.sql.table(table_name)} "
+                               f"({self.sql.columns(table_name, columns)})")
+                cursor.close()
+            created.append(index_name)
+        return created
+
+    def get_fulltext_columns(self, table_name: str) -> List[str]:
+        """Get the columns of the first FULLTEXT index on a table, empty if it has none"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            columns = self.backend.get_fulltext_columns(cursor, table_name)
+            cursor.close()
+            return columns
+
+    def search_fulltext(self, table_name: str, columns: List[str], terms: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Search a table through its FULLTEXT index, terms use boolean mode syntax (e.g. '+word*')"""
+        query = (f"SELECT * FROM {self.sql.table(table_name)} "
+                 f"WHERE MATCH ({self.sql.columns(table_name, columns)}) AGAINST (%s IN BOOLEAN MODE) LIMIT %s")
+        with self.get_connection(read_only=True) as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(query, (terms, limit))
+            rows = cursor.fetchall()
+            cursor.close()
+            return rows
+
+    def count_rows(self, table_name: str) -> tuple[int, bool]:
+        """
+        Get the number of rows in a table from the count cache
+        Returns: (count, is_approximate)
+        """
+        cached = self.counts.get(table_name)
+        if cached is None:
+            cached = self._compute_count(table_name)
+            self.counts.set(table_name, *cached)
+        return cached
+
+    def start_count_refresh(self, interval: float = 60.0):
+        """Recount every cached table every `interval` seconds in a background thread"""
+        if self._count_refresher is not None:
+            return
+
+        def refresh():
+            while True:
+                time.sleep(interval)
+                for table_name in self.counts.tables():
+                    try:
+                        self.counts.set(table_name, *self._compute_count(table_name))
+                    except Exception as e:
+                        logger.warning('Could not refresh row count for %s: %s', table_name, e)
+
+        self._count_refresher = threading.Thread(target=refresh, name='row-count-refresh', daemon=True)
+        self._count_refresher.start()
+
+    def _compute_count(self, table_name: str) -> tuple[int, bool]:
+        # Counts are cached for everyone, so they come from a replica only once the table's last write has settled
+        with self.get_connection(read_only=self.replicas.settled((table_name,))) as conn:
+            cursor = conn.cursor(dictionary=True)
+            if self.approx_count_threshold > 0:
+                # Estimate from table statistics first, only count exactly below the threshold
+                estimate = self.backend.estimate_rows(cursor, table_name)
+                if estimate is not None and estimate >= self.approx_count_threshold:
+                    cursor.close()
+                    return estimate, True
+            cursor.execute(self.sql.count(table_name))
+            count = cursor.fetchone()['count']
+            cursor.close()
+            return count, False
+
+    def iter_table_rows(self, table_name: str, chunk_size: int = 1000, primary: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream all rows of a table in chunks of at most chunk_size rows.
+        Uses an unbuffered (server-side) cursor, so memory use does not grow with the table.
+        The connection stays checked out until the iterator is exhausted or closed.
+        primary reads from the primary even if replicas are configured (see get_rows_by_ids).
+        """
+        query = f"SELECT * FROM {self.sql.table(table_name)} ORDER BY `id`"  # Raises for unknown tables
+        with self.get_connection(read_only=not primary) as conn:
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            exhausted = False
+            try:
+                cursor.execute(query)
+                while True:
+                    chunk = cursor.fetchmany(chunk_size)
+                    if not chunk:
+                        exhausted = True
+                        break
+                    yield chunk
+            finally:
+                if exhausted:
+                    cursor.close()
+                else:
+                    # Unread rows are still on the wire, draining them could take as long as the
+                    # whole export, so drop the connection instead of returning it to the pool
+                    conn.pool.invalidate(conn.raw)
+
+    def get_row_by_id(self, table_name: str, row_id: int) -> Optional[Dict[str, Any]]:
+        """Get a single row by ID"""
+        query = self.sql.select_by_id(table_name)
+        with self.get_connection(read_only=True) as conn:
+            cursor = self._execute(conn, query, (row_id,))
+            rows = cursor.fetchall()
+            cursor.close()
+            return rows[0] if rows else None
+
+    def get_rows_by_ids(self, table_name: str, ids: List[Any], primary: bool = False) -> Dict[Any, Dict[str, Any]]:
+        """
+        Get several rows by ID in one query, indexed by ID; missing rows are left out.
+        primary reads from the primary even if replicas are configured, for re-fetching rows right
+        after a change event, which a lagging replica may not have applied yet.
+        """
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+        ids = padded_ids(ids)
+        query = self.sql.select_by_ids(table_name, len(ids))
+        with self.get_connection(read_only=not primary) as conn:
+            cursor = self._execute(conn, query, tuple(ids))
+            rows = cursor.fetchall()
+            cursor.close()
+            return {row['id']: row for row in rows}
 
     def insert_row(self, table_name: str, data: Dict[str, Any]) -> int:
         """Insert a new row and return the ID"""
-        columns = ', '.join(data.keys())
-        placeholders = ', '.join(['%s'] * len(data))
-        query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
+        query = self.sql.insert(table_name, list(data))
+        mirrored = table_name == ATTRIBUTE_SOURCE
 
+        with self.get_connection() as conn:
+            if mirrored:
+                conn.start_transaction()
+            cursor = self._execute(conn, query, tuple(data.values()), dictionary=False)
+            last_id = cursor.lastrowid
+            cursor.close()
+            if mirrored:
+                self._sync_attributes(conn, {last_id: data.get('key_performance')})
+            conn.commit()
+        self.audit.record(table_name, last_id, 'insert', after={'id': last_id, **data})
+        self.lookups.invalidate(table_name)
+        self.versions.bump(table_name)
+        self.replicas.record_write(read_session.get(), table_name)
+        self.counts.adjust(table_name, 1)
+        self.changes.publish(table_name, last_id, 'insert')
+        return last_id
+
+    def insert_rows(self, table_name: str, rows: List[Dict[str, Any]], batch_size: int = 1000) -> ImportResult:
+        """
+        Insert many rows in one transaction using batched multi-row INSERTs.
+        Rows are validated against the table schema first. A batch the database rejects is
+        retried row by row, so one bad row is reported in the result instead of aborting the import.
+        """
+        schema = self.schema.get(table_name)
+        required = {col.name for col in schema.columns
+                    if not col.nullable and col.default is None and 'auto_increment' not in col.extra}
+        result = ImportResult()
+
+        # executemany needs one column list per statement, so group rows by their columns
+        groups: Dict[tuple, List[tuple[int, tuple]]] = {}
+        for index, row in enumerate(rows):
+            unknown = [col for col in row if schema.column(col) is None]
+            missing = [col for col in required if row.get(col) is None]
+            if unknown:
+                result.errors.append((index, f"Unknown column(s): {', '.join(unknown)}"))
+            elif missing:
+                result.errors.append((index, f"Missing required value(s): {', '.join(sorted(missing))}"))
+            else:
+                columns = tuple(row)
+                groups.setdefault(columns, []).append((index, tuple(row[col] for col in columns)))
+
+        # executemany does not report the new ids, so rows to audit or mirror are read back after the last id
+        # the import's transaction saw. Rows other connections insert meanwhile are not visible to it (snapshot
+        # reads under MySQL's default REPEATABLE READ, serialized writes in SQLite); AUDIT_LOCK_ROWS also locks
+        # the end of the table so they cannot be inserted at all until the import commits
+        audited = self.audit.enabled
+        read_back = audited or table_name == ATTRIBUTE_SOURCE
+        inserted = []
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(query, tuple(data.values()))
+            conn.start_transaction()
+            if read_back:
+                lock = self.backend.row_lock if self.audit.lock_rows else ''
+                cursor.execute(f"SELECT MAX(`id`) FROM {self.sql.table(table_name)}{lock}")
+                last_id = cursor.fetchone()[0] or 0
+            for columns, entries in groups.items():
+                query = self.sql.insert(table_name, columns)
+                for start in range(0, len(entries), batch_size):
+                    batch = entries[start:start + batch_size]
+                    cursor.execute("SAVEPOINT import_batch")
+                    try:
+                        # mysql-connector rewrites this into a single multi-row INSERT, SQLite runs it in the transaction
+                        cursor.executemany(query, [params for _, params in batch])
+                        result.inserted += len(batch)
+                        continue
+                    except self.backend.database_error:
+                        cursor.execute("ROLLBACK TO SAVEPOINT import_batch")
+
+                    # Find the offending rows of a rejected batch one at a time
+                    for index, params in batch:
+                        cursor.execute("SAVEPOINT import_row")
+                        try:
+                            cursor.execute(query, params)
+                            result.inserted += 1
+                        except self.backend.database_error as e:
+                            cursor.execute("ROLLBACK TO SAVEPOINT import_row")
+                            result.errors.append((index, str(e)))
+            if read_back and result.inserted:
+                selected = '*' if audited else '`id`, `key_performance`'
+                cursor.execute(f"SELECT {selected} FROM {self.sql.table(table_name)} WHERE `id` > %s", (last_id,))
+                columns = [column[0] for column in cursor.description]
+                inserted = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                if table_name == ATTRIBUTE_SOURCE:
+                    self._sync_attributes(conn, {row['id']: row['key_performance'] for row in inserted})
             conn.commit()
-            last_id = cursor.lastrowid
             cursor.close()
-            return last_id
+
+        if audited:
+            for row in inserted:
+                self.audit.record(table_name, row['id'], 'insert', after=row)
+        result.errors.sort()
+        self.lookups.invalidate(table_name)
+        self.versions.bump(table_name)
+        self.replicas.record_write(read_session.get(), table_name)
+        self.counts.adjust(table_name, result.inserted)
+        if result.inserted:
+            # executemany does not report the new ids, so views of the table reload instead of patching
+            self.changes.publish(table_name, None, 'reset')
+        return result
 
     def update_row(self, table_name: str, row_id: int, data: Dict[str, Any]) -> bool:
         """Update an existing row"""
-        set_clause = ', '.join([f"{key} = %s" for key in data.keys()])
-        query = f"UPDATE {table_name} SET {set_clause} WHERE id = %s"
+        query = self.sql.update(table_name, list(data))
+        mirrored = table_name == ATTRIBUTE_SOURCE and 'key_performance' in data
+        audited = self.audit.enabled
+        before = None
 
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, tuple(list(data.values()) + [row_id]))
-            conn.commit()
+            if mirrored or audited:
+                conn.start_transaction()
+            if audited:
+                before = self._read_before(conn, table_name, row_id)
+            cursor = self._execute(conn, query, tuple(list(data.values()) + [row_id]), dictionary=False)
             success = cursor.rowcount > 0
             cursor.close()
-            return success
+            if mirrored and success:
+                self._sync_attributes(conn, {row_id: data['key_performance']})
+            conn.commit()
+        if success:
+            self.audit.record(table_name, row_id, 'update', before, data)
+        self.lookups.invalidate(table_name)
+        self.versions.bump(table_name)
+        self.replicas.record_write(read_session.get(), table_name)
+        if success:
+            self.changes.publish(table_name, row_id, 'update')
+        return success
 
     def delete_row(self, table_name: str, row_id: int) -> bool:
         """Delete a row by ID"""
+        query = self.sql.delete(table_name)
+        audited = self.audit.enabled
+        before = None
+        with self.get_connection() as conn:
+            if audited and self.backend.delete_returning:
+                # The deleted row comes back from the DELETE itself
+                cursor = self._execute(conn, query + " RETURNING *", (row_id,))
+                rows = cursor.fetchall()
+                cursor.close()
+                before = rows[0] if rows else None
+                success = bool(rows)
+            else:
+                if audited:
+                    conn.start_transaction()
+                    before = self._read_before(conn, table_name, row_id)
+                cursor = self._execute(conn, query, (row_id,), dictionary=False)
+                conn.commit()
+                success = cursor.rowcount > 0
+                cursor.close()
+        if success:
+            self.audit.record(table_name, row_id, 'delete', before)
+        self.lookups.invalidate(table_name)
+        self.versions.bump(table_name)
+        self.replicas.record_write(read_session.get(), table_name)
+        if success:
+            self.counts.adjust(table_name, -1)
+            self.changes.publish(table_name, row_id, 'delete')
+        return success
+
+    def _read_before(self, conn, table_name: str, row_id: int) -> Optional[Dict[str, Any]]:
+        # The row a write is about to replace, read on the primary in the write's transaction.
+        # AUDIT_LOCK_ROWS also locks it until the transaction ends, so no concurrent write gets in between
+        lock = self.backend.row_lock if self.audit.lock_rows else ''
+        cursor = self._execute(conn, self.sql.select_by_id(table_name) + lock, (row_id,))
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows[0] if rows else None
+
+    def _write_audit(self, records: List[tuple]):
+        # One multi-row INSERT per batch of queued audit records
+        query = f"INSERT INTO `{AUDIT_TABLE}` ({', '.join(AUDIT_COLUMNS)}) VALUES ({placeholders(len(AUDIT_COLUMNS))})"
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(f"DELETE FROM {table_name} WHERE id = %s", (row_id,))
+            conn.start_transaction()
+            cursor.executemany(query, records)
             conn.commit()
-            success = cursor.rowcount > 0
             cursor.close()
-            return success
 
-    def get_table_columns(self, table_name: str) -> List[Dict[str, str]]:
-        """Get column information for a table"""
+    def get_row_history(self, table_name: str, row_id: int, limit: int = 100) -> List[AuditRecord]:
+        """Get the recorded writes of a row, newest first"""
+        self.sql.table(table_name)  # Raises for unknown tables
+        self.audit.flush()
         with self.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            cursor.execute(f"DESCRIBE {table_name}")
-            columns = cursor.fetchall()
+            cursor.execute(f"SELECT * FROM `{AUDIT_TABLE}` WHERE table_name = %s AND row_id = %s "
+                           f"ORDER BY changed_at DESC, id DESC LIMIT %s", (table_name, row_id, limit))
+            rows = cursor.fetchall()
             cursor.close()
-            return columns
+        return [AuditRecord.from_row(row) for row in rows]
 
-    def get_manufacturers(self) -> List[Dict[str, Any]]:
-        """Get all manufacturers for dropdown"""
+    def get_row_as_of(self, table_name: str, row_id: int, when: datetime) -> Optional[Dict[str, Any]]:
+        """
+        Get a row as it was at `when` from the audit log, None if it did not exist then.
+        Recorded values of date and decimal columns are returned as text.
+        """
+        query = self.sql.select_by_id(table_name)  # Raises for unknown tables
+        self.audit.flush()
         with self.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, name FROM manufacturer ORDER BY name")
+            # The last write up to `when` left the row as its image
+            cursor.execute(f"SELECT * FROM `{AUDIT_TABLE}` WHERE table_name = %s AND row_id = %s AND changed_at <= %s "
+                           f"ORDER BY changed_at DESC, id DESC LIMIT 1", (table_name, row_id, when))
+            rows = cursor.fetchall()
+            if not rows:
+                # Otherwise the first write after it found the row as its before image (none for inserts)
+                cursor.execute(f"SELECT * FROM `{AUDIT_TABLE}` WHERE table_name = %s AND row_id = %s AND changed_at > %s "
+                               f"ORDER BY changed_at, id LIMIT 1", (table_name, row_id, when))
+                later = cursor.fetchall()
+                if later:
+                    cursor.close()
+                    return AuditRecord.from_row(later[0]).before
+                # Unchanged since, or written before the audit log was kept
+                cursor.execute(query, (row_id,))
+                rows = cursor.fetchall()
+                cursor.close()
+                return rows[0] if rows else None
+            cursor.close()
+        return AuditRecord.from_row(rows[0]).image()
+
+    def compact_audit_log(self, batch_size: int = 1000) -> int:
+        """
+        Delete audit records older than AUDIT_RETENTION_DAYS, in small batches so writes are not held up.
+        As-of queries stay exact for times within the retention period. Returns the number of deleted records.
+        """
+        if self.audit.retention_days <= 0:
+            return 0
+        cutoff = datetime.now() - timedelta(days=self.audit.retention_days)
+        deleted = 0
+        while True:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT id FROM `{AUDIT_TABLE}` WHERE changed_at < %s ORDER BY changed_at LIMIT %s",
+                               (cutoff, batch_size))
+                ids = [row[0] for row in cursor.fetchall()]
+                if ids:
+                    cursor.execute(f"DELETE FROM `{AUDIT_TABLE}` WHERE id IN ({placeholders(len(ids))})", tuple(ids))
+                cursor.close()
+            deleted += len(ids)
+            if len(ids) < batch_size:
+                return deleted
+
+    def create_attribute_table(self) -> bool:
+        """
+        Create the device_model_attributes side table if it is missing, returns whether it exists.
+        Without it, writes of device models skip the attribute mirror instead of failing.
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                for statement in self.backend.attribute_table_ddl:
+                    cursor.execute(statement)
+                cursor.execute(f"SELECT 1 FROM `{ATTRIBUTE_TABLE}` LIMIT 1")
+                cursor.fetchall()
+                cursor.close()
+            self.mirror_attributes = True
+        except Exception as e:
+            logger.warning('%s is missing and could not be created, key performance attributes '
+                           'are not mirrored until it exists and the app is restarted: %s', ATTRIBUTE_TABLE, e)
+            self.mirror_attributes = False
+        return self.mirror_attributes
+
+    def _sync_attributes(self, conn, documents: Dict[int, Any]):
+        # Replace the attribute rows of device models by those of their key_performance documents,
+        # in the caller's transaction; deleted models lose theirs through ON DELETE CASCADE
+        if not self.mirror_attributes:
+            return
+        cursor = conn.cursor()
+        ids = list(documents)
+        for start in range(0, len(ids), 1000):
+            chunk = ids[start:start + 1000]
+            cursor.execute(f"DELETE FROM `{ATTRIBUTE_TABLE}` WHERE `model_id` IN ({placeholders(len(chunk))})", tuple(chunk))
+        rows = [row for model_id, document in documents.items() for row in attribute_rows(model_id, document)]
+        if rows:
+            cursor.executemany(f"INSERT INTO `{ATTRIBUTE_TABLE}` (`model_id`, `attribute`, `value_text`, `value_number`) "
+                               f"VALUES (%s, %s, %s, %s)", rows)
+        cursor.close()
+
+    def sync_model_attributes(self) -> int:
+        """
+        Mirror the key_performance attributes of device models that have no attribute rows yet,
+        e.g. rows loaded from a dump or written before the side table existed. Returns their number.
+        Creates the side table first if it is missing.
+        """
+        if not self.create_attribute_table():
+            return 0
+        with self.get_connection() as conn:
+            conn.start_transaction()
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT dm.id, dm.key_performance
+                FROM device_models dm
+                WHERE dm.key_performance IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM `{ATTRIBUTE_TABLE}` a WHERE a.model_id = dm.id)
+            """)
+            documents = dict(cursor.fetchall())
+            cursor.close()
+            self._sync_attributes(conn, documents)
+            conn.commit()
+        if documents:
+            self.versions.bump(ATTRIBUTE_SOURCE)
+            self.replicas.record_write(read_session.get(), ATTRIBUTE_SOURCE)
+        return len(documents)
+
+    def get_foreign_key_options(self, column_name: str) -> Dict[int, Dict[str, Any]]:
+        """Get every row a foreign key column can reference, indexed by ID"""
+        return self._lookup(FOREIGN_KEY_LOOKUPS[column_name])
+
+    def get_foreign_key_rows(self, column_name: str, ids: List[int], load: bool = True) -> Dict[int, Dict[str, Any]]:
+        """
+        Get the referenced rows for a foreign key column in one query, indexed by ID.
+        With load=False the lookup cache is used only if it is already loaded, so the cost
+        does not depend on the size of the referenced table.
+        """
+        ids = list({i for i in ids if i is not None})
+        if not ids or column_name not in FOREIGN_KEY_QUERIES:
+            return {}
+
+        # Serve from the lookup cache unless the referenced table is too large to keep in memory
+        lookup = FOREIGN_KEY_LOOKUPS[column_name]
+        if not self.lookups.is_oversize(lookup):
+            cached = self._lookup(lookup) if load else self.lookups.peek(lookup)
+            if cached is not None and all(i in cached for i in ids):
+                return {i: cached[i] for i in ids}
+
+        ids = padded_ids(ids)
+        query = FOREIGN_KEY_QUERIES[column_name].format(ids=', '.join(['%s'] * len(ids)))
+        with self.get_connection(read_only=True) as conn:
+            cursor = self._execute(conn, query, tuple(ids))
+            data = {row['id']: row for row in cursor.fetchall()}
+            cursor.close()
+            return data
+
+    def search_foreign_key(self, column_name: str, search: str = '', limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Get a page of the rows a foreign key column can reference, in display order.
+        `search` narrows the result to rows with a label column starting with it.
+        """
+        query, columns, order_by = FOREIGN_KEY_SEARCH[column_name]
+        params = []
+        if search:
+            query += f" WHERE ({' OR '.join(f'{col} LIKE %s {LIKE_ESCAPE}' for col in columns)})"
+            params = [like_prefix(search)] * len(columns)
+        with self.get_connection(read_only=True) as conn:
+            cursor = self._execute(conn, f"{query} ORDER BY {order_by} LIMIT %s OFFSET %s", tuple(params + [limit, offset]))
             data = cursor.fetchall()
             cursor.close()
             return data
 
-    def get_device_types(self) -> List[Dict[str, Any]]:
-        """Get all device types for dropdown"""
+    def get_table_columns(self, table_name: str) -> List[Dict[str, Any]]:
+        """Get normalized column metadata for a table from the backend, prefer the cached self.schema"""
         with self.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, device_type FROM device_types ORDER BY device_type")
-            data = cursor.fetchall()
+            columns = self.backend.get_columns(cursor, table_name)
             cursor.close()
-            return data
+            return columns
+
+    def get_manufacturers(self) -> List[Dict[str, Any]]:
+        """Get all manufacturers for dropdown"""
+        return list(self._lookup('manufacturers').values())
+
+    def get_device_types(self) -> List[Dict[str, Any]]:
+        """Get all device types for dropdown"""
+        return list(self._lookup('device_types').values())
 
     def get_device_type_by_id(self, device_type_id: int) -> Optional[Dict[str, Any]]:
         """Get a device type by ID with specification"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, device_type, specification, description FROM device_types WHERE id = %s", (device_type_id,))
-            data = cursor.fetchone()
+        with self.get_connection(read_only=True) as conn:
+            cursor = self._execute(conn, "SELECT id, device_type, specification, description FROM device_types WHERE id = %s", (device_type_id,))
+            rows = cursor.fetchall()
             cursor.close()
-            return data
+            return rows[0] if rows else None
+
+    def get_device_type_specifications(self) -> Dict[int, str]:
+        """Get the specification string of every device type, indexed by ID"""
+        rows = self._fetch_all("SELECT id, specification FROM device_types", ('device_types',))
+        return {row['id']: row['specification'] for row in rows}
 
     def get_departments(self) -> List[Dict[str, Any]]:
         """Get all departments for dropdown"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, name FROM departments ORDER BY name")
-            data = cursor.fetchall()
-            cursor.close()
-            return data
+        return list(self._lookup('departments').values())
 
     def get_employees(self) -> List[Dict[str, Any]]:
         """Get all employees for dropdown"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, first_name, last_name FROM employees ORDER BY last_name, first_name")
-            data = cursor.fetchall()
-            cursor.close()
-            return data
+        return list(self._lookup('employees').values())
 
     def get_employee_by_id(self, employee_id: int) -> Optional[Dict[str, Any]]:
         """Get an employee by ID with their department"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, first_name, last_name, department_id FROM employees WHERE id = %s", (employee_id,))
-            data = cursor.fetchone()
+        with self.get_connection(read_only=True) as conn:
+            cursor = self._execute(conn, "SELECT id, first_name, last_name, department_id FROM employees WHERE id = %s", (employee_id,))
+            rows = cursor.fetchall()
             cursor.close()
-            return data
+            return rows[0] if rows else None
 
     def get_devices(self) -> List[Dict[str, Any]]:
         """Get all devices for dropdown"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT d.id, dm.model, d.serial_number
-                FROM devices d
-                JOIN device_models dm ON d.model_id = dm.id
-                ORDER BY dm.model
-            """)
-            data = cursor.fetchall()
-            cursor.close()
-            return data
+        return list(self._lookup('devices').values())
 
-    def get_available_devices(self) -> List[Dict[str, Any]]:
-        """Get devices that are not currently issued"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("""
+    def get_available_devices(self, search: str = '', limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Get a page of the devices that are not currently issued, ordered by model.
+        `search` narrows the result to models or serial numbers starting with it.
+        """
+        # Anti-join: probes the UNIQUE index on devices_issued.device_id once per device
+        # instead of evaluating a NOT IN subquery, which also mishandles NULLs
+        conditions, params = ["di.id IS NULL"], []
+        if search:
+            conditions.append(f"(dm.model LIKE %s {LIKE_ESCAPE} OR d.serial_number LIKE %s {LIKE_ESCAPE})")
+            params += [like_prefix(search), like_prefix(search)]
+        with self.get_connection(read_only=True) as conn:
+            cursor = self._execute(conn, f"""
                 SELECT d.id, dm.model, d.serial_number
                 FROM devices d
                 JOIN device_models dm ON d.model_id = dm.id
-                WHERE d.id NOT IN (SELECT device_id FROM devices_issued)
-                ORDER BY dm.model
-            """)
+                LEFT JOIN devices_issued di ON di.device_id = d.id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY dm.model, d.id
+                LIMIT %s OFFSET %s
+            """, tuple(params + [limit, offset]))
             data = cursor.fetchall()
             cursor.close()
             return data
 
     def get_device_models(self) -> List[Dict[str, Any]]:
         """Get all device models for dropdown"""
-        with self.get_connection() as conn:
+        return list(self._lookup('device_models').values())
+
+    def refresh_schema(self, table_name: str):
+        """Reload the columns of a table after its structure changed, here and in the other app processes"""
+        self.schema.refresh(table_name)
+        self.lookups.invalidate(table_name)
+        self.versions.bump(table_name)
+        self.replicas.record_write(read_session.get(), table_name)
+        self.changes.publish(table_name, None, 'reset')
+
+    def _forget_remote_change(self, event):
+        # Writes made by other app processes invalidate what this process has cached for the table
+        if event.origin != self.changes.origin:
+            self.lookups.invalidate(event.table)
+            self.versions.bump(event.table)
+            # The writing session is served by the other process, only shared caches need to wait for replicas
+            self.replicas.record_write(None, event.table)
+            self.counts.invalidate(event.table)
+            if event.op == 'reset' and event.table in self.schema:
+                # Also published when the table's columns changed (see refresh_schema)
+                self.schema.refresh(event.table)
+
+    def _lookup(self, name: str) -> Dict[int, Dict[str, Any]]:
+        """Get a cached reference set by name, indexed by ID"""
+        query, tables = LOOKUPS[name]
+        return self.lookups.get(name, lambda: self._fetch_all(query, tables), tables)
+
+    def _fetch_all(self, query: str, tables: tuple = ()) -> List[Dict[str, Any]]:
+        # Lookups are cached for everyone, so they come from a replica only once their tables' last writes have settled
+        with self.get_connection(read_only=bool(tables) and self.replicas.settled(tables)) as conn:
             cursor = conn.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT dm.id, dm.model, m.name as manufacturer_name, dt.device_type
-                FROM device_models dm
-                LEFT JOIN manufacturer m ON dm.manufacturer_id = m.id
-                LEFT JOIN device_types dt ON dm.device_type_id = dt.id
-                ORDER BY dm.model
-            """)
+            cursor.execute(query)
             data = cursor.fetchall()
             cursor.close()
             return data
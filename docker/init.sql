@@ -55,3 +55,39 @@ CREATE TABLE IF NOT EXISTS devices_issued (
     FOREIGN KEY (employee_id) REFERENCES employees(id),
     FOREIGN KEY (department_id) REFERENCES departments(id)
 );
+
+-- key_performance attributes of device_models, one row per attribute, kept in sync by the app (see attributes.py)
+CREATE TABLE IF NOT EXISTS device_model_attributes (
+    model_id INT NOT NULL,
+    attribute VARCHAR(255) NOT NULL,
+    value_text VARCHAR(255),
+    value_number DOUBLE,
+    PRIMARY KEY (model_id, attribute),
+    FOREIGN KEY (model_id) REFERENCES device_models(id) ON DELETE CASCADE
+);
+
+-- Before and after images of every write made through the app (see audit.py)
+CREATE TABLE IF NOT EXISTS audit_log (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    changed_at DATETIME(6) NOT NULL,
+    table_name VARCHAR(64) NOT NULL,
+    row_id INT NOT NULL,
+    operation VARCHAR(6) NOT NULL,
+    session_id VARCHAR(64),
+    before_image JSON,
+    after_image JSON,
+    INDEX idx_audit_log_row (table_name, row_id, changed_at),
+    INDEX idx_audit_log_changed_at (changed_at)
+);
+
+-- Secondary indexes for sorting and filtering table views (see RECOMMENDED_INDEXES in database.py)
+CREATE INDEX idx_devices_serial_number ON devices (serial_number);
+CREATE INDEX idx_devices_last_maintenance ON devices (last_maintenance);
+CREATE INDEX idx_devices_issued_date_of_issue ON devices_issued (date_of_issue);
+CREATE INDEX idx_device_models_model ON device_models (model);
+CREATE INDEX idx_employees_name ON employees (last_name, first_name);
+CREATE INDEX idx_departments_name ON departments (name);
+CREATE INDEX idx_manufacturer_name ON manufacturer (name);
+CREATE INDEX idx_device_types_device_type ON device_types (device_type);
+CREATE INDEX idx_device_model_attributes_number ON device_model_attributes (attribute, value_number, value_text, model_id);
+CREATE INDEX idx_device_model_attributes_text ON device_model_attributes (attribute, value_text, model_id);
@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from async_database import AsyncDatabase
+from database import FOREIGN_KEY_LOOKUPS, Database
+from formatting import FOREIGN_KEY_LABELS, build_foreign_key_labels, format_value, parse_key_performance, parse_specification
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_columns(db: Database, table_name: str) -> List[str]:
+    """
+    Output columns for an export: the table's columns, with key_performance replaced by
+    one 'key_performance.<attribute>' column per attribute declared in device_types.specification
+    and 'key_performance.other' for any values outside the declared attributes.
+    """
+    columns = []
+    for col in db.schema.get(table_name).column_names:
+        if col != 'key_performance':
+            columns.append(col)
+            continue
+        attributes = []
+        for specification in db.get_device_type_specifications().values():
+            attributes.extend(a for a in parse_specification(specification) if a not in attributes)
+        columns.extend(f'key_performance.{attr}' for attr in attributes)
+        columns.append('key_performance.other')
+    return columns
+
+
+def export_chunks(db: Database, table_name: str, columns: List[str], resolve_foreign_keys: bool = True,
+                  chunk_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+    """Stream a table as chunks of flattened rows with the given output columns"""
+    declared = {col[len('key_performance.'):] for col in columns if col.startswith('key_performance.')}
+    declared.discard('other')
+
+    # Labels are resolved before the streaming connection is checked out: it stays checked out for the
+    # whole export, so a label query per chunk would need a second pooled connection, and as many
+    # concurrent exports as the pool has connections would wait on each other for it
+    labels = {}
+    if resolve_foreign_keys:
+        for col in FOREIGN_KEY_LABELS:
+            if col in columns:
+                referenced = cached_foreign_key_rows(db, col)
+                if referenced is not None:
+                    labels[col] = build_foreign_key_labels(col, referenced)
+
+    for chunk in db.iter_table_rows(table_name, chunk_size):
+        rows = []
+        for row in chunk:
+            out = {}
+            for col, value in row.items():
+                if col == 'key_performance':
+                    kp = parse_key_performance(value)
+                    for attr in declared:
+                        out[f'key_performance.{attr}'] = kp.get(attr)
+                    other = {k: v for k, v in kp.items() if k not in declared}
+                    out['key_performance.other'] = json.dumps(other) if other else None
+                elif col in labels and value is not None:
+                    out[col] = labels[col].get(value, value)
+                else:
+                    out[col] = value
+            rows.append(out)
+        yield rows
+
+
+def cached_foreign_key_rows(db: Database, column_name: str) -> Optional[Dict[Any, Dict[str, Any]]]:
+    """
+    Every row a foreign key column can reference, from the lookup cache (loaded if needed),
+    None if the referenced table is too large to cache, in which case the export keeps the ids
+    """
+    lookup = FOREIGN_KEY_LOOKUPS[column_name]
+    if db.lookups.is_oversize(lookup):
+        return None
+    referenced = db.get_foreign_key_options(column_name)
+    return None if db.lookups.is_oversize(lookup) else referenced
+
+
+def encode_chunk(rows: List[Dict[str, Any]], columns: List[str], fmt: str, header: bool = False) -> bytes:
+    """Serialize a chunk of rows as CSV or NDJSON"""
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(columns)
+        writer.writerows([format_value(row.get(col)) for col in columns] for row in rows)
+    else:
+        for row in rows:
+            buffer.write(json.dumps({col: row.get(col) for col in columns}, default=format_value, ensure_ascii=False))
+            buffer.write('\n')
+    return buffer.getvalue().encode()
+
+
+async def stream_export(adb: AsyncDatabase, table_name: str, fmt: str, resolve_foreign_keys: bool = True,
+                        chunk_size: int = 1000) -> AsyncIterator[bytes]:
+    """
+    Async byte stream of a table export for a streaming HTTP response.
+    Every chunk is fetched on the database thread pool, so an export never blocks other sessions.
+    """
+    columns = await adb.run(export_columns, adb.db, table_name)
+    chunks = export_chunks(adb.db, table_name, columns, resolve_foreign_keys, chunk_size)
+    try:
+        if fmt == 'csv':
+            yield encode_chunk([], columns, fmt, header=True)
+        while True:
+            rows = await adb.run(next, chunks, None)
+            if rows is None:
+                break
+            yield encode_chunk(rows, columns, fmt)
+    finally:
+        # Release the streaming connection if the client went away mid-export
+        adb.executor.submit(_close_quietly, chunks)
+
+
+def _close_quietly(chunks: Iterator):
+    try:
+        chunks.close()
+    except ValueError:
+        pass  # Still running a fetch, the generator is closed when it is garbage collected
@@ -0,0 +1,111 @@
+from datetime import datetime
+from typing import Any, Dict, List
+import json
+
+
+def format_value(value: Any) -> str:
+    # Format values for display
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+def format_field_label(field_name: str) -> str:
+    # Format field name for display, removing '_id' suffix
+    label = field_name.replace('_', ' ').title()
+    # Remove " Id" suffix from foreign key fields
+    return label.replace(' Id', '')
+
+
+def parse_specification(specification: str) -> List[str]:
+    # Parse specification string into list of attributes
+    if not specification:
+        return []
+    # Split by comma and trim whitespace from each attribute
+    return [attr.strip() for attr in specification.split(',') if attr.strip()]
+
+
+def format_json_for_display(json_data: Any, collapsed: bool = True) -> dict:
+    # Format JSON key_performance data for table display
+    # Returns dict with 'collapsed' and 'expanded' versions
+    if not json_data or not isinstance(json_data, dict):
+        return {'collapsed': '', 'expanded': '', 'has_more': False}
+
+    formatted_pairs = []
+    for key, value in json_data.items():
+        if value:  # Only include non-empty values
+            formatted_pairs.append(f"{key}: {value}")
+
+    if len(formatted_pairs) <= 3:
+        display_text = '<br>'.join(formatted_pairs)
+        return {'collapsed': display_text, 'expanded': display_text, 'has_more': False}
+    else:
+        # Collapsed: Show first 3 and indicate how many more
+        first_three = '<br>'.join(formatted_pairs[:3])
+        remaining = len(formatted_pairs) - 3
+        collapsed_text = f"{first_three}<br><span style='color: #666; font-style: italic;'>(+{remaining} more - click to expand)</span>"
+
+        # Expanded: Show all
+        expanded_text = '<br>'.join(formatted_pairs)
+
+        return {'collapsed': collapsed_text, 'expanded': expanded_text, 'has_more': True}
+
+
+# Display label for a referenced row, per foreign key column
+FOREIGN_KEY_LABELS = {
+    'manufacturer_id': lambda r: r['name'],
+    'device_type_id': lambda r: r['device_type'],
+    'department_id': lambda r: r['name'],
+    'employee_id': lambda r: f"{r['first_name']} {r['last_name']}",
+    'device_id': lambda r: f"{r['model']} ({r['serial_number']})",
+    'model_id': lambda r: f"{r['model']} ({r['manufacturer_name']})",
+}
+
+
+def build_foreign_key_labels(column_name: str, referenced: Dict[Any, Dict[str, Any]]) -> Dict[Any, str]:
+    # Turn referenced rows from Database.get_foreign_key_rows into display labels by id
+    return {ref_id: FOREIGN_KEY_LABELS[column_name](ref) for ref_id, ref in referenced.items()}
+
+
+def get_foreign_key_display(labels: Dict[str, Dict[Any, str]], column_name: str, value: Any) -> str:
+    # Get display value for foreign keys from labels resolved per page
+    if value is None:
+        return ''
+    return labels.get(column_name, {}).get(value, str(value))
+
+
+def format_table_rows(column_names: List[str], data: List[Dict[str, Any]],
+                      fk_labels: Dict[str, Dict[Any, str]]) -> List[Dict[str, Any]]:
+    # Format database rows for display in the table, with foreign key labels resolved per page
+    rows = []
+    for row in data:
+        formatted_row = {}
+        for col in column_names:
+            value = row.get(col)
+            # Show foreign key display values
+            if col in FOREIGN_KEY_LABELS:
+                formatted_row[col] = get_foreign_key_display(fk_labels, col, value)
+            # Handle key_performance JSON display
+            elif col == 'key_performance':
+                kp_data = format_json_for_display(parse_key_performance(value))
+                formatted_row[col] = kp_data['collapsed']
+                formatted_row['key_performance_expanded'] = kp_data['expanded']
+                formatted_row['key_performance_collapsed'] = kp_data['collapsed']
+                formatted_row['is_expanded'] = False
+            else:
+                formatted_row[col] = format_value(value)
+        formatted_row['_id'] = row['id']  # Store actual ID for edit
+        rows.append(formatted_row)
+    return rows
+
+
+def parse_key_performance(value: Any) -> Dict[str, Any]:
+    # Parse key_performance JSON, which the driver may return as a string
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return {}
+    return value if isinstance(value, dict) else {}
@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+from typing import Any, Dict, List, Tuple
+
+from database import Database, ImportResult
+from formatting import FOREIGN_KEY_LABELS
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+
+def parse_import(text: str, fmt: str) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, str]]]:
+    """
+    Parse CSV (with a header row) or NDJSON into row dicts.
+    Empty CSV cells become None, and flattened 'key_performance.<attribute>' columns as written
+    by the exporter are nested back into a key_performance JSON document.
+    Returns (row index, row) for the rows that could be parsed and (row index, message) for the others.
+    """
+    if fmt == 'csv':
+        rows = [{k: (v if v != '' else None) for k, v in row.items()} for row in csv.DictReader(io.StringIO(text))]
+    elif fmt == 'ndjson':
+        rows = [line for line in text.splitlines() if line.strip()]
+    else:
+        raise ValueError(f'Unknown import format: {fmt}')
+
+    parsed, errors = [], []
+    for index, row in enumerate(rows):
+        try:
+            if fmt == 'ndjson':
+                row = json.loads(row)
+                if not isinstance(row, dict):
+                    raise ValueError('not a JSON object')
+            parsed.append((index, _nest_key_performance(row)))
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError
+            errors.append((index, f'Invalid JSON: {e}'))
+    return parsed, errors
+
+
+def resolve_foreign_key_names(db: Database, rows: List[Tuple[int, Dict[str, Any]]]
+                              ) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, str]]]:
+    """
+    Replace display names in foreign key columns (e.g. a manufacturer name) with their ids.
+    Each referenced table is looked up once for the whole import.
+    Takes and returns (row index, row) for the rows that could be resolved, plus (row index, message) for the others.
+    """
+    used = {col for _, row in rows for col, value in row.items()
+            if col in FOREIGN_KEY_LABELS and isinstance(value, str) and not value.strip().isdigit()}
+    ids_by_label = {}
+    for col in used:
+        labels: Dict[str, Any] = {}
+        for ref_id, ref in db.get_foreign_key_options(col).items():
+            label = FOREIGN_KEY_LABELS[col](ref)
+            # Ambiguous names cannot be imported by name, only by id
+            labels[label] = None if label in labels else ref_id
+        ids_by_label[col] = labels
+
+    resolved, errors = [], []
+    for index, row in rows:
+        row = dict(row)
+        problem = None
+        for col in FOREIGN_KEY_LABELS:
+            value = row.get(col)
+            if not isinstance(value, str):
+                continue
+            if value.strip().isdigit():
+                row[col] = int(value)
+            elif ids_by_label[col].get(value) is not None:
+                row[col] = ids_by_label[col][value]
+            else:
+                reason = 'is ambiguous' if value in ids_by_label[col] else 'was not found'
+                problem = f"{col}: '{value}' {reason}"
+                break
+        if problem:
+            errors.append((index, problem))
+        else:
+            resolved.append((index, row))
+    return resolved, errors
+
+
+def import_rows(db: Database, table_name: str, text: str, fmt: str, batch_size: int = 1000) -> ImportResult:
+    """Parse, resolve and bulk insert an uploaded file, row indexes in errors refer to the file's data rows"""
+    rows, errors = parse_import(text, fmt)
+    resolved, unresolved = resolve_foreign_key_names(db, rows)
+    errors += unresolved
+    result = db.insert_rows(table_name, [row for _, row in resolved], batch_size=batch_size)
+    # Map indexes of the resolved subset back to positions in the file
+    result.errors = sorted(errors + [(resolved[i][0], message) for i, message in result.errors])
+    return result
+
+
+def _nest_key_performance(row: Dict[str, Any]) -> Dict[str, Any]:
+    if isinstance(row.get('key_performance'), dict):
+        row = {**row, 'key_performance': json.dumps(row['key_performance'])}
+    flattened = {k: v for k, v in row.items() if k.startswith('key_performance.')}
+    if not flattened:
+        return row
+    row = {k: v for k, v in row.items() if k not in flattened}
+    key_performance = {}
+    other = flattened.pop('key_performance.other', None)
+    if other:
+        key_performance.update(json.loads(other) if isinstance(other, str) else other)
+    key_performance.update({k[len('key_performance.'):]: v for k, v in flattened.items() if v not in (None, '')})
+    row['key_performance'] = json.dumps(key_performance) if key_performance else None
+    return row
@@ -1,12 +1,49 @@
-from nicegui import ui, app
-from database import Database
+from nicegui import ui, app, background_tasks
+from fastapi import HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from database import Database, ColumnFilter, TablePage, encode_cursor, FOREIGN_KEY_LOOKUPS, LOOKUPS
+from async_database import AsyncDatabase
+from attributes import ATTRIBUTE_PREFIX, attribute_name
+from cache import PageCache, WindowCache
+from components import foreign_key_select, set_foreign_key_value
+from changefeed import ChangeEvent, change_source, coalesce
+from export import EXPORT_FORMATS, stream_export
+from importer import import_rows
+from formatting import (
+    FOREIGN_KEY_LABELS, build_foreign_key_labels, format_field_label, format_table_rows, parse_specification
+)
+from schema import Column
+from search import TableSearch
+from user_storage import use_sqlite_user_storage
 from typing import Dict, Any, List
 from datetime import datetime
+from urllib.parse import urlencode
+import asyncio
+import logging
 import os
 import json
 
+# Messages of the database, search, audit and change feed modules; LOG_LEVEL=DEBUG shows more, WARNING less
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def browser_session() -> str:
+    # Read-your-writes is tracked per browser, so a page reloaded after a write still sees it
+    try:
+        return app.storage.browser.get('id', '')
+    except RuntimeError:
+        return ''  # Not called for a page or UI event, e.g. at startup
+
+
 # Initialize database
+# UI handlers go through adb, which runs queries off the event loop
 db = Database()
+adb = AsyncDatabase(db, session=browser_session)
+
+# User storage shared by the app processes of a multi-worker deployment (see cluster.py)
+if os.getenv('USER_STORAGE_BACKEND', 'file') == 'sqlite':
+    use_sqlite_user_storage(os.getenv('USER_STORAGE_PATH', 'user_storage.sqlite3'))
 
 # Table configuration mapping display names to table names
 TABLE_CONFIG = {
@@ -19,110 +56,102 @@ TABLE_CONFIG = {
     'Devices Issued': 'devices_issued'
 }
 
-
-def format_value(value: Any) -> str:
-    # Format values for display
-    if value is None:
-        return ''
-    if isinstance(value, datetime):
-        return value.strftime('%Y-%m-%d %H:%M:%S')
-    return str(value)
+# Global search over the text columns of all tables, built in the background at startup
+table_search = TableSearch(db, TABLE_CONFIG.values(), use_fulltext=os.getenv('SEARCH_FULLTEXT', '0') == '1')
 
 
-def format_field_label(field_name: str) -> str:
-    # Format field name for display, removing '_id' suffix
-    label = field_name.replace('_', ' ').title()
-    # Remove " Id" suffix from foreign key fields
-    return label.replace(' Id', '')
+# Filter operators offered in the table view
+FILTER_OPS = {'eq': 'equals', 'prefix': 'starts with', 'range': 'between'}
 
+# Seconds to collect changes from other users before applying them to an open table as one update
+LIVE_UPDATE_DELAY = float(os.getenv('LIVE_UPDATE_DELAY', '0.2'))
 
-def parse_specification(specification: str) -> List[str]:
-    # Parse specification string into list of attributes
-    if not specification:
-        return []
-    # Split by comma and trim whitespace from each attribute
-    return [attr.strip() for attr in specification.split(',') if attr.strip()]
+# Infinite scroll mode: windows of per_page rows kept in the browser at once, windows cached
+# per client, and how close (in rows) to either end of the loaded rows the next window is loaded
+SCROLL_LOADED_WINDOWS = 3
+SCROLL_CACHE_WINDOWS = int(os.getenv('SCROLL_CACHE_WINDOWS', '8'))
+SCROLL_MARGIN = 10
 
+# Rendered table pages (rows with resolved labels, formatted values and key_performance HTML) shared by all
+# visitors, served while none of the tables they were built from has been written to; 0 MB disables the cache
+page_cache = PageCache(max_bytes=int(float(os.getenv('PAGE_CACHE_MAX_MB', '64')) * 1024 * 1024),
+                       ttl=float(os.getenv('PAGE_CACHE_TTL', '300')))
 
-def format_json_for_display(json_data: Any, collapsed: bool = True) -> dict:
-    # Format JSON key_performance data for table display
-    # Returns dict with 'collapsed' and 'expanded' versions
-    if not json_data or not isinstance(json_data, dict):
-        return {'collapsed': '', 'expanded': '', 'has_more': False}
 
-    formatted_pairs = []
-    for key, value in json_data.items():
-        if value:  # Only include non-empty values
-            formatted_pairs.append(f"{key}: {value}")
-
-    if len(formatted_pairs) <= 3:
-        display_text = '<br>'.join(formatted_pairs)
-        return {'collapsed': display_text, 'expanded': display_text, 'has_more': False}
-    else:
-        # Collapsed: Show first 3 and indicate how many more
-        first_three = '<br>'.join(formatted_pairs[:3])
-        remaining = len(formatted_pairs) - 3
-        collapsed_text = f"{first_three}<br><span style='color: #666; font-style: italic;'>(+{remaining} more - click to expand)</span>"
+def page_url(table_display_name: str, per_page: int, page: int = 1, cursor: str = '',
+             sort: str = '', desc: bool = False, filters: tuple = (), mode: str = 'pages') -> str:
+    # Build the URL of a table view, leaving out defaults
+    params = {'table': table_display_name, 'page': page, 'per_page': per_page}
+    if mode == 'scroll':
+        params['view'] = 'scroll'
+    if cursor:
+        params['cursor'] = cursor
+    if sort:
+        params['sort'] = sort
+        if desc:
+            params['desc'] = 1
+    if filters:
+        params['filters'] = json.dumps([[f.column, f.op, f.value, f.value_to] for f in filters])
+    return '/?' + urlencode(params)
 
-        # Expanded: Show all
-        expanded_text = '<br>'.join(formatted_pairs)
-
-        return {'collapsed': collapsed_text, 'expanded': expanded_text, 'has_more': True}
-
-
-def get_foreign_key_display(table_name: str, column_name: str, value: Any) -> str:
-    # Get display value for foreign keys
-    if value is None:
-        return ''
 
+def parse_filters(filters: str) -> tuple:
+    # Parse the filters URL parameter written by page_url, ignoring anything malformed
     try:
-        match column_name:
-            case 'manufacturer_id':
-                manufacturers = db.get_manufacturers()
-                for m in manufacturers:
-                    if m['id'] == value:
-                        return m['name']
-
-            case'device_type_id':
-                types = db.get_device_types()
-                for t in types:
-                    if t['id'] == value:
-                        return t['device_type']
-
-            case 'department_id':
-                departments = db.get_departments()
-                for d in departments:
-                    if d['id'] == value:
-                        return d['name']
-
-            case 'employee_id':
-                employees = db.get_employees()
-                for e in employees:
-                    if e['id'] == value:
-                        return f"{e['first_name']} {e['last_name']}"
-
-            case 'device_id':
-                devices = db.get_devices()
-                for d in devices:
-                    if d['id'] == value:
-                        return f"{d['model']} ({d['serial_number']})"
-
-            case 'model_id':
-                device_models = db.get_device_models()
-                for dm in device_models:
-                    if dm['id'] == value:
-                        return f"{dm['model']} ({dm['manufacturer_name']})"
-    except:
-        pass
-
-    return str(value)
-
-
-def create_form_field(column_info: Dict[str, Any], initial_value: Any = None, table_name: str = None, is_new: bool = True):
+        return tuple(ColumnFilter(*item[:4]) for item in json.loads(filters) if item[1] in FILTER_OPS)
+    except Exception:
+        return ()
+
+
+def column_label(column: str) -> str:
+    # Label of a filter or sort column, key_performance attributes ('kp.<attribute>') by their name
+    attribute = attribute_name(column)
+    return f'{attribute} (key performance)' if attribute else format_field_label(column)
+
+
+async def attribute_columns(table_name: str) -> Dict[str, str]:
+    # Filter and sort columns for the key_performance attributes declared by any device type
+    if table_name != 'device_models':
+        return {}
+    columns = {}
+    for specification in (await adb.get_device_type_specifications()).values():
+        for attr in parse_specification(specification):
+            columns.setdefault(ATTRIBUTE_PREFIX + attr, column_label(ATTRIBUTE_PREFIX + attr))
+    return columns
+
+
+def page_dependencies(table_name: str) -> tuple:
+    # Tables a rendered page of a table is built from: the table itself and those behind its foreign key labels
+    tables = [table_name]
+    for col in adb.schema.get(table_name).column_names:
+        if col in FOREIGN_KEY_LOOKUPS:
+            tables.extend(t for t in LOOKUPS[FOREIGN_KEY_LOOKUPS[col]][1] if t not in tables)
+    if table_name == 'device_models' and 'device_types' not in tables:
+        tables.append('device_types')  # Attribute columns come from the device type specifications
+    return tuple(tables)
+
+
+async def resolve_foreign_keys(data: List[Dict[str, Any]], column_names: List[str]) -> Dict[str, Dict[Any, str]]:
+    # Resolve display labels for every foreign key value on a page
+    # Costs one query per foreign key column, independent of the number of rows
+    labels = {}
+    for col in column_names:
+        if col not in FOREIGN_KEY_LABELS:
+            continue
+        ids = [row.get(col) for row in data]
+        try:
+            referenced = await adb.get_foreign_key_rows(col, ids)
+        except Exception:
+            referenced = {}
+        labels[col] = build_foreign_key_labels(col, referenced)
+    return labels
+
+
+async def create_form_field(column_info: Column, initial_value: Any = None, table_name: str = None, is_new: bool = True):
     # Create appropriate form field based on column type
-    field_name = column_info['Field']
-    field_type = column_info['Type']
-    is_nullable = column_info['Null'] == 'YES'
+    field_name = column_info.name
+    field_type = column_info.type
+    is_nullable = column_info.nullable
 
     # Skip ID field for new entries
     if field_name == 'id' and initial_value is None:
@@ -138,58 +167,14 @@ def create_form_field(column_info: Dict[str, Any], initial_value: Any = None, ta
 
     label = format_field_label(field_name)
 
-    # Handle foreign keys with dropdowns
-    match field_name:
-        case 'manufacturer_id':
-            manufacturers = db.get_manufacturers()
-            if not manufacturers:
-                return ui.label(f'{label}: No manufacturers available').classes('text-orange-600 w-full')
-            options = {m['id']: m['name'] for m in manufacturers}
-            return ui.select(options=options, label=label, value=initial_value).classes('w-full')
-
-        case 'device_type_id':
-            types = db.get_device_types()
-            if not types:
-                return ui.label(f'{label}: No device types available').classes('text-orange-600 w-full')
-            options = {t['id']: t['device_type'] for t in types}
-            return ui.select(options=options, label=label, value=initial_value).classes('w-full')
-
-        case 'department_id':
-            departments = db.get_departments()
-            if not departments:
-                return ui.label(f'{label}: No departments available').classes('text-orange-600 w-full')
-            options = {d['id']: d['name'] for d in departments}
-            return ui.select(options=options, label=label, value=initial_value).classes('w-full')
-
-        case 'employee_id':
-            employees = db.get_employees()
-            if not employees and not is_nullable:
-                return ui.label(f'{label}: No employees available').classes('text-orange-600 w-full')
-            options = {e['id']: f"{e['first_name']} {e['last_name']}" for e in employees}
-            if is_nullable:
-                options[None] = '(None)'
-            return ui.select(options=options, label=label, value=initial_value).classes('w-full')
-
-        case 'device_id':
-            # For new devices_issued entries, only show available devices
-            if table_name == 'devices_issued' and is_new:
-                devices = db.get_available_devices()
-                if not devices:
-                    return ui.label(f'{label}: No available devices to issue').classes('text-orange-600 w-full')
-            else:
-                devices = db.get_devices()
-                if not devices:
-                    return ui.label(f'{label}: No devices available').classes('text-orange-600 w-full')
-            options = {d['id']: f"{d['model']} ({d['serial_number']})" for d in devices}
-            return ui.select(options=options, label=label, value=initial_value).classes('w-full')
-
-        case 'model_id':
-            device_models = db.get_device_models()
-            if not device_models:
-                return ui.label(f'{label}: No device models available').classes('text-orange-600 w-full')
-            options = {dm['id']: f"{dm['model']} ({dm['manufacturer_name']})" for dm in device_models}
-            return ui.select(options=options, label=label, value=initial_value).classes('w-full')
+    # Foreign keys get dropdowns that search the referenced table on the server
+    if field_name in FOREIGN_KEY_LABELS:
+        # For new devices_issued entries, only show available devices
+        available_only = table_name == 'devices_issued' and field_name == 'device_id' and is_new
+        return await foreign_key_select(adb, field_name, label, initial_value,
+                                        nullable=is_nullable, available_only=available_only)
 
+    match field_name:
         case 'specification':
             # Handle specification field with textarea
             return ui.textarea(label=label, value=initial_value if initial_value else '').classes('w-full')
@@ -209,10 +194,10 @@ def create_form_field(column_info: Dict[str, Any], initial_value: Any = None, ta
                 return ui.input(label=label, value=initial_value if initial_value else '').classes('w-full')
 
 
-async def show_new_entry_dialog(table_display_name: str):
+async def show_new_entry_dialog(table_display_name: str, view: 'TableView' = None):
     # Show dialog for creating a new entry
     table_name = TABLE_CONFIG[table_display_name]
-    columns = db.get_table_columns(table_name)
+    columns = adb.schema.get(table_name).columns
 
     form_fields = {}
     key_performance_fields = {}
@@ -222,25 +207,25 @@ async def show_new_entry_dialog(table_display_name: str):
 
         with ui.column().classes('w-full gap-2') as form_column:
             for col in columns:
-                if col['Field'] == 'id':
+                if col.name == 'id':
                     continue
-                field = create_form_field(col, table_name=table_name, is_new=True)
+                field = await create_form_field(col, table_name=table_name, is_new=True)
                 if field:
-                    form_fields[col['Field']] = field
+                    form_fields[col.name] = field
 
             # Special handling for devices_issued: auto-select department when employee is picked
             if table_name == 'devices_issued':
-                def update_department_from_employee():
+                async def update_department_from_employee():
                     employee_id_field = form_fields.get('employee_id')
                     department_id_field = form_fields.get('department_id')
 
                     if employee_id_field and department_id_field and employee_id_field.value:
-                        employee = db.get_employee_by_id(employee_id_field.value)
+                        employee = await adb.get_employee_by_id(employee_id_field.value)
                         if employee and employee.get('department_id'):
-                            department_id_field.value = employee['department_id']
+                            await set_foreign_key_value(adb, department_id_field, 'department_id', employee['department_id'])
 
                 if 'employee_id' in form_fields:
-                    form_fields['employee_id'].on('update:model-value', lambda: update_department_from_employee())
+                    form_fields['employee_id'].on('update:model-value', update_department_from_employee)
 
             # Special handling for key_performance in device_models table
             if table_name == 'device_models':
@@ -251,13 +236,13 @@ async def show_new_entry_dialog(table_display_name: str):
                 kp_container = ui.column().classes('w-full gap-2')
 
                 # Function to update key_performance fields based on device_type
-                def update_kp_fields():
+                async def update_kp_fields():
                     kp_container.clear()
                     key_performance_fields.clear()
 
                     device_type_id = form_fields.get('device_type_id')
                     if device_type_id and device_type_id.value:
-                        device_type = db.get_device_type_by_id(device_type_id.value)
+                        device_type = await adb.get_device_type_by_id(device_type_id.value)
                         if device_type and device_type.get('specification'):
                             attributes = parse_specification(device_type['specification'])
                             with kp_container:
@@ -273,30 +258,32 @@ async def show_new_entry_dialog(table_display_name: str):
 
                 # Bind the update function to device_type_id changes
                 if 'device_type_id' in form_fields:
-                    form_fields['device_type_id'].on('update:model-value', lambda: update_kp_fields())
+                    form_fields['device_type_id'].on('update:model-value', update_kp_fields)
 
                 # Initial call to set up fields
-                update_kp_fields()
+                await update_kp_fields()
 
         with ui.row().classes('w-full justify-end gap-2 mt-4'):
             ui.button('Cancel', on_click=dialog.close).props('flat')
-            ui.button('Create', on_click=lambda: save_new_entry(dialog, table_name, form_fields, key_performance_fields))
+            ui.button('Create', on_click=lambda: save_new_entry(dialog, table_name, form_fields, key_performance_fields, view))
 
     dialog.open()
 
 
-async def save_new_entry(dialog, table_name: str, form_fields: Dict, key_performance_fields: Dict = None):
+async def save_new_entry(dialog, table_name: str, form_fields: Dict, key_performance_fields: Dict = None, view: 'TableView' = None):
     # Save a new entry to the database
+    # Tag the change with this client, which applies it itself instead of through the change feed
+    change_source.set(ui.context.client.id)
     try:
+        schema = adb.schema.get(table_name)
         data = {}
         for field_name, field_widget in form_fields.items():
             value = field_widget.value
             # Handle empty strings for nullable fields
             if value == '' or value is None:
                 # Check if field allows NULL
-                columns = db.get_table_columns(table_name)
-                col_info = next((c for c in columns if c['Field'] == field_name), None)
-                if col_info and col_info['Null'] == 'YES':
+                col_info = schema.column(field_name)
+                if col_info and col_info.nullable:
                     data[field_name] = None
                 else:
                     data[field_name] = value
@@ -314,20 +301,23 @@ async def save_new_entry(dialog, table_name: str, form_fields: Dict, key_perform
             # Convert to JSON string
             data['key_performance'] = json.dumps(key_performance_json) if key_performance_json else None
 
-        db.insert_row(table_name, data)
+        new_id = await adb.insert_row(table_name, data)
         ui.notify('Entry created successfully!', type='positive')
         dialog.close()
-        # Refresh the page
-        ui.navigate.reload()
+        # Show the new row without re-rendering the page
+        if view:
+            await view.row_inserted(new_id)
+        else:
+            ui.navigate.reload()
     except Exception as e:
         ui.notify(f'Error creating entry: {str(e)}', type='negative')
 
 
-async def show_edit_dialog(table_display_name: str, row_id: int):
+async def show_edit_dialog(table_display_name: str, row_id: int, view: 'TableView' = None):
     # Show dialog for editing an entry
     table_name = TABLE_CONFIG[table_display_name]
-    row_data = db.get_row_by_id(table_name, row_id)
-    columns = db.get_table_columns(table_name)
+    row_data = await adb.get_row_by_id(table_name, row_id)
+    columns = adb.schema.get(table_name).columns
 
     if not row_data:
         ui.notify('Entry not found', type='negative')
@@ -341,25 +331,25 @@ async def show_edit_dialog(table_display_name: str, row_id: int):
 
         with ui.column().classes('w-full gap-2'):
             for col in columns:
-                if col['Field'] == 'id':
+                if col.name == 'id':
                     continue
-                field = create_form_field(col, row_data.get(col['Field']), table_name=table_name, is_new=False)
+                field = await create_form_field(col, row_data.get(col.name), table_name=table_name, is_new=False)
                 if field:
-                    form_fields[col['Field']] = field
+                    form_fields[col.name] = field
 
             # Special handling for devices_issued: auto-select department when employee is picked
             if table_name == 'devices_issued':
-                def update_department_from_employee():
+                async def update_department_from_employee():
                     employee_id_field = form_fields.get('employee_id')
                     department_id_field = form_fields.get('department_id')
 
                     if employee_id_field and department_id_field and employee_id_field.value:
-                        employee = db.get_employee_by_id(employee_id_field.value)
+                        employee = await adb.get_employee_by_id(employee_id_field.value)
                         if employee and employee.get('department_id'):
-                            department_id_field.value = employee['department_id']
+                            await set_foreign_key_value(adb, department_id_field, 'department_id', employee['department_id'])
 
                 if 'employee_id' in form_fields:
-                    form_fields['employee_id'].on('update:model-value', lambda: update_department_from_employee())
+                    form_fields['employee_id'].on('update:model-value', update_department_from_employee)
 
             # Special handling for key_performance in device_models table
             if table_name == 'device_models':
@@ -381,13 +371,13 @@ async def show_edit_dialog(table_display_name: str, row_id: int):
                         pass
 
                 # Function to update key_performance fields based on device_type
-                def update_kp_fields():
+                async def update_kp_fields():
                     kp_container.clear()
                     key_performance_fields.clear()
 
                     device_type_id = form_fields.get('device_type_id')
                     if device_type_id and device_type_id.value:
-                        device_type = db.get_device_type_by_id(device_type_id.value)
+                        device_type = await adb.get_device_type_by_id(device_type_id.value)
                         if device_type and device_type.get('specification'):
                             attributes = parse_specification(device_type['specification'])
                             with kp_container:
@@ -405,29 +395,30 @@ async def show_edit_dialog(table_display_name: str, row_id: int):
 
                 # Bind the update function to device_type_id changes
                 if 'device_type_id' in form_fields:
-                    form_fields['device_type_id'].on('update:model-value', lambda: update_kp_fields())
+                    form_fields['device_type_id'].on('update:model-value', update_kp_fields)
 
                 # Initial call to set up fields
-                update_kp_fields()
+                await update_kp_fields()
 
         with ui.row().classes('w-full justify-end gap-2 mt-4'):
             ui.button('Cancel', on_click=dialog.close).props('flat')
-            ui.button('Save', on_click=lambda: save_edit(dialog, table_name, row_id, form_fields, key_performance_fields))
+            ui.button('Save', on_click=lambda: save_edit(dialog, table_name, row_id, form_fields, key_performance_fields, view))
 
     dialog.open()
 
 
-async def save_edit(dialog, table_name: str, row_id: int, form_fields: Dict, key_performance_fields: Dict = None):
+async def save_edit(dialog, table_name: str, row_id: int, form_fields: Dict, key_performance_fields: Dict = None, view: 'TableView' = None):
     # Save edited entry to the database
+    change_source.set(ui.context.client.id)
     try:
+        schema = adb.schema.get(table_name)
         data = {}
         for field_name, field_widget in form_fields.items():
             value = field_widget.value
             # Handle empty strings for nullable fields
             if value == '' or value is None:
-                columns = db.get_table_columns(table_name)
-                col_info = next((c for c in columns if c['Field'] == field_name), None)
-                if col_info and col_info['Null'] == 'YES':
+                col_info = schema.column(field_name)
+                if col_info and col_info.nullable:
                     data[field_name] = None
                 else:
                     data[field_name] = value
@@ -445,16 +436,91 @@ async def save_edit(dialog, table_name: str, row_id: int, form_fields: Dict, key
             # Convert to JSON string
             data['key_performance'] = json.dumps(key_performance_json) if key_performance_json else None
 
-        db.update_row(table_name, row_id, data)
+        await adb.update_row(table_name, row_id, data)
         ui.notify('Entry updated successfully!', type='positive')
         dialog.close()
-        # Refresh the page
-        ui.navigate.reload()
+        # Patch the edited row without re-rendering the page
+        if view:
+            await view.row_updated(row_id)
+        else:
+            ui.navigate.reload()
     except Exception as e:
         ui.notify(f'Error updating entry: {str(e)}', type='negative')
 
 
-async def show_delete_dialog(table_display_name: str, row_id: int):
+async def show_search_results(query: str):
+    # Show the rows of all tables matching a search, each linking to its table filtered to that row
+    query = (query or '').strip()
+    if not query:
+        return
+    hits = await adb.run(table_search.search, query)
+    display_names = {table_name: display_name for display_name, table_name in TABLE_CONFIG.items()}
+
+    with ui.dialog() as dialog, ui.card().classes('w-full max-w-2xl'):
+        ui.label(f"Search results for '{query}'").classes('text-xl font-bold mb-4')
+        if not table_search.ready:
+            ui.label('The search index is still being built, results may be incomplete.').classes('text-gray-500')
+        if not hits:
+            ui.label('No matches found').classes('text-gray-500')
+
+        for table_name, display_name in display_names.items():
+            table_hits = [hit for hit in hits if hit.table == table_name]
+            if not table_hits:
+                continue
+            ui.label(display_name).classes('font-semibold mt-2')
+            for hit in table_hits:
+                ui.button(
+                    hit.text,
+                    on_click=lambda hit=hit: ui.navigate.to(page_url(display_names[hit.table], 25,
+                                                                     filters=(ColumnFilter('id', 'eq', hit.row_id),)))
+                ).props('flat no-caps align=left').classes('w-full')
+
+        with ui.row().classes('w-full justify-end gap-2 mt-4'):
+            ui.button('Close', on_click=dialog.close).props('flat')
+
+    dialog.open()
+
+
+async def show_import_dialog(table_display_name: str):
+    # Show dialog for bulk importing a CSV or NDJSON file
+    table_name = TABLE_CONFIG[table_display_name]
+
+    async def handle_upload(e):
+        fmt = 'ndjson' if e.file.name.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+        # This client reloads when the dialog closes, the change feed only needs to tell the others
+        change_source.set(e.client.id)
+        try:
+            text = await e.file.text()
+            result = await adb.run(import_rows, db, table_name, text, fmt, timeout=600)
+        except Exception as ex:
+            ui.notify(f'Error importing {e.file.name}: {str(ex)}', type='negative')
+            return
+
+        with results:
+            results.clear()
+            ui.label(f'{result.inserted} entries imported, {len(result.errors)} rejected').classes('font-semibold')
+            # Row numbers count data rows from 1, not including a CSV header
+            for index, message in result.errors[:50]:
+                ui.label(f'Row {index + 1}: {message}').classes('text-red-600 text-sm')
+            if len(result.errors) > 50:
+                ui.label(f'... and {len(result.errors) - 50} more').classes('text-red-600 text-sm')
+        if result.inserted:
+            ui.notify(f'{result.inserted} entries imported', type='positive')
+
+    with ui.dialog() as dialog, ui.card().classes('w-full max-w-2xl'):
+        ui.label(f'Import {table_display_name}').classes('text-xl font-bold mb-4')
+        ui.label('Upload a CSV file with a header row or an NDJSON file (.ndjson/.jsonl). '
+                 'Foreign keys may be given as ids or display names.').classes('text-gray-500 mb-2')
+        ui.upload(on_upload=handle_upload, auto_upload=True).props('accept=".csv,.ndjson,.jsonl"').classes('w-full')
+        results = ui.column().classes('w-full gap-1 mt-2')
+
+        with ui.row().classes('w-full justify-end gap-2 mt-4'):
+            ui.button('Close', on_click=lambda: (dialog.close(), ui.navigate.reload())).props('flat')
+
+    dialog.open()
+
+
+async def show_delete_dialog(table_display_name: str, row_id: int, view: 'TableView' = None):
     # Show confirmation dialog for deleting an entry
     table_name = TABLE_CONFIG[table_display_name]
 
@@ -465,52 +531,468 @@ async def show_delete_dialog(table_display_name: str, row_id: int):
 
         with ui.row().classes('w-full justify-end gap-2'):
             ui.button('Cancel', on_click=dialog.close).props('flat')
-            ui.button('Delete', on_click=lambda: confirm_delete(dialog, table_name, row_id)).props('color=negative')
+            ui.button('Delete', on_click=lambda: confirm_delete(dialog, table_name, row_id, view)).props('color=negative')
 
     dialog.open()
 
 
-async def confirm_delete(dialog, table_name: str, row_id: int):
+async def confirm_delete(dialog, table_name: str, row_id: int, view: 'TableView' = None):
     # Delete the entry from the database
+    change_source.set(ui.context.client.id)
     try:
-        success = db.delete_row(table_name, row_id)
+        success = await adb.delete_row(table_name, row_id)
         if success:
             ui.notify('Entry deleted successfully!', type='positive')
         else:
             ui.notify('Entry not found or already deleted', type='warning')
         dialog.close()
-        # Refresh the page
-        ui.navigate.reload()
+        # Remove the row without re-rendering the page
+        if view and success:
+            await view.row_deleted(row_id)
+        else:
+            ui.navigate.reload()
     except Exception as e:
         ui.notify(f'Error deleting entry: {str(e)}', type='negative')
 
 
-def render_table_page(table_display_name: str, items_per_page: int, current_page: int):
-    # Render the table display page
+async def show_history_dialog(table_display_name: str, row_id: int):
+    # Show the recorded writes of an entry, newest first, and the entry as it was at a given time
     table_name = TABLE_CONFIG[table_display_name]
+    try:
+        history = await adb.get_row_history(table_name, row_id)
+    except Exception as e:
+        ui.notify(f'Error loading history: {str(e)}', type='negative')
+        return
+
+    with ui.dialog() as dialog, ui.card().classes('w-full max-w-2xl'):
+        ui.label(f'History of {table_display_name} Entry (ID: {row_id})').classes('text-xl font-bold mb-4')
+        if not history:
+            ui.label('No recorded changes').classes('text-gray-500')
+
+        for record in history:
+            session = f' · session {record.session_id[:8]}' if record.session_id else ''
+            ui.label(f'{record.changed_at:%Y-%m-%d %H:%M:%S} · {record.operation}{session}').classes('font-semibold mt-2')
+            if record.operation == 'update':
+                for col, value in record.after.items():
+                    ui.label(f'{format_field_label(col)}: {(record.before or {}).get(col)} → {value}').classes('text-sm')
+            else:
+                for col, value in (record.after if record.operation == 'insert' else record.before or {}).items():
+                    ui.label(f'{format_field_label(col)}: {value}').classes('text-sm')
+
+        ui.separator().classes('my-4')
+        with ui.row().classes('w-full items-center gap-2'):
+            as_of_input = ui.input('As of', placeholder='YYYY-MM-DD HH:MM').classes('w-48')
+
+            async def show_as_of():
+                as_of_result.clear()
+                try:
+                    when = datetime.fromisoformat(as_of_input.value.strip())
+                except ValueError:
+                    ui.notify('Enter a date and time like 2025-01-31 14:30', type='warning')
+                    return
+                row = await adb.get_row_as_of(table_name, row_id, when)
+                with as_of_result:
+                    if row is None:
+                        ui.label('The entry did not exist at that time').classes('text-gray-500')
+                    for col, value in (row or {}).items():
+                        ui.label(f'{format_field_label(col)}: {value}').classes('text-sm')
+
+            ui.button('Show', on_click=show_as_of).props('flat')
+        as_of_result = ui.column().classes('w-full gap-0')
+
+        with ui.row().classes('w-full justify-end gap-2 mt-4'):
+            ui.button('Close', on_click=dialog.close).props('flat')
 
-    # Calculate offset
-    offset = (current_page - 1) * items_per_page
+    dialog.open()
+
+
+async def format_rows(table_name: str, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Format database rows for display in the table
+    column_names = adb.schema.get(table_name).column_names
+
+    # Resolve all foreign key labels for these rows up front
+    fk_labels = await resolve_foreign_keys(data, column_names)
+
+    return format_table_rows(column_names, data, fk_labels)
+
+
+class TableView:
+    # State of a rendered table page, so writes - by this user or, via the change feed, by others -
+    # patch the affected rows in place instead of reloading the whole page. Falls back to a reload
+    # only when a change moves page boundaries in a way a targeted fetch cannot repair.
+
+    mode = 'pages'
+
+    def __init__(self, table_display_name: str, items_per_page: int, current_page: int, table_page: TablePage,
+                 sort_by: str = '', descending: bool = False, filters: tuple = ()):
+        self.table_display_name = table_display_name
+        self.table_name = TABLE_CONFIG[table_display_name]
+        self.items_per_page = items_per_page
+        self.current_page = current_page
+        self.sort_by = sort_by
+        self.descending = descending
+        self.filters = filters
+        self.total_count = table_page.total_count
+        self.count_is_approximate = table_page.count_is_approximate
+        self.next_cursor = table_page.next_cursor
+        self.prev_cursor = table_page.prev_cursor
+        # Unformatted rows by id, to detect changes that move a row out of the page
+        self.raw_rows = {row['id']: row for row in table_page.rows}
+
+        # Set while rendering
+        self.table = None
+        self.count_label = None
+        self.page_label = None
+        self.prev_button = None
+        self.next_button = None
+        self.stale_banner = None
+
+        # Live updates from other clients
+        self.client_id = ''
+        self._pending: Dict[tuple, str] = {}
+        self._flush_scheduled = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def keyset(self) -> bool:
+        # Pages sorted by id are bounded by row ids, so neighbouring rows can be fetched directly
+        return (self.sort_by or 'id') == 'id'
+
+    def url(self, page: int = 1, cursor: str = '', per_page: int = None, sort: str = None,
+            desc: bool = None, filters: tuple = None, mode: str = None) -> str:
+        # URL of this view with some parameters changed
+        return page_url(self.table_display_name, per_page or self.items_per_page, page, cursor,
+                        self.sort_by if sort is None else sort, self.descending if desc is None else desc,
+                        self.filters if filters is None else filters, mode or self.mode)
+
+    def count_text(self) -> str:
+        return f"Total: {'~' if self.count_is_approximate else ''}{self.total_count} entries"
+
+    def page_text(self) -> str:
+        total_pages = max(1, (self.total_count + self.items_per_page - 1) // self.items_per_page)
+        return f'Page {self.current_page} of {max(total_pages, self.current_page)}'
+
+    def update_controls(self):
+        self.count_label.text = self.count_text()
+        self.page_label.text = self.page_text()
+        self.prev_button.set_enabled(self.prev_cursor is not None)
+        self.next_button.set_enabled(self.next_cursor is not None)
+
+    def watch(self, client):
+        # Subscribe to changes of the shown table and of the tables its foreign key labels come from,
+        # made by other clients or app processes. Events arrive on database threads and are handed to
+        # the event loop, collected for LIVE_UPDATE_DELAY seconds and applied as one row diff.
+        loop = asyncio.get_running_loop()
+        self.client_id = client.id
+        watched = {self.table_name}
+        for col in adb.schema.get(self.table_name).column_names:
+            if col in FOREIGN_KEY_LOOKUPS:
+                watched.update(LOOKUPS[FOREIGN_KEY_LOOKUPS[col]][1])
+
+        def on_change(event: ChangeEvent):
+            if event.table in watched and event.source != self.client_id:
+                loop.call_soon_threadsafe(self._queue_change, event)
+
+        client.on_delete(db.changes.subscribe(on_change))
+
+    def _queue_change(self, event: ChangeEvent):
+        key = (event.table, event.row_id)
+        op = coalesce(self._pending.get(key), event.op)
+        if op is None:
+            self._pending.pop(key, None)
+        else:
+            self._pending[key] = op
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_later(LIVE_UPDATE_DELAY, lambda: background_tasks.create(self._flush()))
+
+    async def _flush(self):
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, {}
+        if not pending or (self.table is not None and self.table.is_deleted):
+            return
+        own = {row_id: op for (table, row_id), op in pending.items() if table == self.table_name}
+        try:
+            if own:
+                await self.apply_changes(own)
+            else:
+                await self._relabel()
+        except Exception:
+            logger.exception('Could not apply live changes to %s', self.table_name)
+
+    async def row_inserted(self, row_id: int):
+        await self.apply_changes({row_id: 'insert'}, local=True)
+
+    async def row_updated(self, row_id: int):
+        await self.apply_changes({row_id: 'update'}, local=True)
+
+    async def row_deleted(self, row_id: int):
+        await self.apply_changes({row_id: 'delete'}, local=True)
+
+    async def apply_changes(self, changes: Dict[Any, str], local: bool = False):
+        # Apply {row_id: op} changes of this view's table with targeted fetches. Changes that cannot
+        # be placed on this page reload it for the user who made them and flag it as outdated for others.
+        async with self._lock:
+            if self.table is None or 'reset' in changes.values():
+                self._out_of_date(local)
+                return
+            inserted = 'insert' in changes.values()
+            deleted = [row_id for row_id, op in changes.items() if op == 'delete']
+            updated = [row_id for row_id, op in changes.items() if op == 'update']
+            # A new row has the highest id, it only lands on this page at the end of an ascending view
+            # In a descending view it pushes every row on the first page down by one
+            if (inserted or deleted) and (not self.keyset or (inserted and self.descending and self.prev_cursor is None)):
+                self._out_of_date(local)
+                return
+            # A changed sort or filter value may move a row onto or off this page,
+            # attributes ('kp.<attribute>') change with the key_performance document
+            moving_columns = {'key_performance' if attribute_name(col) else col
+                              for col in {self.sort_by} | {f.column for f in self.filters} if col and col != 'id'}
+            if moving_columns and any(row_id not in self.raw_rows for row_id in updated):
+                self._out_of_date(local)
+                return
+
+            on_page = [row_id for row_id in updated if row_id in self.raw_rows]
+            # From the primary, the changed rows may not have reached a replica yet
+            fresh = await adb.get_rows_by_ids(self.table_name, on_page, primary=True)
+            for row_id in on_page:
+                row = fresh.get(row_id)
+                if row is None or any(self.raw_rows[row_id].get(col) != row.get(col) for col in moving_columns):
+                    self._out_of_date(local)
+                    return
+            for row in await format_rows(self.table_name, list(fresh.values())):
+                self.raw_rows[row['_id']] = fresh[row['_id']]
+                self.table.rows[self._index(row['_id'])] = row
+
+            for row_id in deleted:
+                index = self._index(row_id)
+                if index is not None:
+                    del self.table.rows[index]
+                    self.raw_rows.pop(row_id, None)
+            if inserted or deleted:
+                if not self.table.rows:
+                    self._out_of_date(local)
+                    return
+                # Pull in rows that move up from the next page and refresh the totals
+                await self._fill()
+            else:
+                self.table.update()
+
+    async def _relabel(self):
+        # A referenced row changed (e.g. a manufacturer was renamed), re-resolve the labels on this page
+        async with self._lock:
+            if self.table is None:
+                return
+            raw_rows = [self.raw_rows[row['_id']] for row in self.table.rows]
+            self.table.rows[:] = await format_rows(self.table_name, raw_rows)
+            self.table.update()
+
+    def _out_of_date(self, local: bool):
+        if local:
+            ui.navigate.reload()
+        elif self.stale_banner is not None:
+            self.stale_banner.set_visibility(True)
+
+    async def _fill(self):
+        # Top the page up with the rows following its last row and refresh the totals,
+        # one targeted fetch instead of a full page render
+        last_id = self.table.rows[-1]['_id']
+        capacity = self.items_per_page - len(self.table.rows)
+        fetched = await adb.get_table_page(self.table_name, limit=max(capacity, 1), cursor=encode_cursor('next', last_id),
+                                           sort_by='id', descending=self.descending, filters=self.filters)
+        new_rows = fetched.rows[:capacity]
+        has_next = len(fetched.rows) > capacity or fetched.next_cursor is not None
+        if new_rows:
+            self.raw_rows.update({row['id']: row for row in new_rows})
+            self.table.rows.extend(await format_rows(self.table_name, new_rows))
+        self.table.update()
+
+        self.next_cursor = encode_cursor('next', self.table.rows[-1]['_id']) if has_next else None
+        if self.prev_cursor is not None:
+            self.prev_cursor = encode_cursor('prev', self.table.rows[0]['_id'])
+        self.total_count = fetched.total_count
+        self.count_is_approximate = fetched.count_is_approximate
+        self.update_controls()
+
+    def _index(self, row_id: int):
+        if self.table is None:
+            return None
+        return next((i for i, row in enumerate(self.table.rows) if row['_id'] == row_id), None)
+
+
+class ScrollView(TableView):
+    # Infinite scrolling table. Rows are fetched in windows of items_per_page rows as the user
+    # scrolls, and only SCROLL_LOADED_WINDOWS consecutive windows are held by the browser:
+    # loading a window at one end drops the window at the other end. Fetched windows stay in a
+    # per-client LRU cache so scrolling back does not hit the database, and the window after
+    # the last loaded one is prefetched in the background.
+
+    mode = 'scroll'
+
+    def __init__(self, table_display_name: str, items_per_page: int, table_page: TablePage,
+                 sort_by: str = '', descending: bool = False, filters: tuple = ()):
+        super().__init__(table_display_name, items_per_page, 1, table_page, sort_by, descending, filters)
+        self.windows = WindowCache(SCROLL_CACHE_WINDOWS)
+        # Cursor to fetch each window with, known once the window before it was fetched
+        self.cursors: Dict[int, str] = {}
+        if table_page.next_cursor:
+            self.cursors[1] = table_page.next_cursor
+        # (window index, row count) of the windows currently in the table, in display order
+        self.loaded = [(0, len(table_page.rows))]
+        self._fetching: Dict[int, asyncio.Task] = {}
+
+    def page_text(self) -> str:
+        return ''
 
-    # Get data
-    data, total_count = db.get_table_data(table_name, limit=items_per_page, offset=offset)
-    total_pages = max(1, (total_count + items_per_page - 1) // items_per_page)
+    def update_controls(self):
+        self.count_label.text = self.count_text()
+
+    async def scrolled(self, e):
+        # Quasar reports the range of rendered row indexes, load a window when it nears either end
+        if self.table is None or self._lock.locked():
+            return
+        async with self._lock:
+            start, end = e.args['from'], e.args['to']
+            if end >= len(self.table.rows) - SCROLL_MARGIN and self.loaded[-1][0] + 1 in self.cursors:
+                await self._load_next(start)
+            elif start <= SCROLL_MARGIN and self.loaded[0][0] > 0:
+                await self._load_previous(start)
+
+    async def _load_next(self, start: int):
+        index = self.loaded[-1][0] + 1
+        page, rows = await self._window(index)
+        self.raw_rows.update({row['id']: row for row in page.rows})
+        self.table.rows.extend(rows)
+        self.loaded.append((index, len(rows)))
+        dropped = 0
+        if len(self.loaded) > SCROLL_LOADED_WINDOWS:
+            dropped = self.loaded.pop(0)[1]
+            for row in self.table.rows[:dropped]:
+                self.raw_rows.pop(row['_id'], None)
+            del self.table.rows[:dropped]
+        self.table.update()
+        self.update_controls()
+        if dropped:
+            # Keep the rows the user is looking at in place after the top of the list moved
+            self.table.run_method('scrollTo', max(0, start - dropped))
+        if index + 1 in self.cursors and index + 1 not in self.windows:
+            background_tasks.create(self._window(index + 1), name='prefetch table window')
+
+    async def _load_previous(self, start: int):
+        index = self.loaded[0][0] - 1
+        page, rows = await self._window(index)
+        self.raw_rows.update({row['id']: row for row in page.rows})
+        self.table.rows[:0] = rows
+        self.loaded.insert(0, (index, len(rows)))
+        if len(self.loaded) > SCROLL_LOADED_WINDOWS:
+            dropped = self.loaded.pop()[1]
+            for row in self.table.rows[-dropped:]:
+                self.raw_rows.pop(row['_id'], None)
+            del self.table.rows[-dropped:]
+        self.table.update()
+        self.update_controls()
+        self.table.run_method('scrollTo', start + len(rows))
+
+    async def _window(self, index: int) -> tuple:
+        # (TablePage, formatted rows) of a window, from the cache or fetched once even if requested concurrently
+        window = self.windows.get(index)
+        if window is not None:
+            return window
+        task = self._fetching.get(index)
+        if task is None:
+            task = self._fetching[index] = asyncio.ensure_future(self._fetch(index))
+            task.add_done_callback(lambda _: self._fetching.pop(index, None))
+        return await task
+
+    async def _fetch(self, index: int) -> tuple:
+        page = await adb.get_table_page(self.table_name, limit=self.items_per_page, cursor=self.cursors.get(index),
+                                        sort_by=self.sort_by or None, descending=self.descending, filters=self.filters)
+        window = (page, await format_rows(self.table_name, page.rows))
+        self.windows.put(index, window)
+        if page.next_cursor:
+            self.cursors[index + 1] = page.next_cursor
+        self.total_count = page.total_count
+        self.count_is_approximate = page.count_is_approximate
+        return window
+
+    async def apply_changes(self, changes: Dict[Any, str], local: bool = False):
+        # Cached windows may hold any changed row. Updates of loaded rows are patched in place,
+        # inserted or deleted rows shift every window boundary after them, so the view is restarted.
+        self.windows.clear()
+        if any(op != 'update' for op in changes.values()):
+            self._out_of_date(local)
+            return
+        await super().apply_changes(changes, local)
+
+    async def _relabel(self):
+        self.windows.clear()
+        await super()._relabel()
+
+
+async def render_table_page(table_display_name: str, items_per_page: int, current_page: int, cursor: str = '',
+                            sort_by: str = '', descending: bool = False, filters: tuple = (), mode: str = 'pages'):
+    # Render the table display page, paged or as an infinitely scrolling table
+    if mode == 'scroll':
+        # Scrolling always starts at the top, the page and cursor only apply to paged views
+        current_page, cursor = 1, ''
+    table_name = TABLE_CONFIG[table_display_name]
+    column_names = adb.schema.get(table_name).column_names
+
+    # Serve the formatted page from the page cache while its tables are unchanged,
+    # taking the versions before reading so a concurrent write leaves the entry stale
+    cache_key = page_url(table_display_name, items_per_page, current_page, cursor, sort_by, descending, filters)
+    dependencies = page_dependencies(table_name)
+    versions = db.versions.snapshot(dependencies)
+    cached = page_cache.get(cache_key, versions)
+    if cached is not None:
+        table_page, formatted_rows, attributes = cached
+    else:
+        # Get data, seeking from the cursor if we got here via prev/next
+        # Links without a cursor (e.g. bookmarked pages) fall back to an offset for the first fetch
+        # Sorting and filtering happen in the database so they apply across all pages
+        try:
+            table_page = await adb.get_table_page(table_name, limit=items_per_page, cursor=cursor or None,
+                                                  offset=0 if cursor else (current_page - 1) * items_per_page,
+                                                  sort_by=sort_by or None, descending=descending, filters=filters)
+            cacheable = True
+        except ValueError as e:
+            ui.notify(f'Invalid table view: {str(e)}', type='warning')
+            current_page, sort_by, descending, filters = 1, '', False, ()
+            table_page = await adb.get_table_page(table_name, limit=items_per_page)
+            cacheable = False
+        formatted_rows = await format_rows(table_name, table_page.rows)
+        attributes = await attribute_columns(table_name)
+        # A page read from a replica may miss a recent write, only cache it once its tables have settled
+        if cacheable and page_cache.max_bytes > 0 and db.replicas.settled(dependencies):
+            page_cache.put(cache_key, versions, (table_page, formatted_rows, attributes))
+    if mode == 'scroll':
+        view = ScrollView(table_display_name, items_per_page, table_page, sort_by, descending, filters)
+    else:
+        view = TableView(table_display_name, items_per_page, current_page, table_page, sort_by, descending, filters)
 
     # Header with New Entry button
     with ui.row().classes('w-full justify-between items-center mb-4'):
         ui.label(table_display_name).classes('text-2xl font-bold')
-        ui.button('New Entry', icon='add', on_click=lambda: show_new_entry_dialog(table_display_name)).props('color=primary')
+        with ui.row().classes('gap-2'):
+            with ui.button('Export', icon='download').props('outline'):
+                with ui.menu():
+                    ui.menu_item('CSV', on_click=lambda: ui.download.from_url(f'/export/{table_name}?format=csv'))
+                    ui.menu_item('NDJSON', on_click=lambda: ui.download.from_url(f'/export/{table_name}?format=ndjson'))
+            ui.button('Import', icon='upload', on_click=lambda: show_import_dialog(table_display_name)).props('outline')
+            ui.button('New Entry', icon='add', on_click=lambda: show_new_entry_dialog(table_display_name, view)).props('color=primary')
 
     # Pagination controls at top
     with ui.row().classes('w-full items-center gap-4 mb-4'):
-        ui.label(f'Total: {total_count} entries')
+        view.count_label = ui.label(view.count_text())
+        if table_page.count_is_approximate:
+            view.count_label.tooltip('Approximate count from table statistics')
 
         # Items per page selector
         def change_items_per_page(e):
             if e.value == 'custom':
                 return  # Will handle custom input separately
             new_per_page = int(e.value)
-            ui.navigate.to(f'/?table={table_display_name}&page=1&per_page={new_per_page}')
+            ui.navigate.to(view.url(per_page=new_per_page))
 
         ui.select(
             options={'25': '25 per page', '50': '50 per page', '100': '100 per page'},
@@ -518,58 +1000,96 @@ def render_table_page(table_display_name: str, items_per_page: int, current_page
             on_change=change_items_per_page
         ).classes('w-40')
 
-        # Page navigation
-        ui.label(f'Page {current_page} of {total_pages}')
+        # Page navigation, scrolling views load further rows on their own
+        if mode != 'scroll':
+            view.page_label = ui.label(view.page_text())
 
-        def prev_page():
-            if current_page > 1:
-                ui.navigate.to(f'/?table={table_display_name}&page={current_page - 1}&per_page={items_per_page}')
+            def prev_page():
+                if view.prev_cursor:
+                    ui.navigate.to(view.url(page=max(1, view.current_page - 1), cursor=view.prev_cursor))
 
-        def next_page():
-            if current_page < total_pages:
-                ui.navigate.to(f'/?table={table_display_name}&page={current_page + 1}&per_page={items_per_page}')
+            def next_page():
+                if view.next_cursor:
+                    ui.navigate.to(view.url(page=view.current_page + 1, cursor=view.next_cursor))
 
-        ui.button(icon='chevron_left', on_click=prev_page).props('flat').set_enabled(current_page > 1)
-        ui.button(icon='chevron_right', on_click=next_page).props('flat').set_enabled(current_page < total_pages)
+            view.prev_button = ui.button(icon='chevron_left', on_click=prev_page).props('flat')
+            view.next_button = ui.button(icon='chevron_right', on_click=next_page).props('flat')
+            view.prev_button.set_enabled(view.prev_cursor is not None)
+            view.next_button.set_enabled(view.next_cursor is not None)
 
-    # Table display
-    if data:
-        columns_info = db.get_table_columns(table_name)
-        column_names = [col['Field'] for col in columns_info]
+        if mode == 'scroll':
+            ui.button('Pages', icon='auto_stories', on_click=lambda: ui.navigate.to(view.url(mode='pages'))).props('flat')
+        else:
+            ui.button('Scroll', icon='swap_vert', on_click=lambda: ui.navigate.to(view.url(mode='scroll'))).props('flat')
+
+    # Column filters, applied server-side
+    with ui.expansion('Filters', icon='filter_list', value=bool(filters)).classes('w-full mb-4'):
+        for i, f in enumerate(filters):
+            with ui.row().classes('items-center gap-2'):
+                if f.op == 'range':
+                    ui.label(f"{column_label(f.column)} between {f.value or '…'} and {f.value_to or '…'}")
+                else:
+                    ui.label(f"{column_label(f.column)} {FILTER_OPS[f.op]} {f.value}")
+                ui.button(icon='close', on_click=lambda i=i: ui.navigate.to(view.url(filters=filters[:i] + filters[i + 1:]))).props('flat dense')
+
+        with ui.row().classes('items-end gap-2'):
+            filter_column = ui.select({**{col: format_field_label(col) for col in column_names}, **attributes},
+                                      label='Column', with_input=bool(attributes)).classes('w-40')
+            filter_op = ui.select(FILTER_OPS, value='eq', label='Match').classes('w-32')
+            filter_value = ui.input('Value')
+            filter_value_to = ui.input('To').bind_visibility_from(filter_op, 'value', value='range')
+
+            def add_filter():
+                if not filter_column.value:
+                    ui.notify('Select a column to filter', type='warning')
+                    return
+                value_to = filter_value_to.value if filter_op.value == 'range' else None
+                new_filter = ColumnFilter(filter_column.value, filter_op.value, filter_value.value, value_to)
+                ui.navigate.to(view.url(filters=filters + (new_filter,)))
+
+            ui.button('Apply', icon='filter_alt', on_click=add_filter)
+
+        # Key performance attributes are not table columns, so they are sorted by from here
+        if attributes:
+            with ui.row().classes('items-end gap-2'):
+                ui.select({'': 'Table order', **attributes}, label='Sort by attribute',
+                          value=sort_by if sort_by in attributes else '', with_input=True,
+                          on_change=lambda e: ui.navigate.to(view.url(sort=e.value or ''))).classes('w-64')
+                if sort_by in attributes:
+                    ui.switch('Descending', value=descending, on_change=lambda e: ui.navigate.to(view.url(desc=e.value)))
+
+    # Shown when other users changed this table in a way that cannot be patched into the page
+    with ui.row().classes('w-full items-center gap-2 mb-4 p-2 rounded bg-amber-100 dark:bg-amber-900') as view.stale_banner:
+        ui.icon('sync_problem')
+        ui.label('This table was changed by another user.')
+        ui.button('Refresh', on_click=ui.navigate.reload).props('flat dense')
+    view.stale_banner.set_visibility(False)
 
+    # Table display
+    if table_page.rows:
         # Create table headers with Edit column
         headers = [{'name': col, 'label': format_field_label(col), 'field': col, 'sortable': True, 'align': 'left'} for col in column_names]
         headers.append({'name': 'actions', 'label': 'Actions', 'field': 'actions', 'sortable': False})
 
-        # Prepare rows with formatted values
-        rows = []
-        for row in data:
-            formatted_row = {}
-            for col in column_names:
-                value = row.get(col)
-                # Show foreign key display values
-                if col.endswith('_id') and col != 'id':
-                    formatted_row[col] = get_foreign_key_display(table_name, col, value)
-                # Handle key_performance JSON display
-                elif col == 'key_performance':
-                    # Parse JSON if it's a string
-                    json_value = value
-                    if isinstance(value, str):
-                        try:
-                            json_value = json.loads(value)
-                        except:
-                            json_value = value
-                    kp_data = format_json_for_display(json_value)
-                    formatted_row[col] = kp_data['collapsed']
-                    formatted_row['key_performance_expanded'] = kp_data['expanded']
-                    formatted_row['key_performance_collapsed'] = kp_data['collapsed']
-                    formatted_row['is_expanded'] = False
-                else:
-                    formatted_row[col] = format_value(value)
-            formatted_row['_id'] = row['id']  # Store actual ID for edit
-            rows.append(formatted_row)
+        # Copies of the formatted rows, live updates change the table's rows in place
+        rows = [dict(row) for row in formatted_rows]
 
-        table = ui.table(columns=headers, rows=rows, row_key='_id').classes('w-full')
+        # rowsNumber marks the table as server-side, so sorting emits 'request' instead of sorting this page only
+        table = ui.table(columns=headers, rows=rows, row_key='_id', pagination={
+            'rowsPerPage': 0, 'rowsNumber': len(rows), 'sortBy': sort_by or None, 'descending': descending
+        }).props('hide-pagination').classes('w-full')
+        view.table = table
+
+        if mode == 'scroll':
+            # Virtual scrolling needs a fixed height, Quasar then only renders the rows in sight
+            table.props('virtual-scroll').style('height: 70vh')
+            table.on('virtual-scroll', view.scrolled, ['from', 'to', 'direction'], throttle=0.1)
+
+        def change_sort(e):
+            pagination = e.args['pagination']
+            ui.navigate.to(view.url(sort=pagination.get('sortBy') or '', desc=bool(pagination.get('descending'))))
+
+        table.on('request', change_sort)
 
         # Add custom slot for key_performance column with HTML rendering and click to expand
         if table_name == 'device_models':
@@ -583,19 +1103,24 @@ def render_table_page(table_display_name: str, items_per_page: int, current_page
         table.add_slot('body-cell-actions', '''
             <q-td :props="props">
                 <q-btn flat dense icon="edit" @click="$parent.$emit('edit', props.row)" />
+                <q-btn flat dense icon="history" @click="$parent.$emit('history', props.row)" />
                 <q-btn flat dense icon="delete" color="negative" @click="$parent.$emit('delete', props.row)" />
             </q-td>
         ''')
 
-        table.on('edit', lambda e: show_edit_dialog(table_display_name, e.args['_id']))
-        table.on('delete', lambda e: show_delete_dialog(table_display_name, e.args['_id']))
+        table.on('edit', lambda e: show_edit_dialog(table_display_name, e.args['_id'], view))
+        table.on('delete', lambda e: show_delete_dialog(table_display_name, e.args['_id'], view))
+        table.on('history', lambda e: show_history_dialog(table_display_name, e.args['_id']))
 
     else:
         ui.label('No entries found').classes('text-gray-500')
 
+    view.watch(ui.context.client)
+
 
 @ui.page('/')
-def main_page(table: str = 'Devices', page: int = 1, per_page: int = 25):
+async def main_page(table: str = 'Devices', page: int = 1, per_page: int = 25, cursor: str = '',
+              sort: str = '', desc: bool = False, filters: str = '', view: str = 'pages'):
     # Main page with navigation and content
 
     # Validate table name
@@ -614,12 +1139,14 @@ def main_page(table: str = 'Devices', page: int = 1, per_page: int = 25):
 
     with ui.left_drawer(fixed=True).classes('bg-gray-100 dark:bg-gray-900').style('width: 250px'):
         ui.label('ScooTeq Database').classes('text-xl font-bold p-4')
+        ui.input(placeholder='Search...').props('dense outlined clearable').classes('w-full px-4 mb-2') \
+            .on('keydown.enter', lambda e: show_search_results(e.sender.value))
 
         with ui.column().classes('w-full'):
             for table_name in TABLE_CONFIG.keys():
                 ui.button(
                     table_name,
-                    on_click=lambda t=table_name: ui.navigate.to(f'/?table={t}&page=1&per_page={per_page}')
+                    on_click=lambda t=table_name: ui.navigate.to(page_url(t, per_page))
                 ).props('flat align=left').classes('w-full')
 
         # Dark mode toggle and database operations at bottom of sidebar
@@ -627,14 +1154,100 @@ def main_page(table: str = 'Devices', page: int = 1, per_page: int = 25):
         with ui.row().classes('w-full px-4'):
             ui.switch('Dark mode').bind_value(dark).on('update:model-value', save_dark_mode)
 
-    # Main content area
-    with ui.column().classes('w-full p-6'):
-        render_table_page(table, per_page, page)
+    # Main content area, the statements it takes are reported per table on /metrics
+    with ui.column().classes('w-full p-6'), db.metrics.track_render(table):
+        await render_table_page(table, per_page, page, cursor, sort, desc, parse_filters(filters),
+                                'scroll' if view == 'scroll' else 'pages')
+
+
+def load_schema():
+    # Load column metadata for every configured table once at startup
+    try:
+        db.schema.load(TABLE_CONFIG.values())
+    except Exception as e:
+        # Tables missing from the registry are loaded on first use instead
+        logger.warning('Could not preload table schema: %s', e)
+
+
+def sync_model_attributes():
+    # Mirror key_performance attributes of device models written before the side table existed
+    try:
+        synced = db.sync_model_attributes()
+        if synced:
+            logger.info('Mirrored key performance attributes of %d device model(s)', synced)
+    except Exception as e:
+        logger.error('Could not sync key performance attributes: %s', e)
 
 
+def create_indexes():
+    # Databases created before docker/init.sql had them lack the indexes sorting and filtering rely on
+    try:
+        if os.getenv('DB_CREATE_INDEXES', '1') == '1':
+            for index_name in db.create_recommended_indexes():
+                logger.info('Created index %s', index_name)
+        else:
+            for table_name, index_name, columns in db.get_missing_indexes():
+                logger.warning('Index %s on %s (%s) is missing, sorting and filtering by it scan the table',
+                               index_name, table_name, ', '.join(columns))
+    except Exception as e:
+        logger.error('Could not create the recommended indexes: %s', e)
+
+
+app.on_startup(load_schema)
+app.on_startup(sync_model_attributes)
+app.on_startup(create_indexes)
+app.on_startup(lambda: db.start_count_refresh(float(os.getenv('DB_COUNT_REFRESH_INTERVAL', '60'))))
+app.on_startup(table_search.start)
+app.on_startup(lambda: db.audit.start(db.compact_audit_log, float(os.getenv('AUDIT_COMPACT_INTERVAL', '3600'))))
+app.on_shutdown(db.audit.flush)
+app.on_startup(lambda: db.replicas.start_health_checks(float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '5'))))
+
+
+@app.get('/export/{table_name}')
+def export_table(table_name: str, format: str = 'csv', resolve: bool = True, chunk_size: int = 1000):
+    # Stream a whole table as CSV or NDJSON, optionally with foreign keys resolved to display names
+    if table_name not in TABLE_CONFIG.values():
+        raise HTTPException(status_code=404, detail=f'Unknown table: {table_name}')
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown export format: {format}")
+    chunk_size = max(1, min(10000, chunk_size))
+    return StreamingResponse(
+        stream_export(adb, table_name, format, resolve_foreign_keys=resolve, chunk_size=chunk_size),
+        media_type=EXPORT_FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="{table_name}.{format}"'}
+    )
+
+
+@app.get('/stats/pool')
+def pool_stats():
+    # Connection pool usage for sizing DB_POOL_SIZE under load, plus the pools and health of the read replicas
+    stats = db.pool_stats()
+    if db.replicas:
+        stats['replicas'] = db.replica_stats()
+    return stats
+
+
+@app.get('/metrics')
+def metrics():
+    # Query and render metrics plus connection pool, page cache and audit log gauges in the Prometheus text format
+    gauges = {f'db_pool_{key}': value for key, value in db.pool_stats().items()}
+    # One gauge per replica statistic, labeled with the replica's position in DB_REPLICAS
+    replica_gauges = {}
+    for index, replica in enumerate(db.replica_stats()):
+        for key, value in replica.items():
+            if isinstance(value, (int, float)):
+                replica_gauges.setdefault(f'db_replica_{key}', ('replica', {}))[1][str(index)] = float(value)
+    gauges.update({f'page_cache_{key}': value for key, value in page_cache.stats().items()})
+    gauges.update({f'audit_log_{key}': value for key, value in db.audit.stats().items()})
+    return PlainTextResponse(db.metrics.render_prometheus(gauges, replica_gauges), media_type='text/plain; version=0.0.4')
+
+
+# Workers of a multi-worker deployment serve a Unix socket behind the balancer of cluster.py instead of a port
+uds_config = {'uds': os.environ['APP_UDS']} if os.getenv('APP_UDS') else {}
 ui.run(
     host='0.0.0.0',
     port=int(os.getenv('APP_PORT', '8081')),
     reload=False,
-    storage_secret=os.getenv('STORAGE_SECRET', 'scooteq_secret_key_change_in_production')
+    storage_secret=os.getenv('STORAGE_SECRET', 'scooteq_secret_key_change_in_production'),
+    **uds_config
 )
@@ -0,0 +1,338 @@
+import contextvars
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# UI handler (or other caller) a database call is made for, set by AsyncDatabase.run
+current_handler: contextvars.ContextVar[str] = contextvars.ContextVar('current_handler', default='')
+
+# Statement counter of the page render in progress, see QueryMetrics.track_render
+_current_render: contextvars.ContextVar[Optional['RenderStats']] = contextvars.ContextVar('current_render', default=None)
+
+# Modules skipped when looking for the caller of a database call
+_INTERNAL_MODULES = {'async_database', 'metrics', 'contextlib', 'functools'}
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_VALUE_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def fingerprint(statement: str) -> str:
+    """Normalize a statement so executions that differ only in values or list lengths share one fingerprint"""
+    text = _WHITESPACE.sub(' ', statement).strip()
+    text = _STRING_LITERAL.sub('?', text)
+    text = _NUMBER_LITERAL.sub('?', text)
+    return _VALUE_LIST.sub('(...)', text)
+
+
+def caller_name() -> str:
+    """Qualified name of the first function up the stack outside the database plumbing"""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get('__name__') in _INTERNAL_MODULES:
+        frame = frame.f_back
+    if frame is None:
+        return ''
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class Rolling:
+    """Count and sum of a measurement plus its last `size` samples, for rolling quantiles"""
+
+    __slots__ = ('count', 'total', 'samples')
+
+    def __init__(self, size: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=size)
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {}
+        return {q: ordered[min(len(ordered) - 1, int(len(ordered) * q))] for q in QUANTILES}
+
+
+class StatementStats:
+    __slots__ = ('duration', 'rows', 'errors')
+
+    def __init__(self, window: int):
+        self.duration = Rolling(window)
+        self.rows = 0
+        self.errors = 0
+
+
+class RenderStats:
+    """Statements executed for one page render"""
+
+    def __init__(self):
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def add(self):
+        with self._lock:
+            self.queries += 1
+
+
+class QueryMetrics:
+    """
+    Collects per-statement timings, rows and errors, per-handler query counts, Database call
+    durations and statements per page render, and renders them in the Prometheus text format.
+    Statements slower than `slow_ms` are logged, a `slow_sample` share of them (1.0 logs all).
+    """
+
+    def __init__(self, enabled: bool = True, slow_ms: float = 500.0, slow_sample: float = 1.0,
+                 window: int = 1024, max_statements: int = 500):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.slow_sample = slow_sample
+        self.window = window
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._statements: Dict[str, StatementStats] = {}
+        self._handlers: Dict[str, list] = {}
+        self._calls: Dict[str, Rolling] = {}
+        self._render_queries: Dict[str, Rolling] = {}
+        self._render_durations: Dict[str, Rolling] = {}
+        # Raw statement -> fingerprint, most statements are the same few strings
+        self._fingerprints: Dict[str, str] = {}
+
+    @classmethod
+    def from_env(cls) -> 'QueryMetrics':
+        return cls(enabled=os.getenv('DB_METRICS', '1') != '0',
+                   slow_ms=float(os.getenv('DB_SLOW_QUERY_MS', '500')),
+                   slow_sample=float(os.getenv('DB_SLOW_QUERY_SAMPLE', '1.0')))
+
+    def record_query(self, statement: str, duration: float, rows: int, error: bool = False):
+        """Record one executed statement, duration in seconds"""
+        fp = self._fingerprints.get(statement)
+        if fp is None:
+            if len(self._fingerprints) > 10 * self.max_statements:
+                self._fingerprints.clear()
+            fp = self._fingerprints[statement] = fingerprint(statement)
+        handler = current_handler.get() or 'background'
+        render = _current_render.get()
+        if render is not None:
+            render.add()
+
+        with self._lock:
+            stats = self._statements.get(fp)
+            if stats is None:
+                # Bound the number of label values, unexpected statement shapes share one entry
+                if len(self._statements) >= self.max_statements:
+                    fp = 'other'
+                stats = self._statements.setdefault(fp, StatementStats(self.window))
+            stats.duration.add(duration)
+            stats.rows += rows
+            stats.errors += error
+            handler_stats = self._handlers.setdefault(handler, [0, 0.0])
+            handler_stats[0] += 1
+            handler_stats[1] += duration
+
+        if self.slow_ms and duration * 1000 >= self.slow_ms and random.random() < self.slow_sample:
+            logger.warning('Slow query (%.1f ms, %s rows, %s): %s', duration * 1000, rows, handler, fp)
+
+    def record_call(self, method: str, duration: float):
+        """Record the duration of a Database call made through AsyncDatabase"""
+        with self._lock:
+            self._calls.setdefault(method, Rolling(self.window)).add(duration)
+
+    @contextmanager
+    def track_render(self, page: str):
+        """Count the statements and time of a page render, including calls made on worker threads"""
+        stats = RenderStats()
+        token = _current_render.set(stats)
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            _current_render.reset(token)
+            with self._lock:
+                self._render_queries.setdefault(page, Rolling(self.window)).add(stats.queries)
+                self._render_durations.setdefault(page, Rolling(self.window)).add(time.perf_counter() - start)
+
+    def render_prometheus(self, gauges: Optional[Dict[str, float]] = None,
+                          labeled_gauges: Optional[Dict[str, Tuple[str, Dict[str, float]]]] = None) -> str:
+        """
+        All metrics in the Prometheus text exposition format, plus the given extra gauges.
+        labeled_gauges maps a gauge name to its label name and the value per label value.
+        """
+        lines = []
+        with self._lock:
+            statements = {fp: (s.duration.count, s.duration.total, s.duration.quantiles(), s.rows, s.errors)
+                          for fp, s in self._statements.items()}
+            handlers = {h: tuple(v) for h, v in self._handlers.items()}
+            calls = self._snapshot(self._calls)
+            render_queries = self._snapshot(self._render_queries)
+            render_durations = self._snapshot(self._render_durations)
+
+        _summary(lines, 'db_query_duration_seconds', 'Statement duration by fingerprint (rolling quantiles)',
+                 'statement', {fp: (count, total, quantiles) for fp, (count, total, quantiles, _, _) in statements.items()})
+        _counter(lines, 'db_query_rows_total', 'Rows returned or affected by fingerprint',
+                 'statement', {fp: s[3] for fp, s in statements.items()})
+        _counter(lines, 'db_query_errors_total', 'Failed statements by fingerprint',
+                 'statement', {fp: s[4] for fp, s in statements.items()})
+        _counter(lines, 'db_handler_queries_total', 'Statements executed by calling handler',
+                 'handler', {h: v[0] for h, v in handlers.items()})
+        _counter(lines, 'db_handler_query_seconds_total', 'Time spent in statements by calling handler',
+                 'handler', {h: v[1] for h, v in handlers.items()})
+        _summary(lines, 'db_call_duration_seconds', 'Duration of Database calls from the UI', 'method', calls)
+        _summary(lines, 'page_render_queries', 'Statements executed per page render', 'page', render_queries)
+        _summary(lines, 'page_render_duration_seconds', 'Page render duration', 'page', render_durations)
+        for name, value in (gauges or {}).items():
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+        for name, (label, values) in (labeled_gauges or {}).items():
+            lines.append(f'# TYPE {name} gauge')
+            for key, value in values.items():
+                lines.append(f'{name}{{{label}="{_label(key)}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _snapshot(rollings: Dict[str, Rolling]) -> Dict[str, tuple]:
+        return {key: (r.count, r.total, r.quantiles()) for key, r in rollings.items()}
+
+
+class InstrumentedConnection:
+    """Proxy of a pooled connection whose cursors report every statement to a QueryMetrics"""
+
+    def __init__(self, conn: Any, metrics: QueryMetrics):
+        self.raw = conn
+        self._metrics = metrics
+
+    def cursor(self, *args, **kwargs):
+        return self.instrument(self.raw.cursor(*args, **kwargs))
+
+    def instrument(self, cursor: Any):
+        """Report the statements of a cursor not opened through this proxy, e.g. a cached prepared one"""
+        return InstrumentedCursor(cursor, self._metrics) if self._metrics.enabled else cursor
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.raw, name)
+
+
+class InstrumentedCursor:
+    """
+    Cursor proxy timing each statement from execute through its fetches.
+    A statement is recorded when its execute returns if it has no result set, otherwise once a fetch
+    reaches the end of the result set; one whose result set is not read to the end is recorded
+    when the next one starts or the cursor is closed or dropped.
+    """
+
+    def __init__(self, cursor: Any, metrics: QueryMetrics):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._statement = None
+        self._elapsed = 0.0
+        self._rows = 0
+        self._fetched = False
+
+    def execute(self, operation: str, params: Any = None, *args, **kwargs):
+        return self._run(self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation: str, seq_params: Iterable, *args, **kwargs):
+        return self._run(self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def fetchmany(self, size: int = 1):
+        rows = self._fetch(self._cursor.fetchmany, size)
+        self._rows += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        self._rows += row is not None
+        if row is None:
+            self._finish()
+        return row
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+    def __del__(self):
+        # A cursor dropped without being closed, with a result set not read to the end
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    def _run(self, method, operation: str, *args, **kwargs):
+        self._finish()
+        self._statement, self._elapsed, self._rows, self._fetched = operation, 0.0, 0, False
+        start = time.perf_counter()
+        try:
+            result = method(operation, *args, **kwargs)
+        except Exception:
+            self._elapsed = time.perf_counter() - start
+            self._finish(error=True)
+            raise
+        self._elapsed = time.perf_counter() - start
+        if self._cursor.description is None:
+            self._finish()  # No result set to fetch
+        return result
+
+    def _fetch(self, method, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self._elapsed += time.perf_counter() - start
+            self._fetched = True
+
+    def _finish(self, error: bool = False):
+        if self._statement is None:
+            return
+        # Statements without a result set report the affected rows
+        rows = self._rows if self._fetched else max(self._cursor.rowcount or 0, 0)
+        statement, self._statement = self._statement, None
+        self._metrics.record_query(statement, self._elapsed, rows, error)
+
+
+def _label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _counter(lines: list, name: str, help_text: str, label: str, values: Dict[str, float]):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} counter')
+    for key, value in values.items():
+        lines.append(f'{name}{{{label}="{_label(key)}"}} {value}')
+
+
+def _summary(lines: list, name: str, help_text: str, label: str, values: Dict[str, tuple]):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} summary')
+    for key, (count, total, quantiles) in values.items():
+        key = _label(key)
+        for q, value in quantiles.items():
+            lines.append(f'{name}{{{label}="{key}",quantile="{q}"}} {value}')
+        lines.append(f'{name}_sum{{{label}="{key}"}} {total}')
+        lines.append(f'{name}_count{{{label}="{key}"}} {count}')
@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class PooledConnection:
+    """Bookkeeping for a single connection owned by the pool"""
+
+    def __init__(self, conn: Any):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.broken = False
+        # Data that lives as long as the connection, e.g. its prepared statements
+        self.state: Dict[str, Any] = {}
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of database connections.
+    Connections are opened lazily up to `size`, health-checked when they have
+    been idle for longer than `ping_interval` seconds and replaced once they
+    are older than `recycle` seconds.
+    """
+
+    def __init__(self, connect: Callable[[], Any], size: int = 10, timeout: float = 30.0,
+                 recycle: float = 1800.0, ping_interval: float = 30.0,
+                 is_healthy: Optional[Callable[[Any], bool]] = None):
+        self.connect = connect
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self.is_healthy = is_healthy or (lambda conn: True)
+
+        self._lock = threading.Condition()
+        self._idle: List[PooledConnection] = []
+        self._records: Dict[int, PooledConnection] = {}
+        self._open = 0
+        self._waiting = 0
+
+        # Counters for stats()
+        self._created = 0
+        self._recycled = 0
+        self._discarded = 0
+        self._acquires = 0
+        self._timeouts = 0
+        self._acquire_total = 0.0
+        self._acquire_max = 0.0
+        self._acquire_recent = deque(maxlen=1000)
+
+    def acquire(self) -> Any:
+        """Take a connection from the pool, opening a new one if allowed"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        record = None
+        create = False
+
+        with self._lock:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._idle:
+                        record = self._idle.pop()
+                        break
+                    if self._open < self.size:
+                        self._open += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(f'No database connection available after {self.timeout}s '
+                                               f'(pool size {self.size})')
+                    self._lock.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+        try:
+            if create:
+                record = self._create()
+            else:
+                record = self._validate(record)
+        except Exception:
+            with self._lock:
+                self._open -= 1
+                self._lock.notify()
+            raise
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._acquires += 1
+            self._acquire_total += elapsed
+            self._acquire_max = max(self._acquire_max, elapsed)
+            self._acquire_recent.append(elapsed)
+            self._records[id(record.conn)] = record
+        return record.conn
+
+    def release(self, conn: Any, discard: bool = False):
+        """Return a connection to the pool, or close it if it is no longer usable"""
+        with self._lock:
+            record = self._records.pop(id(conn), None)
+        if record is None:
+            return
+
+        if discard or record.broken:
+            self._close(record)
+            with self._lock:
+                self._discarded += 1
+                self._open -= 1
+                self._lock.notify()
+            return
+
+        record.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(record)
+            self._lock.notify()
+
+    def invalidate(self, conn: Any):
+        """Mark a checked-out connection so it is closed on release instead of being reused"""
+        with self._lock:
+            record = self._records.get(id(conn))
+            if record is not None:
+                record.broken = True
+
+    def state(self, conn: Any) -> Dict[str, Any]:
+        """Per-connection state of a checked-out connection, dropped together with the connection"""
+        with self._lock:
+            return self._records[id(conn)].state
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool usage for sizing under load"""
+        with self._lock:
+            recent = sorted(self._acquire_recent)
+            idle = len(self._idle)
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': idle,
+                'in_use': self._open - idle,
+                'waiting': self._waiting,
+                'created': self._created,
+                'recycled': self._recycled,
+                'discarded': self._discarded,
+                'acquires': self._acquires,
+                'timeouts': self._timeouts,
+                'acquire_avg_ms': (self._acquire_total / self._acquires * 1000) if self._acquires else 0.0,
+                'acquire_p95_ms': recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1000 if recent else 0.0,
+                'acquire_max_ms': self._acquire_max * 1000,
+            }
+
+    def close(self):
+        """Close every idle connection; connections in use are closed on release"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._lock.notify_all()
+        for record in idle:
+            self._close(record)
+
+    def _create(self) -> PooledConnection:
+        record = PooledConnection(self.connect())
+        with self._lock:
+            self._created += 1
+        return record
+
+    def _validate(self, record: PooledConnection) -> PooledConnection:
+        # Replace connections that are too old or fail their health check
+        now = time.monotonic()
+        stale = self.recycle > 0 and now - record.created_at > self.recycle
+        if not stale and now - record.last_used > self.ping_interval:
+            try:
+                stale = not self.is_healthy(record.conn)
+            except Exception:
+                stale = True
+        if not stale:
+            return record
+
+        self._close(record)
+        with self._lock:
+            self._recycled += 1
+        return self._create()
+
+    @staticmethod
+    def _close(record: PooledConnection):
+        try:
+            record.conn.close()
+        except Exception:
+            pass
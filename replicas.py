@@ -0,0 +1,162 @@
+"""
+Read replicas behind Database. Reads that can tolerate replication lag go to a replica picked at
+random by weight among the healthy ones; writes and everything else go to the primary.
+A session that wrote within the read-your-writes window reads from the primary, so it always
+sees its own changes. A replica that fails a connection or falls too far behind is taken out of
+rotation until a background health check finds it usable again.
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional
+
+from pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Session the current call is made for (the browser session in the UI, see AsyncDatabase),
+# writes are remembered per session for read-your-writes
+read_session: ContextVar[str] = ContextVar('read_session', default='')
+
+
+class Replica:
+    """A read replica: its backend, connection pool, share of the reads and health"""
+
+    def __init__(self, name: str, backend: Any, pool: ConnectionPool, weight: float = 1.0):
+        self.name = name
+        self.backend = backend
+        self.pool = pool
+        self.weight = weight
+        self.healthy = True
+        self.lag: Optional[float] = None
+        self.reads = 0
+        self.failures = 0
+        self.last_error = ''
+
+
+class ReplicaSet:
+    """
+    Routes reads over the replicas and tracks writes for read-your-writes.
+    Without replicas every read goes to the primary and nothing is tracked.
+    """
+
+    def __init__(self, replicas: Optional[List[Replica]] = None, window: float = 5.0, max_lag: float = 30.0):
+        self.replicas = [r for r in replicas or [] if r.weight > 0]
+        # Seconds after a write during which its session, and shared caches of its tables, read from the primary
+        self.window = window
+        # Replicas further behind than this many seconds get no reads
+        self.max_lag = max_lag
+        self._lock = threading.Lock()
+        self._session_writes: Dict[str, float] = {}
+        self._table_writes: Dict[str, float] = {}
+        self._checker = None
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def __iter__(self):
+        return iter(self.replicas)
+
+    def choose(self, session: str) -> Optional[Replica]:
+        """A healthy replica by weight for a read of `session`, None if the read must go to the primary"""
+        if not self.replicas or self.wrote_recently(session):
+            return None
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        replica = random.choices(healthy, weights=[r.weight for r in healthy])[0]
+        with self._lock:
+            replica.reads += 1
+        return replica
+
+    def mark_down(self, replica: Replica, error: Exception):
+        """Take a replica out of rotation until the next health check succeeds"""
+        with self._lock:
+            replica.failures += 1
+            replica.last_error = str(error)
+            was_healthy, replica.healthy = replica.healthy, False
+        if was_healthy:
+            logger.warning('Read replica %s taken out of rotation: %s', replica.name, error)
+
+    def record_write(self, session: Optional[str], table_name: str):
+        """Remember a write to a table, by `session` unless it came from another app process (None)"""
+        if not self.replicas:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._table_writes[table_name] = now
+            if session is not None:
+                self._session_writes[session] = now
+                if len(self._session_writes) > 1000:
+                    # Forget sessions whose window has passed, so the map does not grow with every visitor
+                    self._session_writes = {s: t for s, t in self._session_writes.items() if now - t < self.window}
+
+    def wrote_recently(self, session: str) -> bool:
+        with self._lock:
+            written = self._session_writes.get(session)
+        return written is not None and time.monotonic() - written < self.window
+
+    def settled(self, tables: Iterable[str]) -> bool:
+        """
+        Whether reads of the tables can be shared between sessions, i.e. no write to them is recent
+        enough to be missing on a replica. Results kept in shared caches are only read from a
+        replica, or only cached, when their tables are settled.
+        """
+        if not self.replicas:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            return all(now - self._table_writes.get(t, -self.window) >= self.window for t in tables)
+
+    def check(self, replica: Replica):
+        """Probe a replica and its replication lag, putting it back into rotation if it is usable"""
+        conn = replica.pool.acquire()
+        discard = False
+        try:
+            cursor = conn.cursor(dictionary=True)
+            lag = replica.backend.replica_lag(cursor)
+            cursor.close()
+        except Exception:
+            discard = True
+            raise
+        finally:
+            replica.pool.release(conn, discard=discard)
+
+        replica.lag = lag
+        if lag is not None and lag > self.max_lag:
+            self.mark_down(replica, RuntimeError(f'{lag:.0f} s behind the primary'))
+        elif not replica.healthy:
+            replica.healthy = True
+            logger.info('Read replica %s back in rotation', replica.name)
+
+    def start_health_checks(self, interval: float = 5.0):
+        """Check every replica every `interval` seconds in a background thread"""
+        if self._checker is not None or not self.replicas:
+            return
+
+        def run():
+            while True:
+                for replica in self.replicas:
+                    try:
+                        self.check(replica)
+                    except Exception as e:
+                        self.mark_down(replica, e)
+                time.sleep(interval)
+
+        self._checker = threading.Thread(target=run, name='replica-health-check', daemon=True)
+        self._checker.start()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Health, share of reads and pool usage per replica"""
+        return [{
+            'name': r.name,
+            'weight': r.weight,
+            'healthy': r.healthy,
+            'lag_seconds': r.lag,
+            'reads': r.reads,
+            'failures': r.failures,
+            'last_error': r.last_error,
+            **r.pool.stats(),
+        } for r in self.replicas]
@@ -0,0 +1,79 @@
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Column:
+    """Metadata for a single table column"""
+    name: str
+    type: str
+    nullable: bool
+    key: str = ''
+    default: Any = None
+    extra: str = ''
+
+    @classmethod
+    def from_metadata(cls, row: Dict[str, Any]) -> 'Column':
+        """Build a column from a normalized metadata dict of Backend.get_columns"""
+        return cls(
+            name=row['name'],
+            type=row['type'],
+            nullable=row['nullable'],
+            key=row.get('key', ''),
+            default=row.get('default'),
+            extra=row.get('extra', '')
+        )
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    """Ordered, immutable column metadata for a table"""
+    name: str
+    columns: Tuple[Column, ...]
+
+    @property
+    def column_names(self) -> List[str]:
+        return [col.name for col in self.columns]
+
+    def column(self, name: str) -> Optional[Column]:
+        """Get a column by name, or None if the table has no such column"""
+        return next((col for col in self.columns if col.name == name), None)
+
+
+class SchemaRegistry:
+    """
+    Column metadata for every known table, loaded once and shared by all code paths.
+    The registry is replaced as a whole on load/refresh, so readers never see a
+    partially updated schema.
+    """
+
+    def __init__(self, get_columns: Callable[[str], List[Dict[str, Any]]]):
+        self.get_columns = get_columns
+        self._lock = threading.Lock()
+        self._tables: Mapping[str, TableSchema] = MappingProxyType({})
+
+    def load(self, table_names: Iterable[str]):
+        """Load the schema of the given tables, keeping already known tables"""
+        loaded = {name: self._read(name) for name in table_names}
+        with self._lock:
+            self._tables = MappingProxyType({**self._tables, **loaded})
+
+    def refresh(self, table_name: Optional[str] = None):
+        """Reload one table, or every known table if none is given"""
+        self.load([table_name] if table_name else list(self._tables))
+
+    def get(self, table_name: str) -> TableSchema:
+        """Get a table's schema, loading it on first use if it was not preloaded"""
+        schema = self._tables.get(table_name)
+        if schema is None:
+            self.load([table_name])
+            schema = self._tables[table_name]
+        return schema
+
+    def __contains__(self, table_name: str) -> bool:
+        return table_name in self._tables
+
+    def _read(self, table_name: str) -> TableSchema:
+        return TableSchema(table_name, tuple(Column.from_metadata(row) for row in self.get_columns(table_name)))
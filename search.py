@@ -0,0 +1,225 @@
+import bisect
+import logging
+import queue
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from schema import TableSchema
+
+logger = logging.getLogger(__name__)
+
+# Column types whose values are indexed for search
+TEXT_TYPES = ('char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext')
+
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text: Any) -> List[str]:
+    """Split a value into lowercase word tokens"""
+    return _TOKEN.findall(str(text).lower())
+
+
+def searchable_columns(schema: TableSchema) -> List[str]:
+    """The text columns of a table"""
+    return [col.name for col in schema.columns if col.type.split('(')[0] in TEXT_TYPES]
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    """A matching row: its table, id and the text of its searchable columns"""
+    table: str
+    row_id: Any
+    text: str
+
+
+class SearchIndex:
+    """
+    In-memory inverted index answering word-prefix queries.
+    Every row is split into tokens, each token maps to the rows containing it. The tokens are also
+    kept in a sorted list, so all tokens starting with a prefix are one bisect away.
+    A query matches rows that have, for every query word, a token starting with that word.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Set[Tuple[str, Any]]] = {}
+        self._tokens: List[str] = []
+        # (table, row id) -> (display text, tokens)
+        self._docs: Dict[Tuple[str, Any], Tuple[str, Tuple[str, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, table_name: str, row_id: Any, values: Iterable[Any]):
+        """Index a row, replacing what was indexed for it before"""
+        with self._lock:
+            unused = self._remove((table_name, row_id))
+            added = self._add((table_name, row_id), values)
+            # Tokens both dropped and re-added by this row are still in the sorted list
+            for token in set(unused) - set(added):
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+            for token in set(added) - set(unused):
+                bisect.insort(self._tokens, token)
+
+    def add_many(self, table_name: str, rows: Iterable[Tuple[Any, Iterable[Any]]]):
+        """Index many (row id, values) at once, sorting the token list once at the end"""
+        with self._lock:
+            for row_id, values in rows:
+                self._remove((table_name, row_id))
+                self._add((table_name, row_id), values)
+            self._tokens = sorted(self._postings)
+
+    def remove(self, table_name: str, row_id: Any):
+        with self._lock:
+            for token in self._remove((table_name, row_id)):
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+
+    def search(self, query: str, limit: int = 20) -> List[SearchHit]:
+        """Rows matching every word of the query as a prefix, rows with exact word matches first"""
+        # Scan the postings of the longest word, which usually matches the fewest rows,
+        # and check the other words against each candidate's own tokens
+        words = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not words:
+            return []
+        first, rest = words[0], words[1:]
+        hits, seen = [], set()
+        with self._lock:
+            for i in range(bisect.bisect_left(self._tokens, first), len(self._tokens)):
+                token = self._tokens[i]
+                if not token.startswith(first):
+                    break
+                for key in self._postings[token]:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    text, tokens = self._docs[key]
+                    if all(any(t.startswith(word) for t in tokens) for word in rest):
+                        hits.append(SearchHit(key[0], key[1], text))
+                        if len(hits) >= limit:
+                            return hits
+        return hits
+
+    def _add(self, key: Tuple[str, Any], values: Iterable[Any]) -> List[str]:
+        # Returns the tokens that are new to the index
+        values = [str(value) for value in values if value not in (None, '')]
+        tokens = tuple(dict.fromkeys(token for value in values for token in tokenize(value)))
+        if not tokens:
+            return []
+        self._docs[key] = (' · '.join(values), tokens)
+        new_tokens = []
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                new_tokens.append(token)
+            postings.add(key)
+        return new_tokens
+
+    def _remove(self, key: Tuple[str, Any]) -> List[str]:
+        # Returns the tokens no row uses anymore
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return []
+        unused = []
+        for token in doc[1]:
+            postings = self._postings[token]
+            postings.discard(key)
+            if not postings:
+                del self._postings[token]
+                unused.append(token)
+        return unused
+
+
+class TableSearch:
+    """
+    Global search over the text columns of a set of tables.
+    Each table's rows are held in its own SearchIndex, built in the background at startup and
+    swapped in when complete, then kept fresh from the database change feed so writes by any
+    client or app process show up in results.
+    With use_fulltext, tables that have a MySQL FULLTEXT index are searched in the database
+    with MATCH ... AGAINST instead of being held in memory.
+    """
+
+    def __init__(self, db, tables: Iterable[str], use_fulltext: bool = False):
+        self.db = db
+        self.tables = list(tables)
+        self.use_fulltext = use_fulltext
+        self.indexes: Dict[str, SearchIndex] = {}
+        # Table -> columns of its FULLTEXT index, for tables searched in the database
+        self.fulltext: Dict[str, List[str]] = {}
+        self.ready = False
+        self._changes: queue.Queue = queue.Queue()
+
+    def start(self):
+        # Subscribe before loading, changes made during the load are applied after it
+        self.db.changes.subscribe(self._changes.put)
+        threading.Thread(target=self._run, name='search-index', daemon=True).start()
+
+    def search(self, query: str, limit: int = 20) -> List[SearchHit]:
+        """Rows matching every word of the query as a prefix, up to `limit` per table"""
+        hits = []
+        for index in list(self.indexes.values()):
+            hits.extend(index.search(query, limit))
+        terms = ' '.join(f'+{word}*' for word in tokenize(query))
+        if terms:
+            for table_name, columns in self.fulltext.items():
+                for row in self.db.search_fulltext(table_name, columns, terms, limit):
+                    text = ' · '.join(str(row[col]) for col in columns if row[col] not in (None, ''))
+                    hits.append(SearchHit(table_name, row['id'], text))
+        return hits
+
+    def _run(self):
+        for table_name in self.tables:
+            try:
+                self._load(table_name)
+            except Exception as e:
+                logger.error('Could not build search index for %s: %s', table_name, e)
+        self.ready = True
+        logger.info('Search index ready: %d rows', sum(len(index) for index in self.indexes.values()))
+
+        while True:
+            # Take a whole burst of changes, so changed rows are fetched with one query per table
+            events = [self._changes.get()]
+            while not self._changes.empty():
+                events.append(self._changes.get_nowait())
+            try:
+                self._apply(events)
+            except Exception as e:
+                logger.error('Could not update search index: %s', e)
+
+    def _load(self, table_name: str):
+        if self.use_fulltext:
+            columns = self.db.get_fulltext_columns(table_name)
+            if columns:
+                self.fulltext[table_name] = columns
+                return
+        columns = searchable_columns(self.db.schema.get(table_name))
+        if columns:
+            # Searches keep using the previous index of the table until the new one is complete
+            index = SearchIndex()
+            index.add_many(table_name, ((row['id'], [row[col] for col in columns])
+                                        for chunk in self.db.iter_table_rows(table_name, primary=True) for row in chunk))
+            self.indexes[table_name] = index
+
+    def _apply(self, events: list):
+        # Latest op per changed row, by table
+        changes: Dict[str, Dict[Any, str]] = {}
+        for event in events:
+            if event.table in self.indexes:
+                changes.setdefault(event.table, {})[event.row_id] = event.op
+
+        for table_name, ops in changes.items():
+            if 'reset' in ops.values():
+                self._load(table_name)
+                continue
+            index = self.indexes[table_name]
+            for row_id, op in ops.items():
+                if op == 'delete':
+                    index.remove(table_name, row_id)
+            columns = searchable_columns(self.db.schema.get(table_name))
+            # From the primary: a replica may not have the change yet, and nothing would correct the index later
+            rows = self.db.get_rows_by_ids(table_name, [row_id for row_id, op in ops.items() if op != 'delete'], primary=True)
+            for row_id, row in rows.items():
+                index.add(table_name, row_id, [row[col] for col in columns])
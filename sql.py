@@ -0,0 +1,132 @@
+import re
+from collections import OrderedDict
+from typing import Any, Iterable, List, Sequence
+
+from schema import SchemaRegistry
+
+# Plain table and column names; anything else is rejected before it reaches a statement
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a table, column or index name (MySQL and SQLite both accept backticks), raises ValueError for anything but a plain name"""
+    if not isinstance(name, str) or not _IDENTIFIER.fullmatch(name):
+        raise ValueError(f'Invalid identifier: {name!r}')
+    return f'`{name}`'
+
+
+def placeholders(count: int) -> str:
+    return ', '.join(['%s'] * count)
+
+
+def padded_ids(ids: Sequence[Any]) -> List[Any]:
+    """
+    Pad an id list to the next power of two by repeating its last id, so IN lists of similar
+    length share one statement text (and one prepared statement). Duplicates do not change the result.
+    """
+    size = 1
+    while size < len(ids):
+        size *= 2
+    return list(ids) + [ids[-1]] * (size - len(ids))
+
+
+class StatementBuilder:
+    """
+    Builds statements from table and column names checked against the schema registry and quoted.
+    Values always go in as %s parameters, so the same kind of statement on the same table and
+    columns always has the same text and can be served from a PreparedStatementCache.
+    Raises ValueError for unknown columns or malformed names.
+    """
+
+    def __init__(self, schema: SchemaRegistry):
+        self.schema = schema
+
+    def table(self, table_name: str) -> str:
+        quoted = quote_identifier(table_name)
+        self.schema.get(table_name)  # Only existing tables, loads the schema on first use
+        return quoted
+
+    def column(self, table_name: str, column_name: str) -> str:
+        if self.schema.get(table_name).column(column_name) is None:
+            raise ValueError(f'Unknown column for {table_name}: {column_name!r}')
+        return quote_identifier(column_name)
+
+    def columns(self, table_name: str, column_names: Iterable[str]) -> str:
+        return ', '.join(self.column(table_name, name) for name in column_names)
+
+    def count(self, table_name: str, where: str = '') -> str:
+        return f"SELECT COUNT(*) as count FROM {self.table(table_name)}{f' WHERE {where}' if where else ''}"
+
+    def select_page(self, table_name: str, where: str = '', order_by: str = '`id`') -> str:
+        """Page of rows; parameters are the WHERE values, then limit and offset"""
+        return f"SELECT * FROM {self.table(table_name)}{f' WHERE {where}' if where else ''} ORDER BY {order_by} LIMIT %s OFFSET %s"
+
+    def select_by_id(self, table_name: str) -> str:
+        return f"SELECT * FROM {self.table(table_name)} WHERE `id` = %s"
+
+    def select_by_ids(self, table_name: str, count: int) -> str:
+        return f"SELECT * FROM {self.table(table_name)} WHERE `id` IN ({placeholders(count)})"
+
+    def insert(self, table_name: str, column_names: Sequence[str]) -> str:
+        return (f"INSERT INTO {self.table(table_name)} ({self.columns(table_name, column_names)}) "
+                f"VALUES ({placeholders(len(column_names))})")
+
+    def update(self, table_name: str, column_names: Sequence[str]) -> str:
+        assignments = ', '.join(f'{self.column(table_name, name)} = %s' for name in column_names)
+        return f"UPDATE {self.table(table_name)} SET {assignments} WHERE `id` = %s"
+
+    def delete(self, table_name: str) -> str:
+        return f"DELETE FROM {self.table(table_name)} WHERE `id` = %s"
+
+
+class PreparedStatementCache:
+    """
+    LRU of prepared statement cursors for one connection, at most `size` statements.
+    The server parses each statement once per connection; evicted statements are closed,
+    which deallocates them on the server.
+    """
+
+    def __init__(self, prepare, size: int = 64):
+        self.prepare = prepare
+        self.size = size
+        self._cursors: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def cursor(self, statement: str, dictionary: bool = True) -> 'PreparedCursor':
+        key = (statement, dictionary)
+        cursor = self._cursors.get(key)
+        if cursor is not None:
+            self._cursors.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+            cursor = self._cursors[key] = self.prepare(dictionary)
+            while len(self._cursors) > self.size:
+                _, evicted = self._cursors.popitem(last=False)
+                try:
+                    evicted.close()
+                except Exception:
+                    pass
+        return PreparedCursor(cursor)
+
+    def clear(self):
+        while self._cursors:
+            _, cursor = self._cursors.popitem()
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+
+class PreparedCursor:
+    """A cached prepared cursor on loan; close() hands it back to the cache instead of closing it"""
+
+    def __init__(self, cursor: Any):
+        self._cursor = cursor
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
@@ -0,0 +1,103 @@
+"""
+app.storage.user in a SQLite file, so the app processes of a multi-worker deployment (see cluster.py)
+share what users stored. NiceGUI keeps user storage in per-process JSON files or Redis; this
+stores one row per user instead, written through on every change and read when a process
+first sees the user's session. Sticky sessions keep a user on one process, so only that
+process writes the user's row.
+"""
+import asyncio
+import sqlite3
+import threading
+
+from nicegui import background_tasks, core, json
+from nicegui.persistence import PersistentDict
+from nicegui.storage import Storage
+
+
+class SQLiteStore:
+    """Key-value table of storage documents in a SQLite file in WAL mode, shared between processes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_storage (
+                id TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            )
+        """)
+
+    def load(self, storage_id: str) -> dict:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM user_storage WHERE id = ?", (storage_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save(self, storage_id: str, data: str):
+        with self._lock:
+            self._conn.execute("INSERT INTO user_storage (id, data) VALUES (?, ?) "
+                               "ON CONFLICT (id) DO UPDATE SET data = excluded.data", (storage_id, data))
+
+    def delete(self, storage_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM user_storage WHERE id = ?", (storage_id,))
+
+
+class SQLitePersistentDict(PersistentDict):
+    """A storage document kept in a SQLiteStore, saved in the background after each change"""
+
+    def __init__(self, store: SQLiteStore, storage_id: str):
+        self.store = store
+        self.storage_id = storage_id
+        super().__init__(data={}, on_change=self.backup)
+
+    async def initialize(self) -> None:
+        self.update(await asyncio.to_thread(self.store.load, self.storage_id))
+
+    def initialize_sync(self) -> None:
+        self.update(self.store.load(self.storage_id))
+
+    def backup(self) -> None:
+        # Serialized right away, so the saved document is the state after this change
+        data = json.dumps(self)
+
+        # Like NiceGUI's FilePersistentDict: a save in progress is not cancelled on shutdown
+        @background_tasks.await_on_shutdown
+        async def save() -> None:
+            await asyncio.to_thread(self.store.save, self.storage_id, data)
+
+        if core.loop and core.loop.is_running():
+            background_tasks.create_lazy(save(), name=f'user-storage-{self.storage_id}')
+        else:
+            self.store.save(self.storage_id, data)
+
+    async def close(self) -> None:
+        # NiceGUI closes user storage on shutdown before it tears down background tasks, which discards
+        # a save still waiting behind a running one, so the final state is written here
+        if self:
+            await asyncio.to_thread(self.store.save, self.storage_id, json.dumps(self))
+        else:
+            await asyncio.to_thread(self.store.delete, self.storage_id)  # No row per visitor who stored nothing
+
+    def clear(self) -> None:
+        super().clear()
+        self.store.delete(self.storage_id)
+
+
+def use_sqlite_user_storage(path: str):
+    """Keep app.storage.user in the SQLite file at `path`, call before the first request is served"""
+    store = SQLiteStore(path)
+    create = Storage._create_persistent_dict
+
+    def create_persistent_dict(storage_id: str) -> PersistentDict:
+        # Only user storage moves to SQLite, general and tab storage stay with NiceGUI's own backend
+        if storage_id.startswith('user-'):
+            return SQLitePersistentDict(store, storage_id)
+        return create(storage_id)
+
+    # Relies on NiceGUI 3.3.1 internals (pinned in docker/requirements.txt): every persistent storage
+    # document is created through Storage._create_persistent_dict, user storage with the id
+    # 'user-<session id>'. Check both when upgrading NiceGUI.
+    Storage._create_persistent_dict = staticmethod(create_persistent_dict)